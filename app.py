@@ -1,20 +1,40 @@
-from fastapi import FastAPI, Query, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, Query, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
 import os
 import asyncio
 from core.converter import number_to_vietnamese
-from core.audio import cut_audio
+from core.lyrics import LyricsIndex, number_phrases
+from core.audio import cut_audio, probe_duration
+from core.autocall import AutoCaller
+from core.normalize import normalize_cbr
+from core import reconciler
+from core.catalog import Catalog
+from core import clips as clips_store
+from core import assets
+from core import tts
+from core import ws_protocol
+from core import metrics
+from core import tracing
+from core.telemetry import PlaybackTelemetry, MAX_BATCH_EVENTS
+from core.warmup import Warmup, check_binary
+from core.journal import Journal
+from core.tickets import ROWS, RowTracker, TicketBook, mask_from_numbers
+from core.static_files import (
+    ImmutableStaticFiles, PrecompressedStaticFiles,
+    precompressed_file_response, REVALIDATE_CACHE_CONTROL,
+)
 import uuid
 import json
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError
 import subprocess
 import glob
 import re
 import time
 import sys
 import shutil
+import threading
 
 def get_executable_path(name):
     # Try finding in PATH
@@ -34,13 +54,93 @@ FFMPEG_CMD = get_executable_path("ffmpeg")
 
 app = FastAPI()
 
+# ====== Metrics (see core.metrics, scraped at /metrics) ======
+http_duration = metrics.REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to the response headers, by route template", ("method", "route"))
+http_requests = metrics.REGISTRY.counter("http_requests_total", "HTTP requests served", ("method", "route", "status"))
+# Any other method token a client sends is counted as "other", so it can't add series
+HTTP_METHODS = frozenset(("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"))
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: times each request to its response start and labels it
+    by the matched route template, so /api/x/{id} is one series, not one per id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                http_duration.observe(time.perf_counter() - start, method, route)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(1, method, route, status[0])
+
+app.add_middleware(MetricsMiddleware)
+
+class TracingMiddleware:
+    """
+    While tracing is on (see core.tracing), records each request as an async
+    trace slice and tags the spans it causes, including in worker threads, with
+    its request id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.TRACER.enabled:
+            return await self.app(scope, receive, send)
+        request_id = uuid.uuid4().hex[:8]
+        token = tracing.TRACER.bind_request(request_id)
+        start = tracing.now_us()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            tracing.TRACER.unbind_request(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            tracing.TRACER.async_complete(f"{scope['method']} {route}", "request", start, tracing.now_us(),
+                                          request_id, {"path": scope["path"], "status": status[0]})
+
+app.add_middleware(TracingMiddleware)
+
 # Mount static files
+# Fingerprinted build output must be mounted before the plain /static mount
+# (a symlink swapped by assets.build_assets, so it may not exist yet at import)
+app.mount(assets.DIST_URL_PREFIX, PrecompressedStaticFiles(directory=assets.DIST_DIR, check_dir=False),
+          name="static_dist")
+# Rendered TTS phrases are content-keyed too (see core.tts)
+tts_cache = tts.TTSCache()
+app.mount(tts.TTS_URL_PREFIX, ImmutableStaticFiles(directory=tts.TTS_DIR), name="tts")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/data/songs", StaticFiles(directory="data/songs"), name="songs")
 app.mount("/data/songs/full", StaticFiles(directory="data/songs/full"), name="full_songs")
 app.mount("/data/songs/number", StaticFiles(directory="data/songs/number"), name="number_songs")
 app.mount("/data/songs/start", StaticFiles(directory="data/songs/start"), name="start_songs")
 app.mount("/data/songs/end", StaticFiles(directory="data/songs/end"), name="end_songs")
+os.makedirs(clips_store.HASHED_DIR, exist_ok=True)
+app.mount(clips_store.HASHED_URL_PREFIX, ImmutableStaticFiles(directory=clips_store.HASHED_DIR), name="hashed_songs")
 
 DATA_PATH = "data/lyrics/data.json"
 
@@ -52,8 +152,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# ====== SSE Client Registry ======
+# ====== SSE / WebSocket Client Registry ======
 sse_clients: list[asyncio.Queue] = []
+ws_clients: set[asyncio.Queue] = set()
 
 # ====== Game State ======
 game_state = {
@@ -69,15 +170,46 @@ game_state = {
     "duck_level": 0.15,
     "is_paused": False,      # server-side pause state
     "bg_started_at": 0,      # timestamp when bg music started
+    "audio_variants": {},    # {variant: url} compact encodings of audio_url
+    "ticket_event": None,    # rows won / nearly won by the last called number (see _mark_tickets)
+    "auto_call": {"enabled": False},  # auto-caller status (see AutoCaller.status)
+    "preload": None,         # {audio_url, variants} of the next auto call, for displays to prefetch
+    "revision": 0,           # incremented on every broadcast, acked to WS commands
 }
 
+# Persisted event journal: game_state survives restarts (see restore_game_state)
+journal = Journal()
+
+_last_broadcast = game_state.copy()  # state sent with the previous revision, for deltas
+
+fanout_duration = metrics.REGISTRY.histogram(
+    "notify_fanout_seconds", "Time to journal and enqueue one state broadcast to every client")
+dropped_subscribers = metrics.REGISTRY.counter(
+    "dropped_subscribers_total", "Clients dropped because their queue was full", ("transport",))
+
 def notify_clients():
-    """Push current game state to all SSE clients"""
-    # Inject server time for sync
+    """Push current game state to all SSE and WebSocket clients and journal it"""
+    with fanout_duration.time():
+        _broadcast()
+
+    # The auto-caller re-evaluates its schedule on every state change
+    auto_caller.wake()
+
+def _broadcast():
+    global _last_broadcast
+    game_state["revision"] += 1
     current_state = game_state.copy()
-    current_state["server_time"] = time.time()
-    
-    data = json.dumps(current_state, ensure_ascii=False)
+    # called_numbers is appended in place: copy it so the next delta sees the change
+    current_state["called_numbers"] = list(game_state["called_numbers"])
+    delta = ws_protocol.state_delta(_last_broadcast, current_state)
+    with tracing.span("journal.append", "fs"):
+        journal.append(game_state["revision"], delta, current_state)
+    _last_broadcast = current_state
+
+    # Inject server time for sync
+    server_time = time.time()
+    with tracing.span("json.dumps state", "json"):
+        data = json.dumps(dict(current_state, server_time=server_time), ensure_ascii=False)
     dead = []
     for q in sse_clients:
         try:
@@ -87,6 +219,22 @@ def notify_clients():
     for q in dead:
         try: sse_clients.remove(q)
         except ValueError: pass
+    if dead:
+        dropped_subscribers.inc(len(dead), "sse")
+
+    if ws_clients:
+        frame = ws_protocol.encode_delta(game_state["revision"], dict(delta, server_time=server_time))
+        dead = []
+        for q in ws_clients:
+            try:
+                q.put_nowait(frame)
+            except asyncio.QueueFull:
+                dead.append(q)
+        # A dropped socket has missed a delta; its sender closes it so the client resyncs
+        for q in dead:
+            ws_clients.discard(q)
+        if dead:
+            dropped_subscribers.inc(len(dead), "ws")
 
 @app.get("/api/game/stream")
 async def game_stream(request: Request):
@@ -105,6 +253,10 @@ async def game_stream(request: Request):
             while True:
                 if await request.is_disconnected():
                     break
+                # Dropped by notify_clients() for falling behind: end the
+                # stream so EventSource reconnects and gets the full state
+                if queue not in sse_clients:
+                    break
                 try:
                     data = await asyncio.wait_for(queue.get(), timeout=15.0)
                     yield f"data: {data}\n\n"
@@ -125,56 +277,129 @@ async def game_stream(request: Request):
         }
     )
 
+@app.on_event("startup")
+def restore_game_state():
+    """Replay the journal so a restart mid-game keeps called numbers and settings"""
+    global _last_broadcast
+    try:
+        start = time.perf_counter()
+        revision, state = journal.recover()
+        if state:
+            state.pop("server_time", None)
+            game_state.update(state)
+            game_state["revision"] = revision
+            _last_broadcast = dict(game_state, called_numbers=list(game_state["called_numbers"]))
+            logger.info(f"Recovered game state at revision {revision} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        journal.open(game_state["revision"])
+    except Exception as e:
+        # Keep serving from memory; appends are no-ops until the journal opens
+        logger.error(f"Game journal unavailable: {e}")
+
+@app.on_event("shutdown")
+def close_journal():
+    journal.close()
+
+def build_static_assets():
+    """
+    Fingerprint + precompress /static so pages can be served with immutable assets
+    (required warm-up step: a failed build keeps /ready at 503; pages still
+    fall back to the unbuilt sources under /static)
+    """
+    built = assets.build_assets()
+    logger.info(f"Built {len(built)} static assets")
+    return {"assets": len(built)}
+
+def _page_response(page: str, request: Request):
+    return precompressed_file_response(assets.page_path(page), request.headers, REVALIDATE_CACHE_CONTROL)
+
 @app.get("/")
-async def read_root():
-    return FileResponse('static/index.html')
+async def read_root(request: Request):
+    return _page_response('index.html', request)
 
 @app.get("/admin")
-async def admin_page():
-    return FileResponse('static/admin.html')
+async def admin_page(request: Request):
+    return _page_response('admin.html', request)
 
 # --- Game API ---
 
+def _clip_variants(audio_url: str, background_tasks: BackgroundTasks, seg_id: str = None) -> dict:
+    """
+    Variant URLs for a clip; publishes it and queues missing encodes on first use.
+    seg_id (when the caller knows it) disambiguates clips shared by several segments.
+    """
+    seg_id = clips_store.seg_id_for_url(audio_url, seg_id)
+    if seg_id is None and audio_url and audio_url.startswith("/data/songs/"):
+        local_path = os.path.normpath(audio_url.lstrip("/").split("?")[0])
+        if local_path.startswith("data/songs/") and local_path.endswith(".mp3") and os.path.isfile(local_path):
+            seg_id = os.path.splitext(os.path.basename(local_path))[0]
+            if not clips_store.resolve_url(seg_id, local_path):
+                seg_id = None
+    if seg_id is None:
+        return {}
+    if clips_store.missing_variants(seg_id):
+        background_tasks.add_task(clips_store.build_variants, seg_id)
+    return clips_store.variant_urls(seg_id)
+
 @app.get("/api/call_number")
-async def call_number(number: int = Query(..., ge=0, le=99)):
-    """Called by admin to get audio URL for a number"""
+async def call_number(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    number: int = Query(..., ge=0, le=99),
+    quality: Optional[str] = Query(None),
+    formats: Optional[str] = Query(None),
+):
+    """
+    Called by admin to get audio URL for a number.
+    quality=low (or a "Save-Data: on" header) selects the smallest variant whose
+    extension is listed in formats (e.g. "opus,mp3").
+    """
+    if quality is None:
+        quality = "low" if request.headers.get("save-data", "").lower() == "on" else "high"
+    accepted = [f.strip() for f in formats.split(",")] if formats else None
+    return _resolve_call_audio(number, background_tasks, quality, accepted)
+
+def _resolve_call_audio(number: int, background_tasks: BackgroundTasks, quality: str = "high", accepted=None) -> dict:
+    """Pick a pre-cut clip for the number, falling back to a cached TTS voice"""
     text = number_to_vietnamese(number)
-    
+
     # Check for pre-cut audio segments
     try:
         number_dir = os.path.join(NUMBER_SONGS_DIR, str(number))
         if os.path.exists(number_dir):
-            clips = [f for f in os.listdir(number_dir) if f.endswith('.mp3')]
+            with tracing.span("list clips", "fs", number=number):
+                clips = [f for f in os.listdir(number_dir) if f.endswith('.mp3')]
             if clips:
                 chosen = random.choice(clips)
+                # Prefer the content-addressed URL (cached forever by displays)
+                seg_id = os.path.splitext(chosen)[0]
+                audio_url = clips_store.resolve_url(seg_id, os.path.join(number_dir, chosen), str(number))
+                variants = {}
+                if audio_url:
+                    variants = _clip_variants(audio_url, background_tasks, seg_id)
+                    audio_url = clips_store.select_url(variants, quality, accepted) or audio_url
                 return {
                     "number": number,
                     "text": text,
                     "found": True,
                     "lyric": "",
                     "song_name": "",
-                    "audio_url": f"/data/songs/number/{number}/{chosen}",
+                    "audio_url": audio_url or f"/data/songs/number/{number}/{chosen}",
+                    "variants": variants,
                 }
     except Exception as e:
         logger.warning(f"Error reading pre-cut segments for {number}: {e}")
     
-    # Fallback: TTS voice — "Mỏi miệng quá. Số X"
+    # Fallback: TTS voice — "Mỏi miệng quá. Số X" (rendered once, then served from the cache)
     try:
-        from gtts import gTTS
-        tts_text = f"Mỏi miệng quá. Số {text}"
-        filename = f"tts_{number}.mp3"
-        output_path = os.path.join(TEMP_DIR, filename)
-        # Reuse cached TTS file if it already exists
-        if not os.path.exists(output_path):
-            tts = gTTS(text=tts_text, lang='vi')
-            tts.save(output_path)
+        with tracing.span("tts_cache.get", "tts", number=number):
+            key = tts_cache.get(_tts_phrase(number))
         return {
             "number": number,
             "text": text,
             "found": True,
             "lyric": "Mỏi miệng quá!",
             "song_name": "",
-            "audio_url": f"/static/temp/{filename}",
+            "audio_url": tts_cache.url(key),
             "no_duck": True,  # Don't duck bg music for short TTS
         }
     except Exception as e:
@@ -186,19 +411,52 @@ async def call_number(number: int = Query(..., ge=0, le=99)):
             "message": "Không tạo được âm thanh."
         }
 
+def _tts_phrase(number: int) -> str:
+    return f"Mỏi miệng quá. Số {number_to_vietnamese(number)}"
+
+# --- TTS pre-render (every number's fallback phrase, ahead of the game) ---
+tts_status = {"status": "idle", "progress": "", "error": None}
+
+def _run_tts_prerender():
+    def progress(done, total):
+        tts_status["progress"] = f"{done}/{total}"
+    try:
+        start = time.perf_counter()
+        keys = tts_cache.render_many([_tts_phrase(n) for n in range(100)], progress=progress)
+        tts_status["status"] = "done"
+        if len(keys) < 100:
+            tts_status["error"] = f"{100 - len(keys)} phrases failed"
+        logger.info(f"Pre-rendered {len(keys)} TTS phrases in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"TTS pre-render failed: {e}")
+        tts_status.update(status="error", error=str(e))
+
+@app.post("/api/tts/prerender")
+async def prerender_tts(background_tasks: BackgroundTasks):
+    """Render the TTS fallback for all numbers in the background"""
+    if tts_status["status"] != "running":
+        tts_status.update(status="running", progress="", error=None)
+        background_tasks.add_task(_run_tts_prerender)
+    return dict(tts_status, cache=tts_cache.stats())
+
+@app.get("/api/tts/status")
+async def get_tts_status():
+    return dict(tts_status, cache=tts_cache.stats())
+
 class GameCallRequest(BaseModel):
     number: int
     audio_url: str = ""
     playback_rate: float = 1.0
 
 @app.post("/api/game/call")
-async def game_call(req: GameCallRequest):
+async def game_call(req: GameCallRequest, background_tasks: BackgroundTasks):
     """Admin calls a number — update game state to playing"""
     text = number_to_vietnamese(req.number)
     game_state["current_number"] = req.number
     game_state["current_text"] = text
     game_state["status"] = "playing"
     game_state["audio_url"] = req.audio_url
+    game_state["audio_variants"] = _clip_variants(req.audio_url, background_tasks)
     game_state["playback_rate"] = req.playback_rate
     game_state["started_at"] = time.time() # Capture start time
     game_state["started_at"] = time.time() # Capture start time
@@ -215,6 +473,7 @@ async def game_done():
             "number": game_state["current_number"],
             "text": game_state["current_text"]
         })
+        game_state["ticket_event"] = _mark_tickets(game_state["current_number"])
         game_state["status"] = "showing"
     else:
         # Special sound ended (Start/Kinh)
@@ -239,7 +498,13 @@ async def game_reset():
     game_state["status"] = "idle"
     game_state["audio_url"] = None
     game_state["audio_url"] = None
+    game_state["audio_variants"] = {}
+    game_state["ticket_event"] = None
+    game_state["preload"] = None
     game_state["play_id"] = 0
+    auto_caller.stop()
+    if ticket_tracker is not None:
+        ticket_tracker.reset()
     game_state["is_paused"] = False
     notify_clients()
     return {"status": "ok"}
@@ -249,12 +514,13 @@ class SpecialSoundRequest(BaseModel):
     playback_rate: float = 1.0
 
 @app.post("/api/game/special")
-async def game_special(req: SpecialSoundRequest):
+async def game_special(req: SpecialSoundRequest, background_tasks: BackgroundTasks):
     """Admin triggers a special sound (Start / Kinh)"""
     game_state["status"] = "playing"
     game_state["current_number"] = None 
     game_state["current_text"] = ""
     game_state["audio_url"] = req.audio_url
+    game_state["audio_variants"] = _clip_variants(req.audio_url, background_tasks)
     game_state["playback_rate"] = req.playback_rate
     game_state["started_at"] = time.time()
     game_state["started_at"] = time.time()
@@ -290,7 +556,6 @@ async def game_volume(req: VolumeRequest):
     game_state["duck_level"] = req.duck_level
     game_state["playback_rate"] = req.playback_rate
     notify_clients()
-    notify_clients()
     return {"status": "ok"}
 
 class PauseRequest(BaseModel):
@@ -303,6 +568,304 @@ async def game_pause(req: PauseRequest):
     notify_clients()
     return {"status": "ok"}
 
+# --- Auto-call (server-side scheduler, see core.autocall) ---
+
+# URL prefix -> directory, to probe the duration of resolved clips
+_AUDIO_URL_DIRS = (
+    (clips_store.HASHED_URL_PREFIX + "/", clips_store.HASHED_DIR),
+    ("/static/", "static"),
+    ("/data/songs/", "data/songs"),
+)
+
+_durations: dict = {}  # (path, mtime) -> seconds
+
+def _clip_duration(audio_url: str):
+    for prefix, directory in _AUDIO_URL_DIRS:
+        if audio_url.startswith(prefix):
+            path = os.path.join(directory, audio_url[len(prefix):])
+            break
+    else:
+        return None
+    try:
+        key = (path, os.path.getmtime(path))
+    except OSError:
+        return None
+    if key not in _durations:
+        _durations[key] = probe_duration(path)
+    return _durations[key]
+
+async def _prepare_auto_call(number: int) -> dict:
+    """Resolve the clip (or TTS), build its variants and probe its length ahead of the call"""
+    tasks = BackgroundTasks()
+    info = await asyncio.to_thread(_resolve_call_audio, number, tasks)
+    await tasks()
+    audio_url = info.get("audio_url") or ""
+    if audio_url:
+        # Re-read now that the encodes ran; anything still missing is built here too
+        tasks = BackgroundTasks()
+        info["variants"] = _clip_variants(audio_url, tasks)
+        await tasks()
+        info["duration"] = await asyncio.to_thread(_clip_duration, audio_url)
+    return info
+
+async def _auto_call(number: int, prepared: dict):
+    game_state["preload"] = None
+    req = GameCallRequest(number=number, audio_url=prepared.get("audio_url") or "",
+                          playback_rate=game_state.get("playback_rate", 1.0))
+    tasks = BackgroundTasks()
+    await game_call(req, tasks)
+    if tasks.tasks:
+        asyncio.create_task(tasks())
+
+# Content-named URLs reveal nothing about the number they play
+_OPAQUE_URL_PREFIXES = (clips_store.HASHED_URL_PREFIX + "/", tts.TTS_URL_PREFIX + "/")
+
+def _is_opaque_url(url: str) -> bool:
+    return any(url.startswith(prefix) and "/" not in url[len(prefix):] for prefix in _OPAQUE_URL_PREFIXES)
+
+def _auto_call_hint(prepared: Optional[dict]):
+    # Opaque URLs only: the next number itself stays hidden from displays, so
+    # clips served from /data/songs/number/{n}/ get no hint
+    hint = None
+    if prepared and _is_opaque_url(prepared.get("audio_url") or ""):
+        variants = {name: url for name, url in (prepared.get("variants") or {}).items() if _is_opaque_url(url)}
+        hint = {"audio_url": prepared["audio_url"], "variants": variants}
+    if hint != game_state["preload"]:
+        game_state["preload"] = hint
+        notify_clients()
+
+def _auto_call_publish():
+    game_state["auto_call"] = auto_caller.status()
+    notify_clients()
+
+auto_caller = AutoCaller(game_state, prepare=_prepare_auto_call, call=_auto_call, done=game_done,
+                         hint=_auto_call_hint, publish=_auto_call_publish)
+
+@app.on_event("startup")
+def reset_auto_call():
+    """A restored journal may say auto-call was on; the scheduler always starts stopped"""
+    game_state["auto_call"] = auto_caller.status()
+    game_state["preload"] = None
+
+class AutoCallRequest(BaseModel):
+    interval: Optional[float] = None  # seconds between the end of a clip and the next call
+
+@app.post("/api/autocall/start")
+async def autocall_start(req: AutoCallRequest):
+    """Start (or retune) auto-call. Pause/resume with /api/game/pause."""
+    auto_caller.start(req.interval)
+    return {"status": "ok", **auto_caller.status()}
+
+@app.post("/api/autocall/stop")
+async def autocall_stop():
+    """Stop auto-call; a clip already playing still finishes"""
+    auto_caller.stop()
+    return {"status": "ok", **auto_caller.status()}
+
+class AutoCallNextRequest(BaseModel):
+    number: Optional[int] = None
+
+@app.post("/api/autocall/next")
+async def autocall_next(req: AutoCallNextRequest):
+    """Manual override: finish the current call now and call `number` (or a random one) next"""
+    if not auto_caller.enabled:
+        raise HTTPException(status_code=409, detail="Auto-call is not running")
+    if req.number is not None:
+        if not 0 <= req.number <= 99:
+            raise HTTPException(status_code=400, detail="number must be between 0 and 99")
+        if any(c["number"] == req.number for c in game_state["called_numbers"]):
+            raise HTTPException(status_code=400, detail="Number already called")
+    auto_caller.override(req.number)
+    return {"status": "ok"}
+
+# --- WebSocket transport (optional; SSE + REST remain the fallback) ---
+
+# Command name (see core.ws_protocol) -> coroutine running the REST handler
+# Args are validated by the same request models as the REST endpoints
+_WS_COMMANDS = {
+    "call": lambda kw, tasks: game_call(GameCallRequest.model_validate(kw), tasks),
+    "done": lambda kw, tasks: game_done(),
+    "special": lambda kw, tasks: game_special(SpecialSoundRequest.model_validate(kw), tasks),
+    "bg_music": lambda kw, tasks: game_bg_music(BgMusicRequest.model_validate(kw)),
+    "volume": lambda kw, tasks: game_volume(VolumeRequest.model_validate(kw)),
+    "pause": lambda kw, tasks: game_pause(PauseRequest.model_validate(kw)),
+    "reset": lambda kw, tasks: game_reset(),
+}
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+@app.websocket("/api/game/ws")
+async def game_ws(websocket: WebSocket):
+    """
+    Admin commands and state updates over one socket.
+    Each command is acknowledged with the revision its state change produced;
+    the matching delta is always delivered before the ack.
+    """
+    await websocket.accept()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=20)
+    # Snapshot and registration happen without an await in between,
+    # so the first delta the client sees applies on top of this state
+    initial_state = game_state.copy()
+    initial_state["server_time"] = time.time()
+    queue.put_nowait(ws_protocol.encode_state(game_state["revision"], initial_state))
+    ws_clients.add(queue)
+
+    async def sender():
+        while True:
+            try:
+                frame = await asyncio.wait_for(queue.get(), timeout=15.0)
+            except asyncio.TimeoutError:
+                frame = None
+            if queue not in ws_clients:
+                # Dropped for falling behind: close so the client reconnects and resyncs
+                await websocket.close(code=1013)
+                return
+            if frame is not None:
+                await websocket.send_text(frame)
+
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            seq = None
+            try:
+                name, seq, kwargs = ws_protocol.decode_command(raw)
+                tasks = BackgroundTasks()
+                await _WS_COMMANDS[name](kwargs, tasks)
+                reply = ws_protocol.encode_ack(seq, game_state["revision"])
+                if tasks.tasks:
+                    asyncio.create_task(tasks())
+            except ws_protocol.ProtocolError as e:
+                reply = ws_protocol.encode_error(e.seq, str(e))
+            except ValidationError as e:
+                reply = ws_protocol.encode_error(seq, _validation_message(e))
+            # A failing handler rejects its command; the socket stays open
+            except HTTPException as e:
+                reply = ws_protocol.encode_error(seq, str(e.detail))
+            except ValueError as e:
+                reply = ws_protocol.encode_error(seq, str(e))
+            except Exception as e:
+                logger.error(f"WebSocket command failed: {e}")
+                reply = ws_protocol.encode_error(seq, "internal error")
+            try:
+                queue.put_nowait(reply)
+            except asyncio.QueueFull:
+                ws_clients.discard(queue)
+                dropped_subscribers.inc(1, "ws")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        ws_clients.discard(queue)
+        send_task.cancel()
+
+# --- Tickets ---
+
+TICKETS_PATH = "data/game/tickets.json"
+MAX_TICKETS = 200000
+
+ticket_book: Optional[TicketBook] = None
+ticket_tracker: Optional[RowTracker] = None  # incremental row counts for ticket_book
+TICKET_EVENT_LIMIT = 50  # rows listed per ticket_event; totals are always exact
+
+def _called_numbers() -> list:
+    return [c["number"] for c in game_state["called_numbers"]]
+
+def _called_mask() -> int:
+    return mask_from_numbers(_called_numbers())
+
+async def _register_tickets(seed: int, count: int):
+    """Build a book and its tracker off the event loop, then swap them in"""
+    global ticket_book, ticket_tracker
+    def build():
+        book = TicketBook(seed, count)
+        return book, RowTracker(book, _called_numbers())
+    book, tracker = await asyncio.to_thread(build)
+    # Catch up on numbers called while building (marking is idempotent)
+    for number in _called_numbers():
+        tracker.mark(number)
+    ticket_book, ticket_tracker = book, tracker
+
+def _mark_tickets(number: int) -> Optional[dict]:
+    """
+    Decrement the rows holding `number` and describe the result for the stream:
+    wins are rows completed by this call, near are rows now one number short.
+    """
+    if ticket_tracker is None:
+        return None
+    won, near = ticket_tracker.mark(number)
+    return {
+        "number": number,
+        "play_id": game_state["play_id"],
+        "win_count": int(won.size),
+        "wins": [[int(r) // ROWS, int(r) % ROWS] for r in won[:TICKET_EVENT_LIMIT]],
+        "near_count": int(near.size),
+        "near": [[int(r) // ROWS, int(r) % ROWS] for r in near[:TICKET_EVENT_LIMIT]],
+    }
+
+async def load_tickets():
+    """Regenerate the registered ticket book from its persisted seed (required warm-up step)"""
+    if not os.path.exists(TICKETS_PATH):
+        return {"tickets": 0}
+    with tracing.span("load tickets.json", "json"), open(TICKETS_PATH, 'r', encoding='utf-8') as f:
+        params = json.load(f)
+    await _register_tickets(params["seed"], params["count"])
+    return {"tickets": params["count"]}
+
+class GenerateTicketsRequest(BaseModel):
+    count: int
+    seed: Optional[int] = None
+
+@app.post("/api/tickets/generate")
+async def generate_tickets(req: GenerateTicketsRequest):
+    """Generate (and register) a reproducible book of tickets"""
+    if not 1 <= req.count <= MAX_TICKETS:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_TICKETS}")
+    seed = req.seed if req.seed is not None else random.randrange(1 << 32)
+    await _register_tickets(seed, req.count)
+
+    os.makedirs(os.path.dirname(TICKETS_PATH), exist_ok=True)
+    with tracing.span("save tickets.json", "json"), open(TICKETS_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"seed": seed, "count": req.count}, f)
+    return {"seed": seed, "count": req.count}
+
+def _require_tickets() -> TicketBook:
+    if ticket_book is None:
+        raise HTTPException(status_code=404, detail="No tickets registered")
+    return ticket_book
+
+@app.get("/api/tickets/{ticket_id}")
+async def get_ticket(ticket_id: int):
+    """Rows of one ticket (for printing / display)"""
+    book = _require_tickets()
+    if not 0 <= ticket_id < book.count:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return {"ticket_id": ticket_id, "rows": book.ticket(ticket_id)}
+
+class ClaimRequest(BaseModel):
+    ticket_id: int
+
+@app.post("/api/tickets/claim")
+async def claim_ticket(req: ClaimRequest):
+    """Verify a "Kinh" claim against the numbers called so far"""
+    book = _require_tickets()
+    try:
+        rows = book.verify_claim(req.ticket_id, _called_mask())
+    except IndexError:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return {
+        "ticket_id": req.ticket_id,
+        "valid": bool(rows),
+        "rows": [{"row": r, "numbers": book.ticket(req.ticket_id)[r]} for r in rows],
+    }
+
+@app.get("/api/tickets")
+async def list_winners():
+    """All registered tickets that currently hold a complete row"""
+    book = _require_tickets()
+    winners = ticket_tracker.winning_tickets()
+    return {"count": book.count, "seed": book.seed, "winners": winners.tolist()}
+
 @app.get("/api/sounds/{type}")
 async def list_sounds(type: str):
     """List available sound files for 'start' or 'end'"""
@@ -319,15 +882,15 @@ async def list_sounds(type: str):
 # --- Cutter Routes ---
 
 @app.get("/cutter")
-async def cutter_ui():
-    return FileResponse('static/cutter.html')
+async def cutter_ui(request: Request):
+    return _page_response('cutter.html', request)
 
 @app.get("/api/songs")
 async def get_songs():
     if not os.path.exists(DATA_PATH):
         return []
     try:
-        with open(DATA_PATH, 'r', encoding='utf-8') as f:
+        with tracing.span("load data.json", "json"), open(DATA_PATH, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
         logger.error(f"Error reading songs data: {e}")
@@ -347,7 +910,7 @@ async def save_segment(segment: SegmentRequest):
         raise HTTPException(status_code=404, detail="Data file not found")
     
     try:
-        with open(DATA_PATH, 'r', encoding='utf-8') as f:
+        with tracing.span("load data.json", "json"), open(DATA_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
     except Exception as e:
         logger.error(f"Error reading data file: {e}")
@@ -372,7 +935,7 @@ async def save_segment(segment: SegmentRequest):
         raise HTTPException(status_code=404, detail="Song not found")
     
     try:
-        with open(DATA_PATH, 'w', encoding='utf-8') as f:
+        with tracing.span("save data.json", "json"), open(DATA_PATH, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
     except Exception as e:
         logger.error(f"Error writing data file: {e}")
@@ -388,32 +951,45 @@ NUMBER_SONGS_DIR = "data/songs/number"
 
 NORMALIZED_MARKER_DIR = "data/cutter/.normalized"
 
+# Files with a normalization running: listings poll every few seconds and
+# would otherwise start a second encode into the same .tmp/.partN paths
+_normalizing: set = set()
+_normalizing_lock = threading.Lock()
+
+def _claim_normalize(filename: str) -> bool:
+    with _normalizing_lock:
+        if filename in _normalizing:
+            return False
+        _normalizing.add(filename)
+        return True
+
+def _release_normalize(filename: str):
+    with _normalizing_lock:
+        _normalizing.discard(filename)
+
 def _ensure_normalized(filename: str):
     """Normalize a file to CBR if not already done"""
     os.makedirs(NORMALIZED_MARKER_DIR, exist_ok=True)
     marker_path = os.path.join(NORMALIZED_MARKER_DIR, filename + ".ok")
     
-    if os.path.exists(marker_path):
+    if os.path.exists(marker_path) or not _claim_normalize(filename):
         return
-    
-    target_path = os.path.join(FULL_SONGS_DIR, filename)
-    tmp_path = target_path + ".tmp.mp3"
-    
-    # Convert to 192k CBR
-    cmd = [
-        FFMPEG_CMD, "-y",
-        "-i", target_path,
-        "-codec:a", "libmp3lame",
-        "-b:a", "192k",
-        tmp_path
-    ]
-    res = subprocess.run(cmd, capture_output=True)
-    if res.returncode == 0:
-        os.replace(tmp_path, target_path)
-        with open(marker_path, 'w') as f: f.write('ok')
-        print(f"Auto-normalized {filename}")
-    else:
-        if os.path.exists(tmp_path): os.remove(tmp_path)
+    try:
+        if os.path.exists(marker_path):
+            return  # finished between the check and the claim
+        target_path = os.path.join(FULL_SONGS_DIR, filename)
+        tmp_path = target_path + ".tmp.mp3"
+
+        # Convert to 192k CBR (long sources are split across cores, see core.normalize)
+        if normalize_cbr(target_path, tmp_path, duration=probe_duration(target_path)):
+            os.replace(tmp_path, target_path)
+            with open(marker_path, 'w') as f: f.write('ok')
+            print(f"Auto-normalized {filename}")
+            full_catalog.refresh_in_background()
+        else:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+    finally:
+        _release_normalize(filename)
 
 @app.get("/api/full_songs")
 async def list_full_songs(background_tasks: BackgroundTasks):
@@ -430,11 +1006,31 @@ async def list_full_songs(background_tasks: BackgroundTasks):
     files.sort()
     return files
 
+full_catalog = Catalog(FULL_SONGS_DIR, NORMALIZED_MARKER_DIR, NUMBER_JSON_PATH)
+
+@app.on_event("startup")
+async def build_full_catalog():
+    full_catalog.refresh_in_background()
+
+@app.get("/api/full_songs/catalog")
+async def full_songs_catalog(background_tasks: BackgroundTasks):
+    """
+    Full songs with duration, bitrate mode, sample rate, normalization/analysis
+    state and segment counts, from the persistent catalog (see core.catalog).
+    Changed files are re-probed in the background and listed as pending meanwhile.
+    """
+    full_catalog.refresh_in_background()
+    listing = await asyncio.to_thread(full_catalog.listing)
+    for entry in listing["files"]:
+        if not entry["normalized"]:
+            background_tasks.add_task(_ensure_normalized, entry["name"])
+    return listing
+
 @app.delete("/api/cutter/all")
 async def delete_all_segments():
     """Clear all segments from number.json"""
     try:
-        with open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
+        with tracing.span("save number.json", "json"), open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
             json.dump({}, f)
         return {"status": "success"}
     except Exception as e:
@@ -450,21 +1046,61 @@ async def normalize_to_cbr(req: NormalizeRequest):
     if not os.path.exists(target_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    tmp_path = target_path + ".tmp.mp3"
-    cmd = [
-        FFMPEG_CMD, "-y",
-        "-i", target_path,
-        "-codec:a", "libmp3lame",
-        "-b:a", "192k",
-        tmp_path
-    ]
-    res = subprocess.run(cmd, capture_output=True)
-    if res.returncode == 0:
-        os.replace(tmp_path, target_path)
-        return {"status": "success"}
-    else:
-        if os.path.exists(tmp_path): os.remove(tmp_path)
-        raise HTTPException(status_code=500, detail=f"Normalization failed: {res.stderr.decode()}")
+    if not _claim_normalize(req.filename):
+        raise HTTPException(status_code=409, detail="File is already being normalized")
+    try:
+        tmp_path = target_path + ".tmp.mp3"
+        duration = await asyncio.to_thread(probe_duration, target_path)
+        ok = await asyncio.to_thread(normalize_cbr, target_path, tmp_path, None, duration)
+        if ok:
+            os.replace(tmp_path, target_path)
+            return {"status": "success"}
+        else:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise HTTPException(status_code=500, detail="Normalization failed (see server log)")
+    finally:
+        _release_normalize(req.filename)
+
+# --- Boundary analysis (silences / onsets, see core.analysis) ---
+# core.analysis pulls in numpy and a process pool: imported by the cutter endpoints only
+analysis_status = {}  # {filename: {status, progress, error}}
+
+def _run_analysis(filename: str):
+    from core import analysis
+    path = os.path.join(FULL_SONGS_DIR, filename)
+    def progress(done, total):
+        analysis_status[filename]["progress"] = f"{done}/{total}"
+    try:
+        start = time.perf_counter()
+        analysis.analyze_cached(path, progress=progress)
+        analysis_status[filename]["status"] = "done"
+        logger.info(f"Analyzed {filename} in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Analysis of {filename} failed: {e}")
+        analysis_status[filename].update(status="error", error=str(e))
+
+@app.get("/api/cutter/analysis/{filename}")
+async def get_analysis(filename: str, background_tasks: BackgroundTasks):
+    """
+    Candidate segment boundaries (ms) for a full song.
+    Served from the per-hash cache; otherwise starts the analysis and reports progress.
+    """
+    path = os.path.join(FULL_SONGS_DIR, filename)
+    if os.path.basename(filename) != filename or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    job = analysis_status.get(filename)
+    if job and job["status"] == "running":
+        return job
+    from core import analysis
+    _, cached = await asyncio.to_thread(analysis.load_cached, path)
+    if cached is not None:
+        return dict(cached, status="done")
+    if job and job["status"] == "error":
+        analysis_status.pop(filename)
+        return job
+    analysis_status[filename] = {"status": "running", "progress": "", "error": None}
+    background_tasks.add_task(_run_analysis, filename)
+    return analysis_status[filename]
 
 # --- Download tracking ---
 download_status = {}  # {task_id: {status, progress, filename, error}}
@@ -494,7 +1130,9 @@ def _do_download(task_id: str, url: str):
         # 1. Get Duration
         dur_cmd = [YTDLP_CMD, "--print", "duration", url]
         print(f"Checking duration: {dur_cmd}")
-        dur_proc = subprocess.run(dur_cmd, capture_output=True, text=True)
+        with metrics.media_job("ytdlp_probe") as job:
+            dur_proc = subprocess.run(dur_cmd, capture_output=True, text=True)
+            job.ok = dur_proc.returncode == 0
         
         duration = 0
         if dur_proc.returncode == 0:
@@ -561,7 +1199,9 @@ def _do_download(task_id: str, url: str):
                 # Run download
                 # We don't stream output for parallel tasks to avoid mixed logs
                 # checking log via process completion
-                proc = subprocess.run(cmd, capture_output=True, text=True)
+                with metrics.media_job("ytdlp") as job:
+                    proc = subprocess.run(cmd, capture_output=True, text=True)
+                    job.ok = proc.returncode == 0
                 
                 if proc.returncode != 0:
                     raise Exception(f"{YTDLP_CMD} failed: {proc.stderr}")
@@ -597,7 +1237,8 @@ def _do_download(task_id: str, url: str):
                     "-b:a", "192k",
                     cbr_path
                 ]
-                subprocess.run(norm_cmd, check=True, capture_output=True)
+                with metrics.media_job("download_normalize"):
+                    subprocess.run(norm_cmd, check=True, capture_output=True)
                 
                 # Cleanup
                 if os.path.exists(actual_file) and actual_file != cbr_path:
@@ -681,7 +1322,7 @@ async def get_all_segments():
     if not os.path.exists(NUMBER_JSON_PATH):
         return {}
     try:
-        with open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
+        with tracing.span("load number.json", "json"), open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
             
         # Lazy Migration Check
@@ -694,7 +1335,7 @@ async def get_all_segments():
         
         if dirty:
             try:
-                with open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
+                with tracing.span("save number.json", "json"), open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
                     json.dump(data, f, ensure_ascii=False, indent=4)
                 logger.info("Auto-migrated index-based segments to UUIDs on read.")
             except Exception as e:
@@ -705,6 +1346,24 @@ async def get_all_segments():
         print(f"Error reading number.json: {e}")
         return {}
 
+# Timed lyrics (sidecar .lrc/.vtt next to full songs + data.json), see core.lyrics
+lyrics_index = LyricsIndex(FULL_SONGS_DIR, DATA_PATH)
+
+@app.get("/api/cutter/suggest")
+async def suggest_segments(
+    number: int = Query(..., ge=0, le=99),
+    source: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """Candidate time ranges where the number is sung, from the lyrics index"""
+    # Only sources whose files changed since the last call are re-indexed
+    await asyncio.to_thread(lyrics_index.refresh)
+    return {
+        "number": number,
+        "phrases": [" ".join(p) for p in number_phrases(number)],
+        "candidates": lyrics_index.suggest(number, source, limit),
+    }
+
 @app.get("/api/cutter/number/{number}")
 async def get_number_segments(number: str):
     """Get segments for a specific number from number.json"""
@@ -712,7 +1371,7 @@ async def get_number_segments(number: str):
         return []
     
     try:
-        with open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
+        with tracing.span("load number.json", "json"), open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
             
         segs = data.get(str(number), [])
@@ -722,7 +1381,7 @@ async def get_number_segments(number: str):
         if updated:
             data[str(number)] = migrated_segs
             try:
-                with open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
+                with tracing.span("save number.json", "json"), open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
                     json.dump(data, f, ensure_ascii=False, indent=4)
             except Exception as e:
                 logger.error(f"Failed to save migrated data for {number}: {e}")
@@ -794,24 +1453,215 @@ def _migrate_legacy_audio(number: str, segments: List[dict]):
 
     return segments, updated
 
-def _cleanup_orphaned_files(number: str, segments: List[dict]):
-    """Delete audio files that don't match any current segment ID"""
-    out_dir = _get_output_dir(number)
-    if not os.path.exists(out_dir): return
-    
-    valid_filenames = {f"{s['id']}.mp3" for s in segments if s.get('id')}
-    
-    # Also keep legacy index files temporarily? No, we migrate them.
-    # But if migration happens, we should be safe to delete non-matching.
-    
-    for f in os.listdir(out_dir):
-        if f.endswith('.mp3'):
-            if f not in valid_filenames:
-                try:
-                    os.remove(os.path.join(out_dir, f))
-                    logger.info(f"Deleted orphan file: {f} in {out_dir}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete orphan {f}: {e}")
+# --- Background cleanup of orphaned / left-over media (see core.reconciler) ---
+# Left behind in FULL_SONGS_DIR by failed downloads and encodes
+FULL_SONGS_LEFTOVERS = ("*.tmp.mp3", "*_cbr.mp3", "*.part*", "*.temp.*", "*.ytdl",
+                        "*.webm", "*.m4a", "*.opus", "*.flac")
+
+def _load_number_segments():
+    """number.json for the sweeps, or None if it can't be read (then nothing is swept)"""
+    try:
+        with tracing.span("load number.json", "json"), open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _sweep_orphan_clips(budget: list):
+    """Cut clips whose id no segment in number.json has any more"""
+    data = _load_number_segments()
+    if data is None:
+        return 0, 0
+    dirs = {_get_output_dir(number): {f"{s['id']}.mp3" for s in segments if s.get('id')}
+            for number, segments in data.items()}
+    # Numbers dropped from number.json keep nothing
+    if os.path.isdir(NUMBER_SONGS_DIR):
+        for entry in os.scandir(NUMBER_SONGS_DIR):
+            if entry.is_dir():
+                dirs.setdefault(entry.path, set())
+    files = reclaimed = 0
+    for directory, keep in dirs.items():
+        removed, size = reconciler.sweep_orphans(directory, keep, budget=budget)
+        files += removed
+        reclaimed += size
+    return files, reclaimed
+
+def _sweep_hashed(budget: list):
+    """Store files no live segment references (manifest entries of deleted segments are pruned first)"""
+    data = _load_number_segments()
+    if data is None:
+        return 0, 0
+    clips_store.prune_manifest({s['id'] for segments in data.values() for s in segments if s.get('id')})
+    return reconciler.sweep_orphans(
+        clips_store.HASHED_DIR, clips_store.referenced_files(), suffix="", budget=budget)
+
+media_reconciler = reconciler.Reconciler({
+    "full_songs": lambda budget: reconciler.sweep_stale(FULL_SONGS_DIR, FULL_SONGS_LEFTOVERS, budget=budget),
+    "clips": _sweep_orphan_clips,
+    "hashed": _sweep_hashed,
+    "tts": lambda budget: tts_cache.reconcile(),
+    # tts_{n}.mp3 renders from before the content-keyed TTS cache
+    "legacy_tts": lambda budget: reconciler.sweep_stale(TEMP_DIR, ("tts_*.mp3",), budget=budget),
+})
+
+@app.on_event("startup")
+async def start_reconciler():
+    media_reconciler.start()
+    media_reconciler.trigger()
+
+@app.on_event("shutdown")
+async def stop_reconciler():
+    media_reconciler.stop()
+
+@app.get("/api/cleanup")
+async def cleanup_status():
+    """Files and bytes reclaimed by the background reconciler"""
+    return media_reconciler.status()
+
+@app.post("/api/cleanup")
+async def cleanup_now():
+    """Request a sweep soon (rate-limited)"""
+    media_reconciler.trigger()
+    return media_reconciler.status()
+
+# ====== Playback telemetry from displays (see core.telemetry) ======
+playback_telemetry = PlaybackTelemetry()
+
+class TelemetryBatch(BaseModel):
+    room: Optional[str] = None
+    client: Optional[str] = None
+    events: List[Tuple[str, float]] = Field(max_length=MAX_BATCH_EVENTS)  # [kind, value_ms]
+
+@app.post("/api/telemetry/playback", status_code=204)
+async def report_playback(batch: TelemetryBatch):
+    """Batched playback events from a display, folded into rolling per-room histograms"""
+    playback_telemetry.ingest(batch.room, batch.client, batch.events)
+    return Response(status_code=204)
+
+@app.get("/api/telemetry/playback")
+async def playback_quality(room: Optional[str] = None):
+    """Live sync quality per room: start latency, drift and buffering over the last window"""
+    return playback_telemetry.snapshot(room)
+
+# ====== Metrics endpoint ======
+# State that already lives elsewhere is read at scrape time (see metrics.Callback)
+metrics.REGISTRY.callback("sse_clients", "Connected SSE subscribers", lambda: len(sse_clients))
+metrics.REGISTRY.callback("ws_clients", "Connected WebSocket subscribers", lambda: len(ws_clients))
+metrics.REGISTRY.callback(
+    "subscriber_queue_depth_max", "Deepest pending-message queue of any subscriber",
+    lambda: max([q.qsize() for q in sse_clients] + [q.qsize() for q in ws_clients], default=0))
+metrics.REGISTRY.callback("game_revision", "Broadcast revision of the game state", lambda: game_state["revision"])
+metrics.REGISTRY.callback("tts_cache_hits_total", "TTS phrases served from the cache",
+                          lambda: tts_cache.stats()["hits"], kind="counter")
+metrics.REGISTRY.callback("tts_cache_misses_total", "TTS phrases rendered on demand",
+                          lambda: tts_cache.stats()["misses"], kind="counter")
+metrics.REGISTRY.callback("tts_cache_bytes", "Size of the TTS cache on disk", lambda: tts_cache.stats()["bytes"])
+metrics.REGISTRY.callback("tts_cache_entries", "Phrases in the TTS cache", lambda: tts_cache.stats()["entries"])
+
+def _download_jobs():
+    counts = {}
+    for job in list(download_status.values()):
+        key = (job.get("status", "unknown"),)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+metrics.REGISTRY.callback("playback_clients", "Displays that reported playback telemetry in the live window",
+                          playback_telemetry.active_clients, ("room",))
+metrics.REGISTRY.callback("download_jobs", "Download tasks by status", _download_jobs, ("status",))
+metrics.REGISTRY.callback("reconciler_reclaimed_bytes_total", "Bytes removed by the media reconciler",
+                          lambda: media_reconciler.status()["total_bytes"], kind="counter")
+metrics.REGISTRY.callback("reconciler_reclaimed_files_total", "Files removed by the media reconciler",
+                          lambda: media_reconciler.status()["total_files"], kind="counter")
+
+# ====== Profiling (opt-in, see core.tracing) ======
+loop_monitor = tracing.LoopMonitor()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if tracing.TRACER.enabled:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+class ProfileRequest(BaseModel):
+    enabled: bool
+    clear: bool = False
+
+@app.get("/api/debug/profile")
+async def profile_status():
+    """Tracing state and the recent event-loop stalls with the stacks that caused them"""
+    return {"trace": tracing.TRACER.stats(), "loop": loop_monitor.status()}
+
+@app.post("/api/debug/profile")
+async def set_profiling(req: ProfileRequest):
+    """Turn tracing and the loop-lag monitor on or off at runtime"""
+    if req.clear:
+        tracing.TRACER.clear()
+    tracing.TRACER.enable(req.enabled)
+    if req.enabled:
+        loop_monitor.start()
+    else:
+        loop_monitor.stop()
+    return await profile_status()
+
+@app.get("/api/debug/trace")
+async def download_trace():
+    """Recorded spans in Chrome trace-event format (open in ui.perfetto.dev or chrome://tracing)"""
+    body = await asyncio.to_thread(lambda: json.dumps(tracing.TRACER.dump()))
+    return Response(body, media_type="application/json",
+                    headers={"Content-Disposition": 'attachment; filename="abcloto-trace.json"'})
+
+# ====== Startup warm-up and readiness (see core.warmup) ======
+def _warm_clip_index():
+    """Publish every pre-cut clip to the hashed store now, so no call has to hash or copy one"""
+    clips = unpublished = 0
+    if os.path.isdir(NUMBER_SONGS_DIR):
+        for number in os.listdir(NUMBER_SONGS_DIR):
+            number_dir = os.path.join(NUMBER_SONGS_DIR, number)
+            if not os.path.isdir(number_dir):
+                continue
+            for name in os.listdir(number_dir):
+                if name.endswith('.mp3'):
+                    clips += 1
+                    seg_id = os.path.splitext(name)[0]
+                    if not clips_store.resolve_url(seg_id, os.path.join(number_dir, name), number):
+                        unpublished += 1
+    return {"clips": clips, "unpublished": unpublished}
+
+warmup = Warmup()
+warmup.step("static_assets", build_static_assets)
+warmup.step("tickets", load_tickets)
+warmup.step("clip_index", _warm_clip_index)
+warmup.step("ffmpeg", lambda: check_binary(FFMPEG_CMD))
+warmup.step("ffprobe", lambda: check_binary("ffprobe"))
+# Optional: the game still serves pre-cut clips without network TTS, and the
+# lyrics index only feeds the cutter's suggestions
+warmup.step("tts", tts_cache.warm, required=False)
+warmup.step("lyrics_index", lyrics_index.refresh, required=False)
+_warmup_task = None
+
+@app.on_event("startup")
+async def start_warmup():
+    """Start listening right away; /ready turns 200 once the required steps are done"""
+    global _warmup_task
+    _warmup_task = asyncio.create_task(warmup.run())
+
+@app.get("/ready")
+async def readiness():
+    """503 until the warm-up phase has completed every required step"""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+metrics.REGISTRY.callback("ready", "1 once the warm-up phase has completed", lambda: int(warmup.ready))
+metrics.REGISTRY.callback(
+    "warmup_step_seconds", "Duration of each warm-up step",
+    lambda: {(name,): s["seconds"] for name, s in warmup.steps.items() if s["seconds"] is not None}, ("step",))
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of the counters, histograms and gauges above"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 class SaveCutterRequest(BaseModel):
     number: str
@@ -824,7 +1674,7 @@ async def save_cutter_data(payload: SaveCutterRequest):
         data = {}
     else:
         try:
-            with open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
+            with tracing.span("load number.json", "json"), open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
                 data = json.load(f)
         except Exception as e:
             logger.warning(f"Corrupted number.json, starting fresh: {e}")
@@ -832,20 +1682,19 @@ async def save_cutter_data(payload: SaveCutterRequest):
     
     raw_segments = [s.dict() for s in payload.segments]
     
-    # Run Migration & Cleanup immediately
-    # This ensures consistency whenever we save
+    # Run Migration immediately; orphaned clips are removed by the background reconciler
     migrated_segments, updated = _migrate_legacy_audio(str(payload.number), raw_segments)
-    _cleanup_orphaned_files(str(payload.number), migrated_segments)
     
     data[str(payload.number)] = migrated_segments
     
     try:
-        with open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
+        with tracing.span("save number.json", "json"), open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
     except Exception as e:
         logger.error(f"Error writing number.json: {e}")
         raise HTTPException(status_code=500, detail="Lỗi ghi dữ liệu")
-        
+    
+    media_reconciler.trigger()
     return {"status": "success"}
 
 class CutRequest(BaseModel):
@@ -854,13 +1703,13 @@ class CutRequest(BaseModel):
     id: Optional[str] = None
 
 @app.post("/api/cutter/cut")
-async def process_cut(req: CutRequest):
+async def process_cut(req: CutRequest, background_tasks: BackgroundTasks):
     """Process audio cut for a specific segment"""
     if not os.path.exists(NUMBER_JSON_PATH):
         raise HTTPException(status_code=404, detail="Data file not found")
         
     try:
-        with open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
+        with tracing.span("load number.json", "json"), open(NUMBER_JSON_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
     except Exception as e:
         logger.error(f"Error reading number.json: {e}")
@@ -905,13 +1754,21 @@ async def process_cut(req: CutRequest):
     success = cut_audio(input_path, segment['start'], segment['end'], output_path)
     
     if success:
+        # Publish under a content hash so the clip URL is immutable
+        try:
+            clips_store.publish_clip(output_path, seg_id, str(req.number))
+            # Compact mobile variants (Opus / low-bitrate MP3), encoded in parallel
+            background_tasks.add_task(clips_store.build_variants, seg_id)
+        except OSError as e:
+            logger.error(f"Error publishing clip {seg_id}: {e}")
+
         # Update status
         segment['cut'] = 1
         segments[req.index] = segment # explicit update just in case
         data[str(req.number)] = segments
         
         try:
-            with open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
+            with tracing.span("save number.json", "json"), open(NUMBER_JSON_PATH, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=4)
         except Exception as e:
             logger.error(f"Error writing number.json after cut: {e}")
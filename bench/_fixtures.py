@@ -0,0 +1,42 @@
+"""Synthetic long-audio fixtures for the media benchmarks (requires ffmpeg)."""
+import os
+import subprocess
+
+FIXTURE_DIR = os.path.join(os.environ.get("TMPDIR", "/tmp"), "abcloto_bench_fixtures")
+
+
+def fixture_path(minutes: float, mode: str = "cbr", directory: str = FIXTURE_DIR) -> str:
+    """
+    A stereo 44.1 kHz mp3 of the given length: a slowly gliding tone under pink
+    noise, gated 5 s on / 2 s off so there are real silences. mode "cbr"
+    encodes at 192k, "vbr" at -q:a 4. Generated once, then reused.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"fixture_{minutes:g}min_{mode}.mp3")
+    if os.path.exists(path):
+        return path
+    seconds = minutes * 60
+    quality = ["-b:a", "192k"] if mode == "cbr" else ["-q:a", "4"]
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:duration={seconds}",
+        "-filter_complex",
+        "[0]vibrato=f=0.2:d=0.9[tone];[tone][1]amix=inputs=2,"
+        "volume='if(lt(mod(t,7),5),1,0)':eval=frame,aformat=channel_layouts=stereo",
+        "-ar", "44100", "-codec:a", "libmp3lame", *quality, path + ".tmp.mp3",
+    ]
+    subprocess.run(cmd, check=True)
+    os.replace(path + ".tmp.mp3", path)
+    return path
+
+
+def dir_bytes(directory: str) -> int:
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
@@ -0,0 +1,66 @@
+"""
+Boundary analysis benchmark: wall time vs process-pool size.
+
+Usage:
+    python -m bench.analysis [--minutes 60] [--workers 1 2 4 8] [--json out.json]
+
+Synthesizes a long CBR mp3 with ffmpeg (a tone gated 5 s on / 2 s off, so the
+expected silences are known), then runs core.analysis.analyze() uncached for
+each pool size. Requires ffmpeg/ffprobe on PATH.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import analysis
+
+ON_SEC, OFF_SEC = 5, 2
+
+
+def synthesize(path: str, minutes: float):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={minutes * 60}",
+        "-af", f"volume='if(lt(mod(t,{ON_SEC + OFF_SEC}),{ON_SEC}),1,0)':eval=frame",
+        "-codec:a", "libmp3lame", "-b:a", "192k", path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "full_bench.mp3")
+        synthesize(path, args.minutes)
+        expected = int(args.minutes * 60 // (ON_SEC + OFF_SEC))
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            result = analysis.analyze(path, workers)
+            wall = time.perf_counter() - start
+            results.append({
+                "workers": workers, "wall_s": round(wall, 2),
+                "silences": len(result["silences"]), "boundaries": len(result["boundaries"]),
+            })
+            print(f"workers={workers:<2} wall={wall:6.2f}s speedup={results[0]['wall_s'] / wall:4.1f}x "
+                  f"silences={len(result['silences'])} (expected ~{expected})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"minutes": args.minutes, "cpu_count": os.cpu_count(), "runs": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold-join transfer benchmark for the display/admin pages.
+
+Usage:
+    python -m bench.cold_join [--page /] [--repeat 20] [--json out.json] [--timeout 60]
+
+Runs app:app in-process, then for each page fetches the HTML plus every
+asset it pulls in (stylesheets, scripts and their module imports) the way a
+freshly joined display does, with an empty cache. It compares the raw
+/static sources against the fingerprinted, precompressed build for
+identity, gzip and brotli Accept-Encoding. Reports bytes on the wire and
+wall time per join.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+PAGES = {"/": "index.html", "/admin": "admin.html", "/cutter": "cutter.html"}
+_REF_RE = re.compile(r"""(?:src|href)=["'](/static/[^"'?]+)|from\s+["'](\./[^"']+)["']""")
+
+
+def _refs(base_url: str, text: str):
+    for m in _REF_RE.finditer(text):
+        if m.group(1):
+            yield m.group(1)
+        else:
+            yield base_url.rsplit("/", 1)[0] + "/" + m.group(2)[2:]
+
+
+def cold_join(client: TestClient, page_url: str, encoding: str):
+    """Fetch a page and its asset graph; returns (wire_bytes, requests)"""
+    headers = {"Accept-Encoding": encoding}
+    seen, queue = set(), [page_url]
+    wire_bytes = 0
+    while queue:
+        url = queue.pop()
+        if url in seen:
+            continue
+        seen.add(url)
+        r = client.get(url, headers=headers)
+        r.raise_for_status()
+        wire_bytes += int(r.headers.get("content-length", len(r.content)))
+        if url == page_url or url.endswith(".js"):
+            queue.extend(_refs(url, r.text))
+    return wire_bytes, len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", action="append", help="page route(s) to test (default: all)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for the asset build")
+    args = parser.parse_args()
+
+    results = []
+    with TestClient(app_module.app) as client:  # runs startup, which starts the warm-up (asset build)
+        # Only the asset build matters here; other steps (ffmpeg, tts) may never pass
+        deadline = time.monotonic() + args.timeout
+        while True:
+            state = client.get("/ready").json()["steps"]["static_assets"]["state"]
+            if state == "done":
+                break
+            if state == "failed" or time.monotonic() > deadline:
+                sys.exit(f"static asset build did not finish (state: {state})")
+            time.sleep(0.05)
+        for route in args.page or list(PAGES):
+            scenarios = [("source", f"/static/{PAGES[route]}")] + [("built", route)]
+            for label, url in scenarios:
+                for encoding in ("identity", "gzip", "br"):
+                    if label == "source" and encoding != "identity":
+                        continue  # plain StaticFiles never compresses
+                    start = time.perf_counter()
+                    for _ in range(args.repeat):
+                        wire_bytes, requests = cold_join(client, url, encoding)
+                    elapsed_ms = (time.perf_counter() - start) * 1000 / args.repeat
+                    results.append({
+                        "page": route, "variant": label, "encoding": encoding,
+                        "requests": requests, "wire_bytes": wire_bytes, "join_ms": round(elapsed_ms, 2),
+                    })
+
+    print(f"{'page':<8} {'variant':<8} {'encoding':<9} {'reqs':>5} {'bytes':>10} {'ms/join':>9}")
+    for r in results:
+        print(f"{r['page']:<8} {r['variant']:<8} {r['encoding']:<9} {r['requests']:>5} {r['wire_bytes']:>10,} {r['join_ms']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
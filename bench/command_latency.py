@@ -0,0 +1,100 @@
+"""
+Admin command latency: REST + SSE vs the WebSocket transport.
+
+Usage:
+    python -m bench.command_latency [--commands 500] [--json out.json]
+
+REST+SSE: POST /api/game/volume, then wait until the state carrying the new
+revision arrives on /api/game/stream (what the admin page waits for).
+WebSocket: send a "v" frame on /api/game/ws and wait for its ack (the
+matching delta is delivered before the ack).
+Reports p50/p90/p99 round-trip latency in milliseconds.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import websockets
+
+from bench._server import running_server, percentile
+
+
+async def rest_sse(base: str, n: int):
+    samples = []
+    async with httpx.AsyncClient(base_url=base, timeout=10) as client:
+        async with client.stream("GET", "/api/game/stream") as stream:
+            lines = stream.aiter_lines()
+
+            async def next_revision():
+                async for line in lines:
+                    if line.startswith("data: "):
+                        return json.loads(line[6:])["revision"]
+
+            revision = await next_revision()
+            for i in range(n):
+                body = {"bg_volume": (i % 100) / 100, "call_volume": 1.0, "duck_level": 0.15, "playback_rate": 1.0}
+                start = time.perf_counter()
+                await client.post("/api/game/volume", json=body)
+                target = revision + 1
+                while revision < target:
+                    revision = await next_revision()
+                samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def websocket_acks(base: str, n: int):
+    samples = []
+    async with websockets.connect(base.replace("http", "ws", 1) + "/api/game/ws") as ws:
+        await ws.recv()  # initial full state
+        for i in range(n):
+            start = time.perf_counter()
+            await ws.send(json.dumps(["v", i, (i % 100) / 100, 1.0, 0.15, 1.0]))
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame[0] == "a" and frame[1] == i:
+                    break
+                if frame[0] == "e":
+                    raise RuntimeError(frame[2])
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(name, samples):
+    return {
+        "transport": name,
+        "commands": len(samples),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p90_ms": round(percentile(samples, 90), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with running_server() as base:
+        results = [
+            summarize("rest+sse", asyncio.run(rest_sse(base, args.commands))),
+            summarize("websocket", asyncio.run(websocket_acks(base, args.commands))),
+        ]
+
+    print(f"{'transport':<10} {'n':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['transport']:<10} {r['commands']:>6} {r['p50_ms']:>8.3f} {r['p90_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Offline stand-in for yt-dlp, for benchmarking the download path.
+
+URLs are local fixture paths: fake:///abs/path/to/fixture.mp3
+Supports the subset app._do_download uses:
+    --print duration URL
+    -o TEMPLATE [--download-sections *START-END] ... URL
+Sections are stream-copied out of the fixture with ffmpeg (no re-encode, like
+a real download). FAKE_YTDLP_MBPS throttles output to that many MB/s to mimic
+network time (default: unthrottled).
+"""
+import os
+import sys
+import time
+import shutil
+import subprocess
+
+
+def _arg(argv, flag):
+    return argv[argv.index(flag) + 1] if flag in argv else None
+
+
+def main(argv):
+    url = argv[-1]
+    if not url.startswith("fake://"):
+        sys.exit(f"fake yt-dlp: unsupported URL {url}")
+    source = url[len("fake://"):]
+
+    if _arg(argv, "--print") == "duration":
+        cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+               "-of", "default=noprint_wrappers=1:nokey=1", source]
+        print(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip())
+        return
+
+    output = _arg(argv, "-o").replace("%(ext)s", "mp3")
+    section = _arg(argv, "--download-sections")
+    if section:
+        start, end = section.lstrip("*").split("-")
+        cmd = ["ffmpeg", "-y", "-v", "error", "-ss", start, "-to", end, "-i", source, "-c", "copy", output]
+        subprocess.run(cmd, check=True)
+    else:
+        shutil.copyfile(source, output)
+
+    mbps = float(os.environ.get("FAKE_YTDLP_MBPS", "0") or 0)
+    if mbps > 0:
+        time.sleep(os.path.getsize(output) / (mbps * 1024 * 1024))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,345 @@
+"""
+Game loop load benchmark: SSE fan-out under admin traffic.
+
+Usage:
+    python -m bench.game_load [--clients 100 1000 5000] [--cycles 50] [--bursts 10 --burst-size 20]
+                              [--fetches 500 --fetchers 50] [--json out.json] [--compare old.json]
+
+For each client count, app:app is started in-process (fresh server, journal in
+a temp dir) and that many display clients subscribe to /api/game/stream from
+separate worker processes, so client-side parsing doesn't compete with the
+server for the GIL. Then these scenarios run against the live fan-out:
+  call_done     admin call -> done cycles (two broadcasts each)
+  volume_burst  bursts of concurrent volume-slider posts
+  clip_fetch    concurrent fetches of a clip file while displays stay subscribed
+Reports per scenario:
+  - event delivery latency p50/p99 (ms, server broadcast -> client receipt;
+    both sides read the same wall clock)
+  - event-loop lag p50/p99/max (ms, from a probe task on the server loop)
+  - throughput (events delivered per second; requests per second for clip_fetch)
+  - subscribers dropped for falling behind (their SSE queue overflowed)
+and the server's RSS growth per subscriber. --json writes everything with run
+metadata; --compare prints the p99 change against a previous --json file.
+"""
+import os
+import re
+import sys
+import json
+import time
+import glob
+import math
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import numpy as np
+
+from bench._server import running_server, percentile
+
+CLIENTS_PER_WORKER = 500
+CONNECT_CONCURRENCY = 100
+PROBE_INTERVAL = 0.01
+
+_REVISION_RE = re.compile(rb'"revision": (\d+)')
+_SERVER_TIME_RE = re.compile(rb'"server_time": ([0-9.]+)')
+
+
+def _raise_nofile():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+# --- Display clients (worker processes) ---
+
+async def _sse_client(port: int, revisions: list, latencies: list, ready: asyncio.Event, gate):
+    writer = None
+    initial = True
+    try:
+        async with gate:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 20)
+            writer.write(b"GET /api/game/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+            await writer.drain()
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass  # response headers
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.startswith(b"data: "):
+                continue
+            received = time.time()
+            if initial:
+                initial = False
+                ready.set()
+                continue
+            revision = _REVISION_RE.search(line)
+            server_time = _SERVER_TIME_RE.search(line)
+            if revision and server_time:
+                revisions.append(int(revision.group(1)))
+                latencies.append(received - float(server_time.group(1)))
+    except OSError as e:
+        print(f"display client failed: {e}", file=sys.stderr)
+    finally:
+        ready.set()  # a failed client must not stall the others
+        if writer is not None:
+            writer.close()
+
+
+async def _worker_main(port: int, count: int, conn):
+    revisions, latencies = [], []
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    readies = [asyncio.Event() for _ in range(count)]
+    tasks = [asyncio.create_task(_sse_client(port, revisions, latencies, r, gate)) for r in readies]
+    await asyncio.gather(*(r.wait() for r in readies))
+    conn.send("ready")
+    await asyncio.get_running_loop().run_in_executor(None, conn.recv)  # stop signal
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    conn.send((np.array(revisions, dtype=np.int64), np.array(latencies, dtype=np.float64)))
+
+
+def _client_worker(port: int, count: int, conn):
+    _raise_nofile()
+    asyncio.run(_worker_main(port, count, conn))
+
+
+# --- Server-side loop lag probe ---
+
+_lag_samples = []  # (wall time, lag seconds)
+
+
+async def _start_lag_probe():
+    async def probe():
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(PROBE_INTERVAL)
+            _lag_samples.append((time.time(), loop.time() - start - PROBE_INTERVAL))
+    asyncio.get_running_loop().create_task(probe())
+
+
+# --- Scenarios (driven from the main process) ---
+
+async def _call_done(client: httpx.AsyncClient, args):
+    await client.post("/api/game/reset")
+    for i in range(args.cycles):
+        await client.post("/api/game/call", json={"number": i % 100, "audio_url": ""})
+        await client.post("/api/game/done")
+    return {"requests": 2 * args.cycles + 1}
+
+
+async def _volume_burst(client: httpx.AsyncClient, args):
+    def body(i):
+        return {"bg_volume": (i % 100) / 100, "call_volume": 1.0, "duck_level": 0.15, "playback_rate": 1.0}
+    for b in range(args.bursts):
+        await asyncio.gather(*(client.post("/api/game/volume", json=body(b * args.burst_size + i))
+                               for i in range(args.burst_size)))
+        await asyncio.sleep(0.2)
+    return {"requests": args.bursts * args.burst_size}
+
+
+async def _clip_fetch(client: httpx.AsyncClient, args):
+    clips = sorted(glob.glob("data/songs/start/*.mp3")) or sorted(glob.glob("data/songs/**/*.mp3", recursive=True))
+    if not clips:
+        return {"requests": 0, "error": "no clip files under data/songs"}
+    url = "/" + clips[0].replace(os.sep, "/")
+    gate = asyncio.Semaphore(args.fetchers)
+    samples, total_bytes = [], 0
+
+    async def fetch():
+        nonlocal total_bytes
+        async with gate:
+            start = time.perf_counter()
+            r = await client.get(url)
+            samples.append((time.perf_counter() - start) * 1000)
+            total_bytes += len(r.content)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch() for _ in range(args.fetches)))
+    wall = time.perf_counter() - start
+    return {
+        "requests": args.fetches,
+        "fetch_p50_ms": round(percentile(samples, 50), 2),
+        "fetch_p99_ms": round(percentile(samples, 99), 2),
+        "requests_per_s": round(args.fetches / wall, 1),
+        "mb_per_s": round(total_bytes / wall / 1024 / 1024, 1),
+    }
+
+
+SCENARIOS = {"call_done": _call_done, "volume_burst": _volume_burst, "clip_fetch": _clip_fetch}
+
+
+def _summarize(name, extra, window, rev_range, subscribers_before, subscribers_after, revisions, latencies):
+    start, end = window
+    mask = (revisions > rev_range[0]) & (revisions <= rev_range[1])
+    delivered = latencies[mask] * 1000
+    lags = [lag * 1000 for t, lag in _lag_samples if start <= t <= end]
+    result = {
+        "scenario": name,
+        "wall_s": round(end - start, 3),
+        "broadcasts": rev_range[1] - rev_range[0],
+        "events_delivered": int(mask.sum()),
+        "events_per_s": round(mask.sum() / (end - start), 1) if end > start else 0.0,
+        "delivery_p50_ms": round(float(np.percentile(delivered, 50)), 2) if len(delivered) else None,
+        "delivery_p99_ms": round(float(np.percentile(delivered, 99)), 2) if len(delivered) else None,
+        "loop_lag_p50_ms": round(percentile(lags, 50), 2),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 2),
+        "loop_lag_max_ms": round(max(lags, default=0.0), 2),
+        "dropped_subscribers": subscribers_before - subscribers_after,
+    }
+    result.update(extra)
+    return result
+
+
+def run_clients(n_clients: int, args, app_module) -> dict:
+    _lag_samples.clear()
+    with running_server() as base:
+        port = int(base.rsplit(":", 1)[1])
+        rss_before = _rss_mb()
+
+        ctx = multiprocessing.get_context("spawn")
+        workers = max(1, math.ceil(n_clients / CLIENTS_PER_WORKER))
+        pipes, procs = [], []
+        for w in range(workers):
+            count = n_clients // workers + (1 if w < n_clients % workers else 0)
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_client_worker, args=(port, count, child), daemon=True)
+            proc.start()
+            pipes.append(parent)
+            procs.append(proc)
+        connect_start = time.perf_counter()
+        for parent in pipes:
+            parent.recv()
+        connect_s = time.perf_counter() - connect_start
+        time.sleep(0.5)
+        rss_after = _rss_mb()
+
+        runs = []
+
+        async def drive():
+            async with httpx.AsyncClient(base_url=base, timeout=60,
+                                         limits=httpx.Limits(max_connections=args.fetchers)) as client:
+                for name in args.scenarios:
+                    subscribers = len(app_module.sse_clients)
+                    rev_start = app_module.game_state["revision"]
+                    start = time.time()
+                    extra = await SCENARIOS[name](client, args)
+                    await asyncio.sleep(args.settle)  # let the last broadcasts land
+                    end = time.time()
+                    runs.append((name, extra, (start, end), (rev_start, app_module.game_state["revision"]),
+                                 subscribers, len(app_module.sse_clients)))
+
+        asyncio.run(drive())
+
+        for parent in pipes:
+            parent.send("stop")
+        collected = [parent.recv() for parent in pipes]
+        for proc in procs:
+            proc.join(timeout=10)
+        revisions = np.concatenate([c[0] for c in collected])
+        latencies = np.concatenate([c[1] for c in collected])
+
+    return {
+        "clients": n_clients,
+        "client_workers": workers,
+        "connect_s": round(connect_s, 2),
+        "rss_mb_before": round(rss_before, 1),
+        "rss_mb_subscribed": round(rss_after, 1),
+        "kb_per_subscriber": round((rss_after - rss_before) * 1024 / n_clients, 2),
+        "scenarios": [_summarize(*run, revisions, latencies) for run in runs],
+    }
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _compare(results: list, baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["clients"], s["scenario"]): s for r in baseline["runs"] for s in r["scenarios"]}
+    print(f"\nvs {baseline_path} ({baseline.get('meta', {}).get('commit', '?')})")
+    for r in results:
+        for s in r["scenarios"]:
+            prev = old.get((r["clients"], s["scenario"]))
+            if not prev:
+                continue
+            for key in ("delivery_p99_ms", "loop_lag_p99_ms"):
+                if s.get(key) is not None and prev.get(key):
+                    change = (s[key] - prev[key]) / prev[key] * 100
+                    print(f"clients={r['clients']:<5} {s['scenario']:<13} {key:<16} "
+                          f"{prev[key]:8.2f} -> {s[key]:8.2f} ({change:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--cycles", type=int, default=50, help="call -> done cycles")
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=20, help="concurrent volume posts per burst")
+    parser.add_argument("--fetches", type=int, default=500)
+    parser.add_argument("--fetchers", type=int, default=50, help="concurrent clip fetches")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait after each scenario")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="previous --json output to compare against")
+    args = parser.parse_args()
+
+    _raise_nofile()
+    import app as app_module
+    from core.journal import Journal
+    # Keep the benchmark's games out of the real journal
+    app_module.journal = Journal(tempfile.mkdtemp(prefix="game_load_journal_"))
+    app_module.app.router.on_startup.append(_start_lag_probe)
+
+    results = []
+    for n in args.clients:
+        r = run_clients(n, args, app_module)
+        results.append(r)
+        print(f"\nclients={n} connect={r['connect_s']}s rss +{r['rss_mb_subscribed'] - r['rss_mb_before']:.1f} MB "
+              f"({r['kb_per_subscriber']} KB/subscriber)")
+        for s in r["scenarios"]:
+            print(f"  {s['scenario']:<13} delivered={s['events_delivered']:<8} "
+                  f"p50={s['delivery_p50_ms']} p99={s['delivery_p99_ms']} ms  "
+                  f"lag p99={s['loop_lag_p99_ms']} max={s['loop_lag_max_ms']} ms  "
+                  f"{s['events_per_s']} ev/s  dropped={s['dropped_subscribers']}"
+                  + (f"  fetch {s['requests_per_s']} req/s p99={s['fetch_p99_ms']} ms"
+                     if "requests_per_s" in s else ""))
+
+    if args.compare:
+        _compare(results, args.compare)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": _metadata(), "args": vars(args), "runs": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
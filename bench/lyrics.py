@@ -0,0 +1,122 @@
+"""
+Lyrics index benchmark: build, incremental refresh and suggestion latency.
+
+Usage:
+    python -m bench.lyrics [--files 40] [--hours 4] [--json out.json]
+
+Writes a synthetic corpus of .lrc sidecars (one line every ~4 s of a multi-hour
+source, a number phrase on ~5% of lines) into a temp dir and measures:
+  - cold build of core.lyrics.LyricsIndex
+  - refresh() with nothing changed, and after one file changed
+  - suggest() for every number 0..99 (p50/p99), against a linear scan of
+    all lines as the baseline
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.lyrics import LyricsIndex, number_phrases, tokenize
+from bench._server import percentile
+
+WORDS = ("em anh ơi về đây con số may mắn hôm nay ai kinh rồi chờ đợi bao lâu "
+         "mùa xuân câu hát quê hương lô tô vui vẻ nhé nha đi thôi bà con cô bác").split()
+
+
+def write_corpus(directory: str, files: int, hours: float, rng: random.Random) -> int:
+    lines_total = 0
+    for f in range(files):
+        rows = []
+        t = 0.0
+        while t < hours * 3600:
+            words = rng.choices(WORDS, k=rng.randint(4, 9))
+            if rng.random() < 0.05:
+                phrase = rng.choice(number_phrases(rng.randrange(100)))
+                pos = rng.randrange(len(words))
+                words[pos:pos] = phrase
+            minutes, seconds = divmod(t, 60)
+            rows.append(f"[{int(minutes):02d}:{seconds:05.2f}]{' '.join(words)}")
+            t += rng.uniform(2.5, 5.5)
+        with open(os.path.join(directory, f"full{f}.lrc"), "w", encoding="utf-8") as out:
+            out.write("\n".join(rows) + "\n")
+        lines_total += len(rows)
+    return lines_total
+
+
+def linear_scan(corpus: list, number: int) -> int:
+    """Baseline: tokenized lines, checked phrase by phrase"""
+    phrases = number_phrases(number)
+    hits = 0
+    for tokens in corpus:
+        for phrase in phrases:
+            size = len(phrase)
+            hits += sum(1 for i in range(len(tokens) - size + 1) if tuple(tokens[i:i + size]) == phrase)
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--hours", type=float, default=4)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        lines = write_corpus(tmp, args.files, args.hours, rng)
+        index = LyricsIndex(tmp, os.path.join(tmp, "missing-data.json"))
+
+        start = time.perf_counter()
+        index.refresh()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        index.refresh()
+        noop_ms = (time.perf_counter() - start) * 1000
+
+        path = os.path.join(tmp, "full0.lrc")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"[{int(args.hours * 60):02d}:00.00]hai tám về rồi\n")
+        start = time.perf_counter()
+        rebuilt = index.refresh()
+        incremental_ms = (time.perf_counter() - start) * 1000
+        assert rebuilt == 1
+
+        suggest_us = []
+        for number in range(100):
+            start = time.perf_counter()
+            index.suggest(number, limit=50)
+            suggest_us.append((time.perf_counter() - start) * 1e6)
+
+        corpus = []
+        for name in sorted(os.listdir(tmp)):
+            with open(os.path.join(tmp, name), encoding="utf-8") as f:
+                corpus.extend(tokenize(line.split("]", 1)[-1]) for line in f)
+        scan_ms = []
+        for number in range(0, 100, 10):
+            start = time.perf_counter()
+            linear_scan(corpus, number)
+            scan_ms.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        "files": args.files, "lines": lines,
+        "build_ms": round(build_ms, 1), "refresh_noop_ms": round(noop_ms, 2),
+        "refresh_one_file_ms": round(incremental_ms, 1),
+        "suggest_p50_us": round(percentile(suggest_us, 50), 1),
+        "suggest_p99_us": round(percentile(suggest_us, 99), 1),
+        "linear_scan_p50_ms": round(percentile(scan_ms, 50), 1),
+    }
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
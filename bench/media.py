@@ -0,0 +1,285 @@
+"""
+Media pipeline benchmark: cut, normalize, download and the cutter's cut endpoint.
+
+Usage:
+    python -m bench.media [--minutes 5 60 240] [--modes cbr vbr] [--paths cut normalize download cut_endpoint]
+                          [--segments 2000] [--json out.json] [--history bench_history.jsonl]
+
+Fixtures are synthetic mp3s (sine + pink noise, see bench/_fixtures.py) in CBR
+and VBR flavours, generated once and reused. Each path runs in a fresh
+interpreter against a sandboxed copy of the app's directories, and reports
+wall time, peak RSS (ru_maxrss of Python or its largest ffmpeg child) and peak / final
+disk usage of its work directory:
+  cut           core.audio.cut_audio of 4 s clips at 10%, 50% and 90% of the file
+  normalize     app._ensure_normalized (CBR re-encode, parallel for long files)
+  download      app._do_download through bench/fake_ytdlp.py (chunking, per-part
+                CBR encode); FAKE_YTDLP_MBPS adds simulated network time
+  cut_endpoint  POST /api/cutter/cut against a number.json with --segments
+                segments; json_rewrite_ms is the number.json load + dump alone
+--history appends the run as one JSON line and prints the change against the
+previous matching run, so results can be tracked across commits.
+Requires ffmpeg/ffprobe on PATH.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench._fixtures import fixture_path, dir_bytes
+
+PATHS = ("cut", "normalize", "download", "cut_endpoint")
+CLIP_MS = 4000
+
+
+class DiskSampler(threading.Thread):
+    """Tracks the peak size of a directory while a path runs"""
+
+    def __init__(self, directory: str, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, dir_bytes(self.directory))
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, dir_bytes(self.directory))
+        return self.peak
+
+
+def _sandbox_app(work: str):
+    """Import app with every directory the media paths write to moved under work"""
+    import app
+    from core import clips as clips_store
+    from core.catalog import Catalog
+
+    app.FULL_SONGS_DIR = os.path.join(work, "full")
+    app.NUMBER_SONGS_DIR = os.path.join(work, "number")
+    app.NORMALIZED_MARKER_DIR = os.path.join(work, "normalized")
+    app.NUMBER_JSON_PATH = os.path.join(work, "number.json")
+    app.full_catalog = Catalog(app.FULL_SONGS_DIR, app.NORMALIZED_MARKER_DIR, app.NUMBER_JSON_PATH,
+                               path=os.path.join(work, "catalog.json"))
+    clips_store.HASHED_DIR = os.path.join(work, "hashed")
+    clips_store.MANIFEST_PATH = os.path.join(work, "manifest.json")
+    clips_store._manifest = None
+    for d in (app.FULL_SONGS_DIR, app.NUMBER_SONGS_DIR, clips_store.HASHED_DIR):
+        os.makedirs(d, exist_ok=True)
+    return app
+
+
+def _run_cut(fixture: str, work: str, args) -> dict:
+    from core.audio import cut_audio, probe_duration
+    duration_ms = int(probe_duration(fixture) * 1000)
+    times = []
+    for at in (0.1, 0.5, 0.9):
+        start_ms = int(duration_ms * at)
+        start = time.perf_counter()
+        if not cut_audio(fixture, start_ms, start_ms + CLIP_MS, os.path.join(work, f"cut_{at}.mp3")):
+            raise RuntimeError(f"cut at {at} failed")
+        times.append(time.perf_counter() - start)
+    return {"cut_ms": [round(t * 1000, 1) for t in times]}
+
+
+def _run_normalize(fixture: str, work: str, args) -> dict:
+    app = _sandbox_app(work)
+    name = "full1.mp3"
+    shutil.copyfile(fixture, os.path.join(app.FULL_SONGS_DIR, name))
+    start = time.perf_counter()
+    app._ensure_normalized(name)
+    elapsed = time.perf_counter() - start
+    if not os.path.exists(os.path.join(app.NORMALIZED_MARKER_DIR, name + ".ok")):
+        raise RuntimeError("normalization failed")
+    return {"normalize_s": round(elapsed, 2)}
+
+
+def _run_download(fixture: str, work: str, args) -> dict:
+    app = _sandbox_app(work)
+    shim = os.path.join(work, "yt-dlp")
+    with open(shim, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(ROOT, "bench", "fake_ytdlp.py")}" "$@"\n')
+    os.chmod(shim, 0o755)
+    app.YTDLP_CMD = shim
+    app._do_download("bench", "fake://" + fixture)
+    status = app.download_status["bench"]
+    if status["status"] != "done":
+        raise RuntimeError(f"download failed: {status}")
+    parts = [f for f in os.listdir(app.FULL_SONGS_DIR) if f.endswith(".mp3")]
+    return {"parts": len(parts)}
+
+
+def _run_cut_endpoint(fixture: str, work: str, args) -> dict:
+    from fastapi.testclient import TestClient
+    from core.audio import probe_duration
+    app = _sandbox_app(work)
+    name = "full1.mp3"
+    os.symlink(fixture, os.path.join(app.FULL_SONGS_DIR, name))
+    duration_ms = int(probe_duration(fixture) * 1000)
+
+    # number.json with --segments segments spread over the 100 numbers
+    args.segments = max(args.segments, 100)
+    data = {}
+    step = max(1, (duration_ms - CLIP_MS) // args.segments)
+    for i in range(args.segments):
+        data.setdefault(str(i % 100), []).append({
+            "id": f"b{i:07d}", "start": i * step, "end": i * step + CLIP_MS,
+            "file": name, "cut": 0, "lyric": "",
+        })
+    with open(app.NUMBER_JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+    rewrites = []
+    for _ in range(10):
+        start = time.perf_counter()
+        with open(app.NUMBER_JSON_PATH, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        with open(app.NUMBER_JSON_PATH, "w", encoding="utf-8") as f:
+            json.dump(loaded, f, ensure_ascii=False, indent=4)
+        rewrites.append(time.perf_counter() - start)
+
+    client = TestClient(app.app)
+    requests = []
+    for i in range(args.cuts):
+        number = str(i % 100)
+        start = time.perf_counter()
+        r = client.post("/api/cutter/cut", json={"number": number, "index": i // 100})
+        r.raise_for_status()
+        requests.append(time.perf_counter() - start)
+    return {
+        "segments": args.segments,
+        "number_json_kb": round(os.path.getsize(app.NUMBER_JSON_PATH) / 1024, 1),
+        "json_rewrite_ms": round(sorted(rewrites)[len(rewrites) // 2] * 1000, 2),
+        "cut_request_ms": round(sorted(requests)[len(requests) // 2] * 1000, 1),
+    }
+
+
+RUNNERS = {"cut": _run_cut, "normalize": _run_normalize, "download": _run_download,
+           "cut_endpoint": _run_cut_endpoint}
+
+
+def run_child(path: str, fixture: str, work: str, args):
+    """Child entry point: one path on one fixture, result as a JSON line"""
+    os.chdir(ROOT)
+    sampler = DiskSampler(work)
+    sampler.start()
+    start = time.perf_counter()
+    extra = RUNNERS[path](fixture, work, args)
+    wall = time.perf_counter() - start
+    peak_disk = sampler.stop()
+    rss_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(json.dumps(dict(extra, wall_s=round(wall, 2), peak_rss_mb=round(rss_kb / 1024, 1),
+                          peak_disk_mb=round(peak_disk / 1024 / 1024, 1),
+                          final_disk_mb=round(dir_bytes(work) / 1024 / 1024, 1))))
+
+
+def measure(path: str, fixture: str, args) -> dict:
+    work = tempfile.mkdtemp(prefix=f"media_{path}_")
+    try:
+        cmd = [sys.executable, "-m", "bench.media", "--child", path, fixture, work,
+               "--segments", str(args.segments), "--cuts", str(args.cuts)]
+        result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip()[-300:]}
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _append_history(history_path: str, record: dict):
+    previous = None
+    if os.path.exists(history_path):
+        with open(history_path, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            previous = json.loads(lines[-1])
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    if not previous:
+        return
+    old = {(r["path"], r["minutes"], r["mode"]): r for r in previous["runs"]}
+    print(f"\nvs previous run ({previous['meta'].get('commit', '?')}, {previous['meta'].get('timestamp', '?')})")
+    for r in record["runs"]:
+        prev = old.get((r["path"], r["minutes"], r["mode"]))
+        if not prev or "error" in r or "error" in prev:
+            continue
+        for key in ("wall_s", "peak_rss_mb", "peak_disk_mb"):
+            if prev.get(key):
+                change = (r[key] - prev[key]) / prev[key] * 100
+                print(f"{r['path']:<13} {r['minutes']:>5g} min {r['mode']:<4} {key:<13} "
+                      f"{prev[key]:9.1f} -> {r[key]:9.1f} ({change:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 60, 240])
+    parser.add_argument("--modes", nargs="+", default=["cbr", "vbr"], choices=["cbr", "vbr"])
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--segments", type=int, default=2000,
+                        help="segments in the cut_endpoint number.json (at least 100)")
+    parser.add_argument("--cuts", type=int, default=20, help="cut requests in cut_endpoint")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--history", help="append results to this JSON-lines file and compare with its last run")
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        path, fixture, work = sys.argv[2:5]
+        run_child(path, fixture, work, parser.parse_args(sys.argv[5:]))
+        return
+    args = parser.parse_args()
+
+    runs = []
+    for minutes in args.minutes:
+        for mode in args.modes:
+            fixture = fixture_path(minutes, mode)
+            for path in args.paths:
+                r = dict(measure(path, fixture, args), path=path, minutes=minutes, mode=mode)
+                runs.append(r)
+                if "error" in r:
+                    print(f"{path:<13} {minutes:>5g} min {mode:<4} failed: {r['error']}")
+                    continue
+                details = {k: v for k, v in r.items()
+                           if k not in ("path", "minutes", "mode", "wall_s", "peak_rss_mb", "peak_disk_mb",
+                                        "final_disk_mb")}
+                print(f"{path:<13} {minutes:>5g} min {mode:<4} wall={r['wall_s']:8.2f}s "
+                      f"rss={r['peak_rss_mb']:7.1f} MB disk peak={r['peak_disk_mb']:7.1f} MB "
+                      f"final={r['final_disk_mb']:7.1f} MB {details}")
+
+    record = {"meta": _metadata(), "runs": runs}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=4)
+    if args.history:
+        _append_history(args.history, record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+CBR normalization benchmark: single encode vs chunk-parallel encode.
+
+Usage:
+    python -m bench.normalize [--minutes 60] [--workers 1 2 4 8] [--seeks 20] [--json out.json]
+
+Synthesizes a long VBR mp3 with ffmpeg (a gliding tone under pink noise, so
+every window is distinct), then times core.normalize.normalize_serial() and
+normalize_parallel() for each pool size. Each parallel output is checked
+against the serial one:
+  - decoded length: both files are decoded in full and must give the same
+    number of samples (the LAME tag trims delay and padding the same way);
+  - alignment: short windows decoded at random offsets from both files are
+    cross-correlated. The lag must be 0 at every offset, i.e. cut points
+    taken from either file land on the same sample, and the RMS difference
+    small.
+The run exits non-zero if a parallel output isn't aligned with the serial one.
+Requires ffmpeg on PATH.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import normalize
+
+SAMPLE_RATE = 44100
+WINDOW_SEC = 0.5
+MAX_LAG = 2048
+
+
+def synthesize(path: str, minutes: float):
+    seconds = minutes * 60
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.1:duration={seconds}",
+        "-filter_complex", "[0]vibrato=f=0.2:d=0.9[a];[a][1]amix=inputs=2",
+        "-codec:a", "libmp3lame", "-q:a", "4", path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def decode_window(path: str, offset: float) -> np.ndarray:
+    cmd = [
+        "ffmpeg", "-v", "error", "-ss", f"{offset:.3f}", "-t", f"{WINDOW_SEC}",
+        "-i", path, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def decoded_samples(path: str) -> int:
+    """Samples a full decode yields (after the decoder trims delay and padding)"""
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-ac", "1", "-f", "s16le", "-"]
+    return len(subprocess.run(cmd, capture_output=True, check=True).stdout) // 2
+
+
+def duration(path: str):
+    """(frames, seconds) from the frame headers"""
+    frames, spf, sample_rate = normalize.stream_frames(path)
+    return frames, round(frames * spf / sample_rate, 3)
+
+
+def compare(reference: str, candidate: str, offsets: list) -> dict:
+    """Range of correlation lags (samples) and worst aligned RMS difference over the seek offsets"""
+    lags, worst_rms = [], 0.0
+    for offset in offsets:
+        a, b = decode_window(reference, offset), decode_window(candidate, offset)
+        n = min(len(a), len(b))
+        if n <= 2 * MAX_LAG:
+            continue
+        a, b = a[:n], b[:n]
+        corr = np.correlate(a[MAX_LAG:-MAX_LAG], b, mode="valid")
+        shift = int(np.argmax(corr))
+        lags.append(shift - MAX_LAG)
+        diff = a[MAX_LAG:-MAX_LAG] - b[shift:shift + n - 2 * MAX_LAG]
+        worst_rms = max(worst_rms, float(np.sqrt(np.mean(diff * diff))))
+    return {"lag_samples": [min(lags), max(lags)] if lags else None, "max_rms_diff": round(worst_rms, 5)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seeks", type=int, default=20, help="random windows compared per output")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "full_bench.mp3")
+        synthesize(source, args.minutes)
+        random.seed(7)
+        offsets = sorted(random.uniform(0, args.minutes * 60 - 1) for _ in range(args.seeks))
+
+        serial_path = os.path.join(tmp, "serial.mp3")
+        start = time.perf_counter()
+        if not normalize.normalize_serial(source, serial_path):
+            sys.exit("serial encode failed")
+        serial_wall = time.perf_counter() - start
+        source_frames, source_duration = duration(source)
+        print(f"source      frames={source_frames} duration={source_duration}")
+        serial_frames, serial_duration = duration(serial_path)
+        serial_samples = decoded_samples(serial_path)
+        results.append({"mode": "serial", "workers": 1, "wall_s": round(serial_wall, 2),
+                        "frames": serial_frames, "duration_s": serial_duration, "samples": serial_samples})
+        print(f"serial      wall={serial_wall:6.2f}s frames={serial_frames} duration={serial_duration} "
+              f"samples={serial_samples}")
+
+        misaligned = []
+        for workers in args.workers:
+            path = os.path.join(tmp, f"parallel{workers}.mp3")
+            start = time.perf_counter()
+            if not normalize.normalize_parallel(source, path, workers):
+                sys.exit(f"parallel encode failed (workers={workers})")
+            wall = time.perf_counter() - start
+            frames, seconds = duration(path)
+            samples = decoded_samples(path)
+            accuracy = compare(serial_path, path, offsets)
+            results.append({"mode": "parallel", "workers": workers, "wall_s": round(wall, 2),
+                            "frames": frames, "duration_s": seconds, "samples": samples, **accuracy})
+            print(f"workers={workers:<2}  wall={wall:6.2f}s speedup={serial_wall / wall:4.1f}x "
+                  f"frames={frames} duration={seconds} samples={samples} lag={accuracy['lag_samples']} "
+                  f"rms={accuracy['max_rms_diff']}")
+            if samples != serial_samples or accuracy["lag_samples"] != [0, 0]:
+                misaligned.append(workers)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"minutes": args.minutes, "source_frames": source_frames, "cpu_count": os.cpu_count(), "runs": results}, f, indent=4)
+    if misaligned:
+        sys.exit(f"parallel output not aligned with the serial encode (workers={misaligned})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+pydub fallback cutter benchmark: full-source decode vs windowed decode.
+
+Usage:
+    python -m bench.pydub_cut [--minutes 120] [--at 0.1 0.5 0.9] [--clip-ms 4000] [--json out.json]
+
+Synthesizes a long mp3 with ffmpeg, then cuts a clip at each relative position
+with the old fallback (AudioSegment.from_file on the whole file) and with
+core.audio._cut_audio_pydub. Every cut runs in a fresh interpreter so its peak
+RSS (Python + ffmpeg children, ru_maxrss) is its own.
+Cut accuracy: each pydub clip is cross-correlated with core.audio.cut_audio's
+ffmpeg clip of the same range; the lag (ms) should be ~0 for both modes.
+Requires ffmpeg and ffprobe (pydub) on PATH. The full decode of a long source needs
+~10 MB per stereo minute of RAM; lower --minutes on small machines.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+SAMPLE_RATE = 44100
+MAX_LAG_MS = 100
+
+
+def synthesize(path: str, minutes: float):
+    # A gliding tone under pink noise: no two windows look alike, so lags are unambiguous
+    seconds = minutes * 60
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=330:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.1:duration={seconds}",
+        "-filter_complex", "[0]vibrato=f=0.2:d=0.9[a];[a][1]amix=inputs=2",
+        "-ac", "2", "-codec:a", "libmp3lame", "-b:a", "192k", path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def decode(path: str) -> np.ndarray:
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def lag_ms(reference: str, candidate: str) -> float:
+    """Offset of candidate against reference (positive: candidate starts late)"""
+    a, b = decode(reference), decode(candidate)
+    max_lag = MAX_LAG_MS * SAMPLE_RATE // 1000
+    n = min(len(a), len(b))
+    middle = a[max_lag:n - max_lag]  # skips the fades at both ends
+    corr = np.correlate(b[:n], middle, mode="valid")
+    return round((max_lag - int(np.argmax(corr))) * 1000 / SAMPLE_RATE, 2)
+
+
+def run_cut(mode: str, source: str, start_ms: int, end_ms: int, output: str):
+    """Child process entry point: one cut, then report wall time and peak RSS"""
+    from pydub import AudioSegment
+    from core.audio import _cut_audio_pydub
+
+    start = time.perf_counter()
+    if mode == "full":
+        segment = AudioSegment.from_file(source)[start_ms:end_ms].fade_in(200).fade_out(200)
+        segment.export(output, format="mp3")
+    elif mode == "ffmpeg":
+        from core.audio import cut_audio
+        if not cut_audio(source, start_ms, end_ms, output):
+            sys.exit(1)
+    elif not _cut_audio_pydub(source, start_ms, end_ms, output):
+        sys.exit(1)
+    wall = time.perf_counter() - start
+    peak_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+               + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(json.dumps({"wall_s": round(wall, 3), "peak_rss_mb": round(peak_kb / 1024, 1)}))
+
+
+def measure(mode: str, source: str, start_ms: int, end_ms: int, output: str) -> dict:
+    cmd = [sys.executable, "-m", "bench.pydub_cut", "--child", mode, source, str(start_ms), str(end_ms), output]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return {"error": result.stderr[-300:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        mode, source, start_ms, end_ms, output = sys.argv[2:7]
+        run_cut(mode, source, int(start_ms), int(end_ms), output)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--at", type=float, nargs="+", default=[0.1, 0.5, 0.9],
+                        help="clip positions as fractions of the source length")
+    parser.add_argument("--clip-ms", type=int, default=4000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "full_bench.mp3")
+        synthesize(source, args.minutes)
+        for at in args.at:
+            start_ms = int(args.minutes * 60000 * at)
+            end_ms = start_ms + args.clip_ms
+            reference = os.path.join(tmp, "ffmpeg.mp3")
+            for mode in ("ffmpeg", "full", "window"):
+                output = os.path.join(tmp, f"{mode}.mp3")
+                r = measure(mode, source, start_ms, end_ms, output)
+                if "error" not in r and mode != "ffmpeg":
+                    r["lag_ms"] = lag_ms(reference, output)
+                results.append({"mode": mode, "at": at, **r})
+                if "error" in r:
+                    print(f"{mode:<6} at={at:.2f} failed: {r['error']}")
+                else:
+                    print(f"{mode:<6} at={at:.2f} wall={r['wall_s']:7.3f}s peak_rss={r['peak_rss_mb']:8.1f} MB"
+                          + (f" lag={r['lag_ms']:+.2f} ms" if "lag_ms" in r else ""))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"minutes": args.minutes, "clip_ms": args.clip_ms, "runs": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Cold-start benchmark: import time of the app and time until it serves / is ready.
+
+Usage:
+    python -m bench.startup [--repeat 5] [--json out.json]
+
+Import: runs `python -X importtime -c "import app"` in fresh interpreters and
+reports the total plus the heavy dependencies (numpy, pydub, gtts, mutagen)
+and whether each was loaded at all. Startup: launches uvicorn app:app in a
+subprocess and times, from spawn, the first successful GET /api/game/state
+(listening) and the first 200 from /ready (warm). /ready is optional, so the
+benchmark also runs against trees without a warm-up phase.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench._server import _free_port, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("app", "fastapi", "numpy", "pydub", "gtts", "mutagen", "core.audio", "core.analysis")
+
+
+def measure_import() -> dict:
+    """Cumulative import time (ms) per module of interest; absent = not imported"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name in HEAVY_MODULES:
+            try:
+                times[name] = int(cumulative) / 1000
+            except ValueError:
+                pass
+    return times
+
+
+def _get(url: str):
+    """(status, JSON body or None); status 0 when nothing is listening yet"""
+    try:
+        with urllib.request.urlopen(url, timeout=2) as r:
+            return r.status, json.loads(r.read() or b"null")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"null")
+        except ValueError:
+            return e.code, None
+    except (OSError, ValueError):
+        return 0, None
+
+
+def measure_startup(timeout: float = 60) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listening = ready = None
+    failed = []
+    try:
+        while time.perf_counter() - start < timeout and proc.poll() is None:
+            if listening is None and _get(base + "/api/game/state")[0] == 200:
+                listening = time.perf_counter() - start
+            if listening is not None:
+                status, body = _get(base + "/ready")
+                if status == 404:
+                    ready = listening  # no warm-up phase in this tree
+                elif status == 200:
+                    ready = time.perf_counter() - start
+                elif body and body.get("phase") == "failed":
+                    failed = [name for name, step in body["steps"].items() if step["state"] == "failed"]
+                    break
+                if ready is not None:
+                    break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"listening_ms": listening and listening * 1000, "ready_ms": ready and ready * 1000,
+            "failed_steps": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.repeat)]
+    starts = [measure_startup() for _ in range(args.repeat)]
+
+    results = {"import_ms": {}, "startup_ms": {}}
+    print(f"import app ({args.repeat} fresh interpreters, cumulative ms, p50)")
+    for name in HEAVY_MODULES:
+        samples = [t[name] for t in imports if name in t]
+        if samples:
+            results["import_ms"][name] = percentile(samples, 50)
+            print(f"  {name:<14} {percentile(samples, 50):8.1f}")
+        else:
+            results["import_ms"][name] = None
+            print(f"  {name:<14} {'not imported':>12}")
+
+    print(f"startup ({args.repeat} runs, ms from spawn)")
+    for key in ("listening_ms", "ready_ms"):
+        samples = [s[key] for s in starts if s[key] is not None]
+        results["startup_ms"][key] = {"p50": percentile(samples, 50), "max": max(samples, default=0),
+                                      "failed": args.repeat - len(samples)}
+        print(f"  {key:<14} p50 {percentile(samples, 50):8.1f}   max {max(samples, default=0):8.1f}"
+              f"   failed {args.repeat - len(samples)}")
+    failed_steps = sorted({name for s in starts for name in s["failed_steps"]})
+    if failed_steps:
+        results["startup_ms"]["failed_steps"] = failed_steps
+        print(f"  warm-up steps that failed: {', '.join(failed_steps)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
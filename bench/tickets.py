@@ -0,0 +1,88 @@
+"""
+Ticket engine benchmark: generation and vectorized claim verification.
+
+Usage:
+    python -m bench.tickets [--tickets 50000] [--checks 200] [--json out.json]
+
+Generates a seeded book, then times full-book winner scans and single-ticket
+claim checks against random called sets of 20..90 numbers. Each scan result
+is cross-checked against a straightforward lookup-table implementation.
+Finally plays one full game through RowTracker (the per-call path used by
+/api/game/done) and times each incremental mark.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from core.tickets import RowTracker, TicketBook, mask_from_numbers
+from bench._server import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    for count in args.tickets:
+        start = time.perf_counter()
+        book = TicketBook(seed=1234, count=count)
+        gen_ms = (time.perf_counter() - start) * 1000
+
+        scan_ms, claim_us = [], []
+        for i in range(args.checks):
+            called = rng.choice(100, size=20 + i % 71, replace=False)
+            mask = mask_from_numbers(called)
+
+            start = time.perf_counter()
+            winners = book.winners(mask)
+            scan_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            book.verify_claim(i % count, mask)
+            claim_us.append((time.perf_counter() - start) * 1e6)
+
+            if i < 5:
+                lookup = np.zeros(100, dtype=bool)
+                lookup[called] = True
+                expected = np.flatnonzero(lookup[book.numbers].all(axis=2).any(axis=1))
+                assert np.array_equal(winners, expected), "mask scan disagrees with lookup"
+
+        tracker = RowTracker(book)
+        mark_us = []
+        for number in rng.permutation(100):
+            start = time.perf_counter()
+            tracker.mark(number)
+            mark_us.append((time.perf_counter() - start) * 1e6)
+        assert np.array_equal(tracker.winning_tickets(), np.arange(count)), "every row wins once all numbers are called"
+
+        results.append({
+            "tickets": count, "memory_bytes": book.nbytes, "generate_ms": round(gen_ms, 1),
+            "scan_p50_ms": round(percentile(scan_ms, 50), 3), "scan_p99_ms": round(percentile(scan_ms, 99), 3),
+            "claim_p50_us": round(percentile(claim_us, 50), 1),
+            "index_bytes": tracker.nbytes,
+            "mark_p50_us": round(percentile(mark_us, 50), 1), "mark_p99_us": round(percentile(mark_us, 99), 1),
+        })
+
+    print(f"{'tickets':>8} {'memory':>12} {'gen ms':>8} {'scan p50':>9} {'scan p99':>9} {'claim us':>9} {'index':>12} {'mark p50':>9} {'mark p99':>9}")
+    for r in results:
+        print(f"{r['tickets']:>8} {r['memory_bytes']:>12,} {r['generate_ms']:>8.1f} "
+              f"{r['scan_p50_ms']:>9.3f} {r['scan_p99_ms']:>9.3f} {r['claim_p50_us']:>9.1f} "
+              f"{r['index_bytes']:>12,} {r['mark_p50_us']:>9.1f} {r['mark_p99_us']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
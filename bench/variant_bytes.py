@@ -0,0 +1,88 @@
+"""
+Bytes-per-game benchmark for clip delivery variants.
+
+Usage:
+    python -m bench.variant_bytes [--build] [--calls 100] [--json out.json]
+
+For every published number clip it reads the size of the original and of
+each compact variant from the store, then reports the bytes one display
+downloads for a game of --calls numbers at each quality level.
+--build encodes missing variants first (needs ffmpeg).
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import clips
+from core.audio import AUDIO_VARIANTS
+
+
+def publish_all(build: bool):
+    """Make sure every number clip on disk is in the store"""
+    number_root = "data/songs/number"
+    for number in sorted(os.listdir(number_root)):
+        number_dir = os.path.join(number_root, number)
+        if not os.path.isdir(number_dir):
+            continue
+        for f in os.listdir(number_dir):
+            if f.endswith(".mp3"):
+                seg_id = os.path.splitext(f)[0]
+                clips.resolve_url(seg_id, os.path.join(number_dir, f), number)
+                if build:
+                    clips.build_variants(seg_id)
+
+
+def measure(calls: int) -> dict:
+    # Per number: average size of each variant across its clips
+    per_number = {}
+    for seg_id, entry in clips.load_manifest().items():
+        if not entry.get("number", "").isdigit():
+            continue
+        sizes = {"original": os.path.getsize(clips.hashed_path(entry["hash"]))}
+        for variant, filename in entry.get("variants", {}).items():
+            path = os.path.join(clips.HASHED_DIR, filename)
+            if os.path.exists(path):
+                sizes[variant] = os.path.getsize(path)
+        per_number.setdefault(entry["number"], []).append(sizes)
+
+    results = {}
+    for variant in ["original"] + list(AUDIO_VARIANTS):
+        means = []
+        for clip_sizes in per_number.values():
+            # Clients fall back to the original when a variant is missing
+            vals = [s.get(variant, s["original"]) for s in clip_sizes]
+            means.append(sum(vals) / len(vals))
+        avg_clip = sum(means) / len(means) if means else 0
+        results[variant] = {
+            "numbers_with_clips": len(means),
+            "avg_clip_bytes": int(avg_clip),
+            "bytes_per_game": int(avg_clip * calls),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--build", action="store_true", help="encode missing variants first")
+    parser.add_argument("--calls", type=int, default=100, help="numbers called per game")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    publish_all(args.build)
+    results = measure(args.calls)
+
+    base = results["original"]["bytes_per_game"] or 1
+    print(f"{'variant':<10} {'avg clip':>12} {'per game':>14} {'vs original':>12}")
+    for variant, r in results.items():
+        print(f"{variant:<10} {r['avg_clip_bytes']:>12,} {r['bytes_per_game']:>14,} {r['bytes_per_game'] / base:>11.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"calls": args.calls, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import json
+import subprocess
+import multiprocessing
+import concurrent.futures
+import numpy as np
+from core.audio import probe_duration
+from core import metrics
+from core.clips import file_digest
+
+# Boundary analysis for long sources (hours-long full*.mp3 files).
+# The file is split into time ranges that are decoded (ffmpeg -> 8 kHz mono PCM)
+# and scanned on a process pool. Each chunk reports silences (runs of quiet
+# frames) and onsets (sharp rises in frame energy); the merged result gives the
+# cutter snap points. Results are cached per content hash, so renames and
+# repeated opens are free.
+ANALYSIS_DIR = "data/cutter/analysis"
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+CHUNK_SEC = 300          # seconds of audio per pool task
+OVERLAP_SEC = 2          # decoded past the chunk end so edge events aren't cut in half
+LEAD_MS = FRAME_MS       # decoded before the chunk start so its first frame has a predecessor
+SILENCE_DB = -35.0       # frame RMS below this (dBFS) counts as quiet
+MIN_SILENCE_MS = 300
+ONSET_RISE_DB = 9.0      # frame-to-frame energy rise that marks an onset
+MIN_ONSET_GAP_MS = 250
+
+_FRAME = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def detect(pcm: np.ndarray, offset_ms: int = 0, until_ms: int = None, lead_ms: int = 0):
+    """
+    Silences and onsets in mono float PCM at SAMPLE_RATE.
+    pcm starts lead_ms before offset_ms; that lead is only context for the
+    energy rise into the first frame, onsets before offset_ms are dropped.
+    Returns ([[start_ms, end_ms], ...], [onset_ms, ...]) in absolute time;
+    onsets at or after until_ms (the next chunk's territory) are dropped.
+    """
+    offset_ms -= lead_ms
+    frames = len(pcm) // _FRAME
+    if frames == 0:
+        return [], []
+    blocks = pcm[:frames * _FRAME].reshape(frames, _FRAME)
+    db = 10 * np.log10(np.mean(blocks * blocks, axis=1) + 1e-10)
+
+    # Silences: runs of quiet frames
+    quiet = np.concatenate(([False], db < SILENCE_DB, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * FRAME_MS >= MIN_SILENCE_MS
+    silences = [[offset_ms + int(s) * FRAME_MS, offset_ms + int(e) * FRAME_MS]
+                for s, e in zip(starts[keep], ends[keep])]
+
+    # Onsets: local maxima of the energy rise above ONSET_RISE_DB, thinned to MIN_ONSET_GAP_MS
+    # The first frame has no predecessor here: it gets no rise (callers decode a lead for it)
+    level = np.maximum(db, SILENCE_DB)
+    rise = np.diff(level, prepend=level[0])
+    padded = np.pad(rise, 1, mode="edge")
+    peaks = np.flatnonzero((rise > ONSET_RISE_DB) & (rise >= padded[:-2]) & (rise >= padded[2:]))
+    onsets = []
+    for frame in peaks:
+        t = offset_ms + int(frame) * FRAME_MS
+        if t < offset_ms + lead_ms:
+            continue
+        if until_ms is not None and t >= until_ms:
+            break
+        if not onsets or t - onsets[-1] >= MIN_ONSET_GAP_MS:
+            onsets.append(t)
+    return silences, onsets
+
+
+def _decode(path: str, start_sec: float, duration_sec: float) -> np.ndarray:
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-ss", f"{start_sec:.3f}", "-t", f"{duration_sec:.3f}",
+        "-i", path,
+        "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    result = subprocess.run(cmd, capture_output=True, timeout=600)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {result.stderr[-300:]!r}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _analyze_chunk(path: str, start_sec: float, chunk_sec: float):
+    """Pool task: decode [start - lead, start + chunk + overlap) and detect"""
+    start_ms = int(start_sec * 1000)
+    lead_ms = min(LEAD_MS, start_ms)
+    pcm = _decode(path, (start_ms - lead_ms) / 1000, chunk_sec + OVERLAP_SEC + lead_ms / 1000)
+    return detect(pcm, start_ms, start_ms + int(chunk_sec * 1000), lead_ms)
+
+
+def _merge_ranges(ranges: list) -> list:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def analyze(path: str, workers: int = None, chunk_sec: float = CHUNK_SEC, progress=None) -> dict:
+    """
+    Analyze a whole file across a process pool (default: one worker per core).
+    progress(done, total) is called as chunks finish.
+    """
+    with metrics.media_job("analysis"):
+        return _analyze(path, workers, chunk_sec, progress)
+
+
+def _analyze(path: str, workers: int, chunk_sec: float, progress) -> dict:
+    duration = probe_duration(path)
+    if not duration:
+        raise RuntimeError(f"Could not read the duration of {path}")
+    starts = [i * chunk_sec for i in range(int(np.ceil(duration / chunk_sec)))]
+    workers = workers or os.cpu_count() or 1
+
+    silences, onsets = [], []
+    # spawn: the server process has threads, which fork would copy half-locked
+    ctx = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(starts)) or 1, mp_context=ctx) as pool:
+        futures = [pool.submit(_analyze_chunk, path, s, chunk_sec) for s in starts]
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            chunk_silences, chunk_onsets = future.result()
+            silences.extend(chunk_silences)
+            onsets.extend(chunk_onsets)
+            if progress:
+                progress(done, len(futures))
+
+    silences = _merge_ranges(silences)
+    onsets.sort()
+    # Snap points: where singing starts/stops around a silence, plus strong onsets
+    boundaries = sorted({t for s in silences for t in s} | set(onsets))
+    return {
+        "duration_ms": int(duration * 1000),
+        "silences": silences,
+        "onsets": onsets,
+        "boundaries": boundaries,
+    }
+
+
+def cache_path(digest: str) -> str:
+    return os.path.join(ANALYSIS_DIR, f"{digest}.json")
+
+
+_digests = {}  # (path, mtime_ns, size) -> digest; hashing an hours-long file isn't free
+
+
+def _digest(path: str) -> str:
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _digests:
+        _digests[key] = file_digest(path)
+    return _digests[key]
+
+
+def load_cached(path: str):
+    """(digest, cached result or None)"""
+    digest = _digest(path)
+    try:
+        with open(cache_path(digest), "r", encoding="utf-8") as f:
+            return digest, json.load(f)
+    except (OSError, ValueError):
+        return digest, None
+
+
+def analyze_cached(path: str, workers: int = None, progress=None) -> dict:
+    digest, cached = load_cached(path)
+    if cached is not None:
+        return cached
+    result = analyze(path, workers, progress=progress)
+    result["digest"] = digest
+    os.makedirs(ANALYSIS_DIR, exist_ok=True)
+    tmp_path = cache_path(digest) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, cache_path(digest))
+    return result
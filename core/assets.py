@@ -0,0 +1,233 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import tempfile
+import time
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip sidecars are produced without it
+    brotli = None
+
+# Static asset pipeline.
+# Copies every asset under static/ to static/dist/ with a content hash in its
+# name, rewrites references (HTML src/href, JS module imports) to those names and
+# writes .gz/.br sidecars next to each file so they can be served precompressed.
+#
+# static/dist is a symlink to one versioned build under static/dist.builds/.
+# Each build is written to its own temporary directory and published by
+# flipping the symlink with a rename, so concurrent workers never share a work
+# directory and requests in flight never see a half-written or deleted build.
+STATIC_DIR = "static"
+DIST_DIR = "static/dist"
+BUILDS_DIR = "static/dist.builds"
+KEEP_BUILDS = 2  # the live build and the one before it (pages already loaded still reference it)
+STALE_TMP_SEC = 3600
+DIST_URL_PREFIX = "/static/dist"
+MANIFEST_NAME = "manifest.json"
+SOURCES_NAME = "sources.sha256"  # digest of the inputs the current build was made from
+BUILD_VERSION = 1  # bump whenever the builder's output changes (rewrites, sidecars, layout)
+
+ASSET_EXTS = (".css", ".js")
+PAGES = ("index.html", "admin.html", "cutter.html")
+COMPRESSIBLE_EXTS = (".css", ".js", ".html", ".json", ".svg")
+MIN_COMPRESS_SIZE = 512  # bytes; smaller files aren't worth a sidecar
+
+# /static/style.css, /static/tailwindcss.js?v=3, './game-core.js'
+_REF_RE = re.compile(r"""(["'])(/static/[\w./-]+|\./[\w./-]+)(\?[^"']*)?\1""")
+
+_manifest = None  # {"style.css": "style.1a2b3c4d.css", ...}
+
+
+def _fingerprint(rel_path: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    base, ext = os.path.splitext(rel_path)
+    return f"{base}.{digest}{ext}"
+
+
+def _resolve(ref: str, rel_path: str) -> str:
+    """Asset path (relative to static/) that a reference points at"""
+    if ref.startswith("/static/"):
+        return ref[len("/static/"):]
+    return os.path.normpath(os.path.join(os.path.dirname(rel_path), ref))
+
+
+def _dependencies(rel_path: str, content: str) -> set:
+    return {_resolve(m.group(2), rel_path) for m in _REF_RE.finditer(content)} - {rel_path}
+
+
+def _rewrite(content: str, rel_path: str, mapping: dict) -> str:
+    """Point references to known assets at their fingerprinted names"""
+    def repl(m):
+        quote, ref = m.group(1), m.group(2)
+        target = _resolve(ref, rel_path)
+        if target not in mapping:
+            return m.group(0)
+        if ref.startswith("/static/"):
+            return f"{quote}{DIST_URL_PREFIX}/{mapping[target]}{quote}"
+        # Relative module import (same directory, as all of ours are)
+        return f"{quote}./{os.path.basename(mapping[target])}{quote}"
+
+    return _REF_RE.sub(repl, content)
+
+
+def _write_with_sidecars(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if not path.endswith(COMPRESSIBLE_EXTS) or len(data) < MIN_COMPRESS_SIZE:
+        return
+    with open(path + ".gz", 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def _collect_assets():
+    assets = []
+    for root, dirs, files in os.walk(STATIC_DIR):
+        # Skip generated output and runtime TTS files
+        skip = (DIST_DIR, BUILDS_DIR, os.path.join(STATIC_DIR, "temp"))
+        dirs[:] = [d for d in dirs if os.path.join(root, d) not in skip]
+        for f in files:
+            if f.endswith(ASSET_EXTS):
+                assets.append(os.path.relpath(os.path.join(root, f), STATIC_DIR))
+    return sorted(assets)
+
+
+def _read_pages() -> dict:
+    pages = {}
+    for page in PAGES:
+        src = os.path.join(STATIC_DIR, page)
+        if os.path.exists(src):
+            with open(src, 'r', encoding='utf-8') as f:
+                pages[page] = f.read()
+    return pages
+
+
+def _sources_digest(sources: dict, pages: dict) -> str:
+    h = hashlib.sha256(f"v{BUILD_VERSION} brotli={brotli is not None}".encode())
+    for rel, text in sorted(sources.items()) + sorted(pages.items()):
+        h.update(f"\0{rel}\0".encode('utf-8'))
+        h.update(text.encode('utf-8'))
+    return h.hexdigest()
+
+
+def _load_current_build(digest: str):
+    """Manifest of the existing build if it was made from exactly these sources"""
+    try:
+        with open(os.path.join(DIST_DIR, SOURCES_NAME), 'r', encoding='utf-8') as f:
+            if f.read().strip() != digest:
+                return None
+        with open(os.path.join(DIST_DIR, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_assets(force: bool = False) -> dict:
+    """
+    Rebuild static/dist. Returns the manifest (original -> fingerprinted name).
+    Files that import other assets are processed after their dependencies so
+    the importer's hash covers the rewritten import. Unless force is set, an
+    existing build made from the same sources is reused (compressing the
+    sidecars is most of the cost of a build).
+    """
+    global _manifest
+    sources = {}
+    for rel in _collect_assets():
+        with open(os.path.join(STATIC_DIR, rel), 'r', encoding='utf-8') as f:
+            sources[rel] = f.read()
+    pages = _read_pages()
+    digest = _sources_digest(sources, pages)
+    if not force:
+        current = _load_current_build(digest)
+        if current is not None:
+            _manifest = current
+            return current
+
+    # Build in a private directory, then publish it under its digest
+    os.makedirs(BUILDS_DIR, exist_ok=True)
+    out_dir = tempfile.mkdtemp(prefix=f".tmp-{os.getpid()}-", dir=BUILDS_DIR)
+
+    mapping = {}
+    pending = dict(sources)
+    while pending:
+        ready = [rel for rel, text in pending.items() if not (_dependencies(rel, text) & pending.keys())]
+        if not ready:
+            ready = list(pending)  # dependency cycle: emit the rest with unresolved refs
+        for rel in ready:
+            data = _rewrite(pending.pop(rel), rel, mapping).encode('utf-8')
+            mapping[rel] = _fingerprint(rel, data)
+            _write_with_sidecars(os.path.join(out_dir, mapping[rel]), data)
+
+    for page, text in pages.items():
+        data = _rewrite(text, page, mapping).encode('utf-8')
+        _write_with_sidecars(os.path.join(out_dir, page), data)
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(mapping, f, indent=4)
+    with open(os.path.join(out_dir, SOURCES_NAME), 'w', encoding='utf-8') as f:
+        f.write(digest)
+
+    build_dir = os.path.join(BUILDS_DIR, digest[:16])
+    try:
+        os.rename(out_dir, build_dir)
+    except OSError:
+        # Another worker published the same sources first (or a forced rebuild
+        # of them is live); its output is identical, keep it
+        shutil.rmtree(out_dir, ignore_errors=True)
+        if not os.path.isdir(build_dir):
+            raise
+    _activate(build_dir)
+    _prune_builds(build_dir)
+    _manifest = mapping
+    return mapping
+
+
+def _activate(build_dir: str):
+    """Point DIST_DIR at build_dir with an atomic symlink replace"""
+    if os.path.isdir(DIST_DIR) and not os.path.islink(DIST_DIR):
+        # A plain directory left by an older tree (first start after upgrading)
+        shutil.rmtree(DIST_DIR, ignore_errors=True)
+    link = f"{DIST_DIR}.{os.getpid()}.link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.relpath(build_dir, os.path.dirname(DIST_DIR)), link)
+    os.replace(link, DIST_DIR)
+    os.utime(build_dir)  # most recently activated, for _prune_builds
+
+
+def _prune_builds(current: str):
+    """Drop old builds, keeping the KEEP_BUILDS most recent (current included)"""
+    builds = []
+    for name in os.listdir(BUILDS_DIR):
+        path = os.path.join(BUILDS_DIR, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if name.startswith("."):
+            # Another worker's build in progress, unless a crash abandoned it long ago
+            if time.time() - mtime > STALE_TMP_SEC:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        builds.append((mtime, path))
+    old = [path for _, path in sorted(builds, reverse=True) if path != current]
+    for path in old[KEEP_BUILDS - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def page_path(page: str) -> str:
+    """Built copy of an HTML page, falling back to the source when not built"""
+    built = os.path.join(DIST_DIR, page)
+    return built if _manifest is not None and os.path.exists(built) else os.path.join(STATIC_DIR, page)
+
+
+if __name__ == "__main__":
+    built = build_assets(force=True)
+    print(f"Built {len(built)} assets into {DIST_DIR} (brotli: {'yes' if brotli else 'no'})")
@@ -1,7 +1,31 @@
-from pydub import AudioSegment
+import io
 import os
+import mmap
+import array
+import threading
 import subprocess
-from gtts import gTTS
+import concurrent.futures
+from core import tts
+from core import metrics
+from core import tracing
+from core.normalize import scan_frames, encoder_padding, DECODER_DELAY
+
+# Compact delivery variants emitted next to every cut clip.
+# Ordered smallest first; "original" (the cut itself) is always the last resort.
+# pydub and numpy are imported by the pydub fallback cut only (see _decode_window,
+# _apply_fades): processes that just serve the game never load them.
+AUDIO_VARIANTS = {
+    "opus_48": {
+        "ext": "opus",
+        "mime": 'audio/ogg; codecs="opus"',
+        "args": ["-codec:a", "libopus", "-b:a", "48k", "-vbr", "on"],
+    },
+    "mp3_64": {
+        "ext": "mp3",
+        "mime": "audio/mpeg",
+        "args": ["-codec:a", "libmp3lame", "-b:a", "64k", "-ac", "1"],
+    },
+}
 
 def cut_audio(input_path: str, start_ms: int, end_ms: int, output_path: str, fade_ms: int = 200):
     """
@@ -33,7 +57,9 @@ def cut_audio(input_path: str, start_ms: int, end_ms: int, output_path: str, fad
             output_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        with metrics.media_job("cut") as job:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            job.ok = result.returncode == 0
         
         if result.returncode == 0:
             return True
@@ -45,14 +71,152 @@ def cut_audio(input_path: str, start_ms: int, end_ms: int, output_path: str, fad
         print(f"Error cutting audio: {e}")
         return _cut_audio_pydub(input_path, start_ms, end_ms, output_path, fade_ms)
 
+def encode_variant(input_path: str, output_path: str, variant: str) -> bool:
+    """Re-encode a clip into one of AUDIO_VARIANTS"""
+    cmd = ["ffmpeg", "-y", "-i", input_path, "-vn"] + AUDIO_VARIANTS[variant]["args"] + [output_path]
+    try:
+        with metrics.media_job("variant") as job:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            job.ok = result.returncode == 0
+        if result.returncode != 0:
+            print(f"ffmpeg variant {variant} error: {result.stderr[-500:]}")
+            return False
+        return True
+    except Exception as e:
+        print(f"Error encoding variant {variant}: {e}")
+        return False
+
+def encode_variants(input_path: str, output_prefix: str, variants=None) -> dict:
+    """
+    Encode all compact variants of a clip in parallel (one ffmpeg per variant).
+    Outputs go to {output_prefix}.{variant}.{ext}.
+    Returns {variant: output_path} for the encodes that succeeded.
+    """
+    variants = list(variants or AUDIO_VARIANTS)
+    outputs = {v: f"{output_prefix}.{v}.{AUDIO_VARIANTS[v]['ext']}" for v in variants}
+    done = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(variants) or 1) as executor:
+        futures = {executor.submit(encode_variant, input_path, outputs[v], v): v for v in variants}
+        for future in concurrent.futures.as_completed(futures):
+            v = futures[future]
+            if future.result():
+                done[v] = outputs[v]
+    return done
+
+def probe_duration(path: str):
+    """Duration of an audio file in seconds (ffprobe), or None if unknown"""
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path]
+    try:
+        with metrics.media_job("probe") as job:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            job.ok = result.returncode == 0
+        if result.returncode == 0:
+            return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        print(f"ffprobe error for {path}: {e}")
+    return None
+
+# MP3 frames decoded ahead of the window. A frame's main data may start up to
+# 511 bytes back in earlier frames (bit reservoir) and the synthesis filter
+# bank needs the previous frame's overlap, so the first frame or two decoded
+# from a cold start are wrong; they only ever land in this pre-roll.
+PYDUB_PREROLL_FRAMES = 4
+FRAME_INDEX_CACHE = 8  # sources whose frame index is kept (the cutter cuts many clips from one)
+
+_frame_indexes = {}  # path -> ((mtime_ns, size), (offsets, stream end, spf, sample rate, skip))
+_frame_indexes_lock = threading.Lock()
+
+def _frame_index(input_path: str, buf):
+    """
+    Frame offsets of an MP3 plus the samples a full decode drops in front
+    (encoder delay from the LAME/Lavc tag + decoder delay), cached per file.
+    None if the file isn't an MP3.
+    """
+    st = os.stat(input_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _frame_indexes_lock:
+        cached = _frame_indexes.get(input_path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with tracing.span("scan mp3 frames", "fs", path=input_path):
+        scanned = scan_frames(buf)
+    index = None
+    if scanned is not None:
+        offsets, stream_end, spf, sample_rate = scanned
+        padding = encoder_padding(buf)
+        # Without a tag nothing is trimmed by a full decode either
+        skip = padding[0] + DECODER_DELAY if padding else 0
+        index = (array.array("q", offsets), stream_end, spf, sample_rate, skip)
+    with _frame_indexes_lock:
+        _frame_indexes.pop(input_path, None)
+        _frame_indexes[input_path] = (stamp, index)
+        while len(_frame_indexes) > FRAME_INDEX_CACHE:
+            del _frame_indexes[next(iter(_frame_indexes))]
+    return index
+
+def _mp3_window(input_path: str, start_ms: int, end_ms: int):
+    """
+    Bytes of the MP3 frames covering [start_ms, end_ms) plus decoder pre-roll,
+    and the time (ms) of their first decoded sample on the timeline a full
+    decode (ffmpeg, pydub) uses. None if the file isn't an MP3.
+    Frames are located by walking the headers, so this is exact for VBR too.
+    """
+    with open(input_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        index = _frame_index(input_path, buf)
+        if index is None:
+            return None
+        offsets, stream_end, spf, sample_rate, skip = index
+        # Raw decoded sample n is at (n - skip) on the full-decode timeline
+        start_sample = start_ms * sample_rate // 1000 + skip
+        end_sample = -(-end_ms * sample_rate // 1000) + skip
+        first = max(0, start_sample // spf - PYDUB_PREROLL_FRAMES)
+        last = min(len(offsets), -(-end_sample // spf) + 1)
+        if first >= last:
+            return None
+        stop = offsets[last] if last < len(offsets) else stream_end
+        return bytes(buf[offsets[first]:stop]), (first * spf - skip) * 1000 / sample_rate
+
+def _decode_window(input_path: str, start_ms: int, end_ms: int) -> "AudioSegment":
+    """Decode only [start_ms, end_ms) of the source, never the whole file"""
+    from pydub import AudioSegment
+    window = _mp3_window(input_path, start_ms, end_ms)
+    if window is not None:
+        data, base_ms = window
+        with tracing.span("decode window", "media", bytes=len(data)):
+            audio = AudioSegment.from_file(io.BytesIO(data), format="mp3")
+        offset = start_ms - base_ms
+        return audio[offset:offset + (end_ms - start_ms)]
+    # Other containers: ffmpeg still decodes up to the start, but only the window is kept
+    with tracing.span("decode window", "media", path=input_path):
+        return AudioSegment.from_file(input_path, start_second=start_ms / 1000.0,
+                                      duration=(end_ms - start_ms) / 1000.0)
+
+_SAMPLE_DTYPES = {2: "int16", 4: "int32"}
+
+def _apply_fades(segment: "AudioSegment", fade_ms: int) -> "AudioSegment":
+    """Linear fade in/out (same curve as ffmpeg afade) applied in place on the PCM"""
+    import numpy as np
+    dtype = _SAMPLE_DTYPES.get(segment.sample_width)
+    if dtype is None:
+        return segment.fade_in(fade_ms).fade_out(fade_ms)
+    pcm = bytearray(segment.raw_data)
+    samples = np.frombuffer(pcm, dtype=dtype).reshape(-1, segment.channels)
+    n = min(len(samples) // 2, int(segment.frame_rate * fade_ms / 1000))
+    if n > 0:
+        ramp = np.linspace(0.0, 1.0, n, endpoint=False)[:, None]
+        samples[:n] = samples[:n] * ramp
+        samples[-n:] = samples[-n:] * ramp[::-1]
+    return segment._spawn(pcm)
+
 def _cut_audio_pydub(input_path: str, start_ms: int, end_ms: int, output_path: str, fade_ms: int = 200):
-    """Fallback pydub-based cut."""
+    """Fallback pydub-based cut. Memory is bounded by the window, not the source."""
     try:
-        audio = AudioSegment.from_file(input_path)
-        segment = audio[start_ms:end_ms]
-        if fade_ms > 0:
-            segment = segment.fade_in(fade_ms).fade_out(fade_ms)
-        segment.export(output_path, format="mp3")
+        with metrics.media_job("cut_pydub"):
+            segment = _decode_window(input_path, start_ms, end_ms)
+            if fade_ms > 0:
+                segment = _apply_fades(segment, fade_ms)
+            with tracing.span("export mp3", "media"):
+                segment.export(output_path, format="mp3")
         return True
     except Exception as e:
         print(f"Error cutting with pydub: {e}")
@@ -79,51 +243,21 @@ def impose_rhythm(text: str) -> str:
 
 def apply_singing_effect(input_path: str, output_path: str):
     """
-    Uses ffmpeg audio filters to transform flat TTS into a singing/chanting voice:
-    - vibrato: pitch wobble (like a singer holding a note)
-    - tremolo: volume oscillation (breathing/dynamics)
-    - asetrate + atempo: raise pitch slightly (brighter, more musical)
-    - chorus: adds depth and richness
+    Uses ffmpeg audio filters to transform flat TTS into a singing/chanting voice
+    (pitch shift, vibrato, tremolo, chorus, echo; see core.tts.SINGING_FILTERS).
     """
-    # Build the ffmpeg filter chain
-    filters = []
-    
-    # 1. Raise pitch by ~15% without changing speed
-    #    asetrate raises sample rate (pitch up), atempo compensates speed
-    filters.append("asetrate=44100*1.15")
-    filters.append("atempo=1/1.15")
-    filters.append("aresample=44100")
-    
-    # 2. Vibrato: gentle pitch oscillation (singer's vibrato)
-    #    f=5 Hz oscillation, d=0.3 = 30% depth
-    filters.append("vibrato=f=5:d=0.3")
-    
-    # 3. Tremolo: volume oscillation for dynamics
-    #    f=3 Hz, d=0.4 = 40% depth
-    filters.append("tremolo=f=3:d=0.4")
-    
-    # 4. Chorus effect: adds richness/fullness
-    #    delays | decays | speeds | depths
-    filters.append("chorus=0.5:0.9:50|60:0.4|0.32:0.25|0.4:2|2.3")
-    
-    # 5. Small reverb via aecho for "stage" feel
-    filters.append("aecho=0.8:0.7:40:0.3")
-    
-    # 6. Speed up slightly for energy
-    filters.append("atempo=1.15")
-    
-    filter_str = ",".join(filters)
-    
     cmd = [
         "ffmpeg", "-y",
         "-i", input_path,
-        "-af", filter_str,
+        "-af", tts.SINGING_FILTERS,
         "-q:a", "2",
         output_path
     ]
     
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        with metrics.media_job("singing") as job:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            job.ok = result.returncode == 0
         if result.returncode != 0:
             print(f"ffmpeg error: {result.stderr[-500:]}")
             return False
@@ -132,32 +266,17 @@ def apply_singing_effect(input_path: str, output_path: str):
         print(f"ffmpeg exception: {e}")
         return False
 
-def generate_voice(text: str, output_path: str):
+def generate_voice(text: str, output_path: str, engine=None):
     """
-    Generates a singing-style vocal for loto calling:
-    1. gTTS generates base voice
-    2. ffmpeg applies singing effects (vibrato, tremolo, chorus, pitch shift)
+    Generates a singing-style vocal for loto calling.
+    The TTS engine's bytes are piped through the singing filter chain in memory
+    (no temp files); if the effects fail the plain voice is written instead,
+    without a second TTS request.
     """
     try:
-        # 1. Apply rhythm formatting
-        rhythmic_text = impose_rhythm(text)
-        
-        # 2. Generate base TTS
-        tts = gTTS(text=rhythmic_text, lang='vi')
-        temp_tts = output_path.replace(".mp3", "_tts.mp3")
-        tts.save(temp_tts)
-        
-        # 3. Apply singing effects via ffmpeg
-        success = apply_singing_effect(temp_tts, output_path)
-        
-        # Cleanup
-        if os.path.exists(temp_tts):
-            os.remove(temp_tts)
-        
-        if not success:
-            # Fallback: just use the raw TTS if effects fail
-            tts.save(output_path)
-            
+        data, _ = tts.render(engine or tts.GTTSEngine(), impose_rhythm(text), tts.SINGING_FILTERS)
+        with tracing.span("write voice", "fs", bytes=len(data)), open(output_path, "wb") as f:
+            f.write(data)
         return True
     except Exception as e:
         print(f"Error generating voice: {e}")
@@ -0,0 +1,191 @@
+import time
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Server-side auto-call mode.
+# The loop draws uncalled numbers at random and runs call -> clip -> done ->
+# interval. While a clip plays, the following number is already drawn and its
+# audio prepared (clip lookup or TTS, variant encodes), and a preload hint is
+# published, so the gap between calls is the configured interval rather than
+# request latency.
+DEFAULT_INTERVAL = 3.0   # seconds between the end of one clip and the next call
+MIN_INTERVAL = 0.5
+MAX_INTERVAL = 60.0
+FALLBACK_DURATION = 5.0  # seconds, when a clip's duration is unknown
+MAX_NUMBER = 99
+
+
+class AutoCaller:
+    """
+    Drives the game through callbacks supplied by the app:
+      prepare(number) -> awaitable dict with "duration" (seconds, may be None)
+      call(number, prepared) -> awaitable; must bump game_state["play_id"]
+                                 and clear the preload hint
+      done() -> awaitable
+      hint(prepared or None) -> publish / clear the preload hint for the next call
+      publish() -> broadcast a change of status()
+
+    Reads game_state for the called numbers, pause flag and playback rate, so
+    the regular pause button pauses the schedule too. The app calls wake()
+    whenever game state changes.
+    """
+
+    def __init__(self, game_state: dict, prepare, call, done, hint, publish):
+        self.game_state = game_state
+        self._prepare = prepare
+        self._call = call
+        self._done = done
+        self._hint = hint
+        self._publish = publish
+        self.interval = DEFAULT_INTERVAL
+        self.enabled = False
+        self._task = None
+        self._next = None        # task -> (number, prepared) for the following call
+        self._override = None    # number forced by the admin for the next call
+        self._skip = False       # cut the current wait short
+        self._wake = asyncio.Event()
+
+    def status(self) -> dict:
+        return {"enabled": self.enabled, "interval": self.interval}
+
+    def wake(self):
+        self._wake.set()
+
+    # --- Control ---
+
+    def start(self, interval: float = None):
+        if interval is not None:
+            self.interval = min(max(float(interval), MIN_INTERVAL), MAX_INTERVAL)
+        self.enabled = True
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._publish()
+
+    def stop(self):
+        """Stop after the current clip; it still gets its done()"""
+        self.enabled = False
+        self._cancel_next()
+        self.wake()
+        self._publish()
+
+    def override(self, number: int = None):
+        """
+        Manual override: end the current wait now and call `number` next
+        (a fresh random draw when None).
+        """
+        self._override = number
+        if number is not None:
+            self._cancel_next()
+        self._skip = True
+        self.wake()
+
+    # --- Loop ---
+
+    def _uncalled(self) -> list:
+        taken = {c["number"] for c in self.game_state["called_numbers"]}
+        if self.game_state["current_number"] is not None:
+            taken.add(self.game_state["current_number"])
+        return [n for n in range(MAX_NUMBER + 1) if n not in taken]
+
+    def _cancel_next(self):
+        if self._next is not None:
+            self._next.cancel()
+            self._next = None
+            self._hint(None)
+
+    async def _draw_and_prepare(self, number: int = None):
+        if number is None:
+            remaining = self._uncalled()
+            if not remaining:
+                return None, None
+            number = random.choice(remaining)
+        start = time.perf_counter()
+        try:
+            prepared = await self._prepare(number)
+        except Exception as e:
+            logger.error(f"Auto-call: preparing {number} failed: {e}")
+            prepared = {"audio_url": "", "duration": None}
+        logger.debug(f"Auto-call: prepared {number} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return number, prepared
+
+    async def _take_next(self):
+        """The number to call now, reusing the pipelined draw when still valid"""
+        if self._override is not None:
+            number, self._override = self._override, None
+            if number in self._uncalled():
+                return await self._draw_and_prepare(number)
+        task, self._next = self._next, None
+        if task is not None and not task.cancelled():
+            number, prepared = await task
+            # A manual call may have taken the pre-drawn number meanwhile
+            if number is not None and number in self._uncalled():
+                return number, prepared
+        return await self._draw_and_prepare()
+
+    async def _wait(self, seconds: float, stoppable: bool = True):
+        """Sleep for `seconds` of unpaused time; override() (or stop(), if stoppable) ends it early"""
+        remaining = seconds
+        loop = asyncio.get_running_loop()
+        while (self.enabled or not stoppable) and not self._skip:
+            self._wake.clear()
+            if self.game_state["is_paused"]:
+                await self._wake.wait()
+                continue
+            if remaining <= 0:
+                return
+            started = loop.time()
+            try:
+                await asyncio.wait_for(self._wake.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+            remaining -= loop.time() - started
+
+    async def _wait_until_idle(self):
+        """Let a manually called clip finish before the next auto call"""
+        while self.enabled and self.game_state["status"] == "playing":
+            self._wake.clear()
+            await self._wake.wait()
+
+    async def _run(self):
+        try:
+            while self.enabled:
+                await self._wait_until_idle()
+                number, prepared = await self._take_next()
+                if not self.enabled:
+                    break
+                if number is None:
+                    logger.info("Auto-call: every number has been called")
+                    break
+                self._skip = False
+                await self._call(number, prepared)
+                play_id = self.game_state["play_id"]
+
+                # Pipeline: draw and prepare the following number while this clip plays
+                self._next = asyncio.create_task(self._draw_and_prepare())
+                self._next.add_done_callback(self._on_prepared)
+
+                duration = prepared.get("duration") or FALLBACK_DURATION
+                rate = self.game_state.get("playback_rate") or 1.0
+                await self._wait(duration / rate, stoppable=False)
+                # Skip done() if someone else has called over this clip
+                if self.game_state["play_id"] == play_id and self.game_state["status"] == "playing":
+                    await self._done()
+                await self._wait(self.interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Auto-call stopped: {e}")
+        finally:
+            self.enabled = False
+            self._task = None
+            self._cancel_next()
+            self._publish()
+
+    def _on_prepared(self, task: asyncio.Task):
+        if task is self._next and not task.cancelled() and task.exception() is None:
+            number, prepared = task.result()
+            if number is not None:
+                self._hint(prepared)
@@ -0,0 +1,162 @@
+import os
+import json
+import threading
+import concurrent.futures
+from core.clips import file_digest
+
+# Metadata catalog of the full songs (data/songs/full).
+# Entries are keyed by (name, size, mtime) and persisted, so a restart or a
+# refresh only probes files that were added or changed. Probing (mutagen
+# header parse + content hash) runs on a small thread pool off the request
+# path. Cheap, fast-changing facts (normalization marker, cached analysis,
+# segment counts) are joined in when the listing is served.
+CATALOG_PATH = "data/cutter/catalog.json"
+PROBE_WORKERS = 4
+
+
+def probe(path: str) -> dict:
+    """Header facts of one mp3, plus its content digest"""
+    from mutagen.mp3 import MP3, BitrateMode
+    info = MP3(path).info
+    modes = {BitrateMode.CBR: "cbr", BitrateMode.VBR: "vbr", BitrateMode.ABR: "abr"}
+    return {
+        "duration": round(info.length, 3),
+        "bitrate": info.bitrate,
+        "bitrate_mode": modes.get(info.bitrate_mode, "unknown"),
+        "sample_rate": info.sample_rate,
+        "channels": info.channels,
+        "digest": file_digest(path),
+    }
+
+
+class Catalog:
+    def __init__(self, full_songs_dir: str, marker_dir: str, number_json_path: str,
+                 path: str = CATALOG_PATH):
+        self.full_songs_dir = full_songs_dir
+        self.marker_dir = marker_dir
+        self.number_json_path = number_json_path
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = self._load()   # name -> entry
+        self._refreshing = False
+        self._segment_counts = (None, {})  # (number.json stamp, {file: count})
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def _scan(self) -> dict:
+        """{name: (size, mtime_ns)} of the listable full songs"""
+        found = {}
+        if not os.path.isdir(self.full_songs_dir):
+            return found
+        for name in os.listdir(self.full_songs_dir):
+            if name.endswith(".mp3") and not name.endswith(".tmp.mp3"):
+                try:
+                    st = os.stat(os.path.join(self.full_songs_dir, name))
+                except OSError:
+                    continue
+                found[name] = (st.st_size, st.st_mtime_ns)
+        return found
+
+    def refresh(self, workers: int = PROBE_WORKERS) -> int:
+        """Probe new or changed files; returns how many were (re)probed"""
+        found = self._scan()
+        with self._lock:
+            changed = [name for name, (size, mtime_ns) in found.items()
+                       if (self._entries.get(name, {}).get("size"), self._entries.get(name, {}).get("mtime_ns"))
+                       != (size, mtime_ns)]
+            removed = [name for name in self._entries if name not in found]
+            for name in removed:
+                del self._entries[name]
+
+        results = {}
+        if changed:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(changed))) as pool:
+                futures = {pool.submit(probe, os.path.join(self.full_songs_dir, name)): name for name in changed}
+                for future in concurrent.futures.as_completed(futures):
+                    name = futures[future]
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print(f"Failed to probe {name}: {e}")
+                        results[name] = {"error": str(e)}
+
+        if changed or removed:
+            with self._lock:
+                for name, facts in results.items():
+                    size, mtime_ns = found[name]
+                    self._entries[name] = dict(facts, name=name, size=size, mtime_ns=mtime_ns)
+                self._save()
+        return len(changed)
+
+    def refresh_in_background(self):
+        """Start a refresh unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Catalog refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="catalog-refresh", daemon=True).start()
+
+    def _segments_by_file(self) -> dict:
+        try:
+            st = os.stat(self.number_json_path)
+        except OSError:
+            return {}
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._segment_counts[0] != stamp:
+            counts = {}
+            try:
+                with open(self.number_json_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for segments in data.values():
+                    for seg in segments:
+                        name = seg.get("file", "")
+                        if name.endswith(".tmp.mp3"):
+                            name = name[:-len(".tmp.mp3")]
+                        counts[name] = counts.get(name, 0) + 1
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Catalog: could not count segments: {e}")
+            self._segment_counts = (stamp, counts)
+        return self._segment_counts[1]
+
+    def listing(self) -> dict:
+        """Every full song with its metadata; files not yet probed are marked pending"""
+        from core import analysis  # numpy-backed; only the cutter pages need it
+        found = self._scan()
+        markers = set(os.listdir(self.marker_dir)) if os.path.isdir(self.marker_dir) else set()
+        segments = self._segments_by_file()
+        files = []
+        with self._lock:
+            for name in sorted(found):
+                size, mtime_ns = found[name]
+                entry = self._entries.get(name)
+                if entry and (entry["size"], entry["mtime_ns"]) == (size, mtime_ns):
+                    entry = dict(entry)
+                else:
+                    entry = {"name": name, "size": size, "mtime_ns": mtime_ns, "pending": True}
+                digest = entry.get("digest")
+                entry["normalized"] = name + ".ok" in markers
+                entry["analyzed"] = bool(digest) and os.path.exists(analysis.cache_path(digest))
+                entry["segments"] = segments.get(name, 0)
+                files.append(entry)
+        return {"files": files, "refreshing": self._refreshing}
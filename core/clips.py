@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+from core.audio import AUDIO_VARIANTS, encode_variants
+
+# Content-addressed clip store.
+# Every cut clip is also published as data/songs/hashed/{digest}.mp3 so its URL
+# changes whenever its bytes change. That makes the URL safe to cache forever
+# and lets identical clips shared by several numbers collapse to one file.
+HASHED_DIR = "data/songs/hashed"
+HASHED_URL_PREFIX = "/media"
+MANIFEST_PATH = "data/cutter/manifest.json"
+
+DIGEST_LEN = 16  # hex chars of sha256 kept in filenames
+
+_lock = threading.Lock()
+_manifest = None  # {seg_id: {"hash", "number", "size", "variants": {name: filename}}}
+_by_hash = None   # {hash: {seg_id, ...}}, reverse index over _manifest (identical clips share a hash)
+_variant_failures = set()  # seg_ids whose variant encode failed this process
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file, truncated to DIGEST_LEN hex chars"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()[:DIGEST_LEN]
+
+
+def load_manifest() -> dict:
+    """Load (and cache) the segment id -> hash manifest"""
+    global _manifest, _by_hash
+    if _manifest is not None:
+        return _manifest
+    with _lock:
+        if _manifest is None:
+            data = {}
+            if os.path.exists(MANIFEST_PATH):
+                try:
+                    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except Exception as e:
+                    print(f"Corrupted clip manifest, rebuilding: {e}")
+            _by_hash = {}
+            for seg_id, entry in data.items():
+                _by_hash.setdefault(entry["hash"], set()).add(seg_id)
+            _manifest = data
+    return _manifest
+
+
+def _save_manifest(data: dict):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def hashed_path(digest: str, ext: str = "mp3") -> str:
+    return os.path.join(HASHED_DIR, f"{digest}.{ext}")
+
+
+def hashed_url(digest: str, ext: str = "mp3") -> str:
+    return f"{HASHED_URL_PREFIX}/{digest}.{ext}"
+
+
+def _store(source_path: str, ext: str) -> str:
+    """Copy a file into the store under its digest (no-op if already there)"""
+    digest = file_digest(source_path)
+    target = hashed_path(digest, ext)
+    os.makedirs(HASHED_DIR, exist_ok=True)
+    if not os.path.exists(target):
+        # Private temp name: concurrent publishes of the same content don't share it
+        fd, tmp_target = tempfile.mkstemp(prefix=f".{digest}.", dir=HASHED_DIR)
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_target)
+            os.chmod(tmp_target, 0o644)  # mkstemp creates 0600; store files are served
+            os.replace(tmp_target, target)
+        except OSError:
+            try: os.remove(tmp_target)
+            except OSError: pass
+            raise
+    return digest
+
+
+def publish_clip(source_path: str, seg_id: str, number: str = "") -> str:
+    """
+    Publish a freshly cut clip into the content-addressed store.
+    Identical content is stored once. The bytes are copied rather than hard
+    linked: a later re-cut rewrites source_path in place and must never touch
+    a published file.
+    Returns the digest recorded for seg_id.
+    """
+    digest = _store(source_path, "mp3")
+
+    manifest = load_manifest()
+    with _lock:
+        old = manifest.get(seg_id) or {}
+        if old.get("hash") and old["hash"] != digest:
+            _unindex(old["hash"], seg_id)
+        manifest[seg_id] = {
+            "hash": digest,
+            "number": str(number),
+            "size": os.path.getsize(hashed_path(digest)),
+            # Variants of the previous content are stale after a re-cut
+            "variants": old.get("variants", {}) if old.get("hash") == digest else {},
+        }
+        _by_hash.setdefault(digest, set()).add(seg_id)
+        _save_manifest(manifest)
+    return digest
+
+
+def _unindex(digest: str, seg_id: str):
+    seg_ids = _by_hash.get(digest)
+    if seg_ids is not None:
+        seg_ids.discard(seg_id)
+        if not seg_ids:
+            del _by_hash[digest]
+
+
+def build_variants(seg_id: str) -> dict:
+    """
+    Encode the compact variants of a published clip and add them to the store.
+    Variants are encoded from the published original, never from the mutable
+    cut file. Returns {variant: filename} as recorded in the manifest.
+    """
+    entry = load_manifest().get(seg_id)
+    if not entry:
+        return {}
+    source_path = hashed_path(entry["hash"])
+    missing = [v for v in AUDIO_VARIANTS if v not in entry.get("variants", {})]
+    if not missing:
+        return entry["variants"]
+
+    os.makedirs(HASHED_DIR, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=".variants_", dir=HASHED_DIR)
+    try:
+        encoded = encode_variants(source_path, os.path.join(work_dir, seg_id), missing)
+        stored = {}
+        for variant, path in encoded.items():
+            ext = AUDIO_VARIANTS[variant]["ext"]
+            stored[variant] = f"{_store(path, ext)}.{ext}"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if len(stored) < len(missing):
+        # Don't re-run a failing encode on every call
+        _variant_failures.add(seg_id)
+
+    with _lock:
+        entry = load_manifest().get(seg_id)
+        if entry is None or hashed_path(entry["hash"]) != source_path:
+            return {}
+        entry.setdefault("variants", {}).update(stored)
+        _save_manifest(load_manifest())
+        return dict(entry["variants"])
+
+
+def resolve_url(seg_id: str, source_path: str, number: str = "") -> Optional[str]:
+    """
+    Return the immutable URL for a clip.
+    Clips cut before the store existed are published lazily on first use.
+    Returns None when the clip cannot be published.
+    """
+    entry = load_manifest().get(seg_id)
+    if entry and os.path.exists(hashed_path(entry["hash"])):
+        return hashed_url(entry["hash"])
+    try:
+        return hashed_url(publish_clip(source_path, seg_id, number))
+    except OSError as e:
+        print(f"Error publishing clip {seg_id}: {e}")
+        return None
+
+
+def missing_variants(seg_id: str) -> bool:
+    if seg_id in _variant_failures:
+        return False
+    entry = load_manifest().get(seg_id)
+    return bool(entry) and any(v not in entry.get("variants", {}) for v in AUDIO_VARIANTS)
+
+
+def variant_urls(seg_id: str) -> dict:
+    """{"original": url, variant: url, ...} for a published clip"""
+    entry = load_manifest().get(seg_id)
+    if not entry:
+        return {}
+    urls = {"original": hashed_url(entry["hash"])}
+    for variant, filename in entry.get("variants", {}).items():
+        urls[variant] = f"{HASHED_URL_PREFIX}/{filename}"
+    return urls
+
+
+def seg_id_for_url(url: str, seg_id: str = None):
+    """
+    Map a clip URL (hashed or /data/songs/.../{seg_id}.mp3) back to its segment id.
+    A deduplicated hashed URL belongs to several segments: seg_id, when it is one
+    of them, picks the caller's own; otherwise the first in sorted order is used.
+    """
+    if not url:
+        return None
+    stem = os.path.splitext(os.path.basename(url.split("?")[0]))[0]
+    load_manifest()
+    if url.startswith(HASHED_URL_PREFIX + "/"):
+        seg_ids = _by_hash.get(stem)
+        if not seg_ids:
+            return None
+        return seg_id if seg_id in seg_ids else min(seg_ids)
+    return stem if stem in _manifest else None
+
+
+def select_url(variants: dict, quality: str = "high", formats=None):
+    """
+    Pick the smallest acceptable variant.
+    quality "high" always gets the original; "low" gets the first variant
+    (AUDIO_VARIANTS is ordered smallest first) whose extension is in formats.
+    """
+    if quality == "low":
+        for variant, spec in AUDIO_VARIANTS.items():
+            if variant in variants and (not formats or spec["ext"] in formats):
+                return variants[variant]
+    return variants.get("original")
+
+
+def _recent(digest: str, cutoff: float) -> bool:
+    try:
+        return os.path.getmtime(hashed_path(digest)) > cutoff
+    except OSError:
+        return False
+
+
+def prune_manifest(live_seg_ids: set, grace: float = 120.0) -> int:
+    """
+    Drop manifest entries of segments that no longer exist, so the store
+    files only they referenced become orphans. Clips published within grace
+    seconds are kept: a fresh cut is published before number.json is saved.
+    Returns how many entries were dropped.
+    """
+    manifest = load_manifest()
+    cutoff = time.time() - grace
+    with _lock:
+        stale = [seg_id for seg_id, entry in manifest.items()
+                 if seg_id not in live_seg_ids and not _recent(entry["hash"], cutoff)]
+        for seg_id in stale:
+            _unindex(manifest.pop(seg_id)["hash"], seg_id)
+            _variant_failures.discard(seg_id)
+        if stale:
+            _save_manifest(manifest)
+    return len(stale)
+
+
+def referenced_files() -> set:
+    """All store filenames still referenced by the manifest"""
+    names = set()
+    manifest = load_manifest()
+    with _lock:
+        entries = list(manifest.values())
+    for entry in entries:
+        names.add(f"{entry['hash']}.mp3")
+        names.update(entry.get("variants", {}).values())
+    return names
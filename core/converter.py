@@ -1,3 +1,5 @@
+import string
+
 def number_to_vietnamese(num: int) -> str:
     """
     Converts a number (0-99) to Vietnamese text in a short "loto" style.
@@ -52,15 +54,14 @@ def number_to_vietnamese(num: int) -> str:
 
     return f"{tens_str} {units_str}"
 
+_PUNCTUATION_TO_SPACE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
 def normalize_text(text: str) -> str:
     """
     Normalize text for searching.
     - Lowercase
     - Remove punctuation
     """
-    import string
-    text = text.lower()
-    # Remove common punctuation
-    for char in string.punctuation:
-        text = text.replace(char, " ")
+    # Remove common punctuation (one translate pass; the lyrics index calls this per line)
+    text = text.lower().translate(_PUNCTUATION_TO_SPACE)
     return " ".join(text.split())
@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import time
+import threading
+
+# Append-only game journal.
+# Every broadcast revision is appended as one line: [revision, {changed keys}].
+# A list that only grew (called_numbers) is written as {"key+": [new items]}.
+# Writes land in a buffered file; a background thread flushes and fsyncs them in
+# batches, so the request path only pays for a json.dumps and a buffer write.
+# Periodically the full state is snapshotted and older segments are dropped.
+# Recovery = load snapshot, then replay newer lines from the remaining segments.
+JOURNAL_DIR = "data/game"
+SNAPSHOT_NAME = "snapshot.json"
+SEGMENT_RE = re.compile(r"^journal-(\d+)\.log$")
+
+FSYNC_INTERVAL = 0.05    # seconds between batched fsyncs
+SNAPSHOT_EVERY = 1000    # events between snapshots
+
+
+def _segment_name(start_revision: int) -> str:
+    return f"journal-{start_revision:012d}.log"
+
+
+def _fsync_write(path: str, data: str):
+    """Durably replace path with data"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _truncate_torn_tail(path: str):
+    """Cut a segment back to its last complete line (a crash can leave a torn one)"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    with open(path, 'rb+') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            chunk = f.read(end - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class Journal:
+    def __init__(self, directory: str = JOURNAL_DIR, fsync_interval: float = FSYNC_INTERVAL,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._file = None
+        self._dirty = False
+        self._since_snapshot = 0
+        self._latest = None  # (revision, full state) for the next snapshot
+        self._lists = {}     # key -> last journaled list, for append-only encoding
+        self._closed = False
+        self._thread = None
+
+    # --- Recovery ---
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            m = SEGMENT_RE.match(name)
+            if m:
+                found.append((int(m.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def recover(self):
+        """
+        Rebuild the last journaled state.
+        Returns (revision, state), or (0, None) when there is nothing to recover.
+        A torn final line (crash mid-write) is ignored.
+        """
+        revision, state = 0, None
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            try:
+                with open(snapshot_path, 'r', encoding='utf-8') as f:
+                    snap = json.load(f)
+                revision, state = snap["revision"], snap["state"]
+            except (ValueError, KeyError) as e:
+                print(f"Ignoring unreadable journal snapshot: {e}")
+
+        for _, path in self._segments():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rev, delta = json.loads(line)
+                    except ValueError:
+                        break  # torn write: nothing after it was acknowledged by fsync
+                    if rev <= revision:
+                        continue
+                    if state is None:
+                        state = {}
+                    for key, value in delta.items():
+                        if key.endswith("+"):
+                            state.setdefault(key[:-1], []).extend(value)
+                        else:
+                            state[key] = value
+                    revision = rev
+        return revision, state
+
+    # --- Appending ---
+
+    def open(self, revision: int):
+        """Start a fresh segment after `revision` and the background flusher"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._closed = False
+        self._file = self._open_segment(revision + 1)
+        self._thread = threading.Thread(target=self._flusher, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    def _open_segment(self, start_revision: int):
+        """
+        Open the segment whose first revision is start_revision, for appending.
+        It exists already when a crash lost everything it held past recovery's
+        revision; drop its torn tail first, or the next recovery would stop at
+        the torn line and miss every event appended after it.
+        """
+        path = os.path.join(self.directory, _segment_name(start_revision))
+        _truncate_torn_tail(path)
+        return open(path, 'a', encoding='utf-8')
+
+    def _compact(self, delta: dict) -> dict:
+        """Replace lists that only had items appended with their new tail"""
+        out = {}
+        for key, value in delta.items():
+            if isinstance(value, list):
+                prev = self._lists.get(key)
+                if prev is not None and len(value) > len(prev) and all(a is b for a, b in zip(prev, value)):
+                    out[key + "+"] = value[len(prev):]
+                else:
+                    out[key] = value
+                self._lists[key] = value
+            else:
+                out[key] = value
+        return out
+
+    def append(self, revision: int, delta: dict, state: dict):
+        """
+        Record one revision. Not durable until the next batched fsync
+        (at most fsync_interval later). Lists in delta must not be mutated
+        afterwards (notify_clients passes fresh copies).
+        """
+        line = json.dumps([revision, self._compact(delta)], ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._dirty = True
+            self._since_snapshot += 1
+            self._latest = (revision, state)
+        if self._since_snapshot >= self.snapshot_every:
+            self._wake.set()
+
+    def _flusher(self):
+        while not self._closed:
+            self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            self.sync()
+            if self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
+
+    def sync(self):
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            self._file.flush()
+            fd = self._file.fileno()
+            self._dirty = False
+        try:
+            os.fsync(fd)
+        except OSError as e:
+            print(f"Journal fsync failed: {e}")
+
+    def snapshot(self):
+        """Write the latest state durably, then drop the segments it covers"""
+        with self._lock:
+            if self._latest is None or self._file is None:
+                return
+            revision, state = self._latest
+            # Rotate so everything after `revision` lands in a new segment
+            self._file.flush()
+            old_file = self._file
+            self._file = self._open_segment(revision + 1)
+            self._since_snapshot = 0
+        os.fsync(old_file.fileno())
+        old_file.close()
+
+        _fsync_write(os.path.join(self.directory, SNAPSHOT_NAME),
+                     json.dumps({"revision": revision, "state": state, "taken_at": time.time()}, ensure_ascii=False))
+
+        for start, path in self._segments():
+            if start <= revision:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Failed to remove journal segment {path}: {e}")
+
+    def close(self):
+        """Flush, fsync and snapshot; used on shutdown"""
+        self._closed = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.sync()
+        if self._since_snapshot:
+            self.snapshot()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
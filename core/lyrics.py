@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import threading
+from itertools import product
+from core.converter import number_to_vietnamese, normalize_text
+
+# Inverted index over timed lyrics, used by the cutter to suggest where a
+# number is sung in a long source.
+#
+# Sources:
+#   - sidecar lyric files next to full songs: full3.lrc / full3.vtt -> full3.mp3
+#   - segments with lyric_text in data/lyrics/data.json
+# Each source is indexed on its own and keyed by (mtime, size), so refresh()
+# only re-reads sources that changed.
+LYRIC_EXTENSIONS = (".lrc", ".vtt")
+MAX_LINE_MS = 10000   # .lrc lines end at the next timestamp, capped (instrumental gaps, last line)
+PAD_MS = 1500         # suggested ranges start/end this far around the sung phrase
+
+_LRC_TIME_RE = re.compile(r"\[(\d+):(\d+(?:\.\d+)?)\]")
+_VTT_CUE_RE = re.compile(r"(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)\s+-->\s+(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# Spoken alternatives per digit, besides the number_to_vietnamese form
+_UNIT_VARIANTS = {
+    1: ("một", "mốt"),
+    4: ("bốn", "tư"),
+    5: ("năm", "lăm", "nhăm"),
+}
+_TENS_LINK = ("", "mươi")  # "hai tám" / "hai mươi tám"
+
+# Words that continue a number when sung next to it ("không" is left out: it
+# mostly means "not"). A match touching one of them is part of a longer number.
+_NUMBER_WORDS = frozenset(
+    [number_to_vietnamese(n) for n in range(1, 10)]
+    + [w for variants in _UNIT_VARIANTS.values() for w in variants]
+    + ["mươi", "mười"]
+)
+
+
+def tokenize(text: str) -> list:
+    return normalize_text(text).split()
+
+
+def number_phrases(number: int) -> list:
+    """
+    Token tuples a singer may use for the number, canonical form first.
+    e.g. 25 -> ("hai", "lăm"), ("hai", "năm"), ("hai", "nhăm"), ("hai", "mươi", "năm"), ...
+    """
+    canonical = tuple(number_to_vietnamese(number).split())
+    phrases = [canonical]
+    tens, units = divmod(number, 10)
+    if tens >= 2 and units:
+        tens_word = number_to_vietnamese(tens)
+        for link, unit in product(_TENS_LINK, _UNIT_VARIANTS.get(units, (number_to_vietnamese(units),))):
+            phrases.append(tuple(w for w in (tens_word, link, unit) if w))
+    elif tens == 1 and units:
+        for unit in _UNIT_VARIANTS.get(units, ()):
+            if unit != "một":  # "mười một" is already canonical
+                phrases.append(("mười", unit))
+    elif tens == 0 and number == 4:
+        phrases.append(("tư",))
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(phrases))
+
+
+def _bounded(tokens: list, pos: int, size: int) -> bool:
+    """
+    False when the phrase at tokens[pos:pos + size] is only part of a longer
+    number: "hai mươi" inside "hai mươi lăm", "năm" inside "hai mươi năm".
+    """
+    before = tokens[pos - 1] if pos > 0 else None
+    after = tokens[pos + size] if pos + size < len(tokens) else None
+    return before not in _NUMBER_WORDS and after not in _NUMBER_WORDS
+
+
+def _parse_lrc(content: str) -> list:
+    """[(start_ms, end_ms, text)] from an .lrc file"""
+    stamped = []
+    for raw in content.splitlines():
+        times = _LRC_TIME_RE.findall(raw)
+        if not times:
+            continue
+        text = _LRC_TIME_RE.sub("", raw).strip()
+        for minutes, seconds in times:
+            stamped.append((int((int(minutes) * 60 + float(seconds)) * 1000), text))
+    stamped.sort(key=lambda item: item[0])
+    lines = []
+    for i, (start, text) in enumerate(stamped):
+        end = start + MAX_LINE_MS
+        if i + 1 < len(stamped):
+            end = min(end, stamped[i + 1][0])
+        if text:
+            lines.append((start, end, text))
+    return lines
+
+
+def _vtt_ms(hours, minutes, seconds) -> int:
+    return int(((int(hours or 0) * 60 + int(minutes)) * 60 + float(seconds)) * 1000)
+
+
+def _parse_vtt(content: str) -> list:
+    """[(start_ms, end_ms, text)] from a WebVTT file (e.g. yt-dlp subtitles)"""
+    lines = []
+    for block in re.split(r"\n\s*\n", content.replace("\r", "")):
+        rows = block.strip().split("\n")
+        for i, row in enumerate(rows):
+            m = _VTT_CUE_RE.search(row)
+            if m:
+                text = _TAG_RE.sub("", " ".join(rows[i + 1:])).strip()
+                if text:
+                    lines.append((_vtt_ms(*m.group(1, 2, 3)), _vtt_ms(*m.group(4, 5, 6)), text))
+                break
+    return lines
+
+
+class _SourceIndex:
+    """Postings for one source: token -> [(line, position)]"""
+
+    def __init__(self, source: str, lines: list):
+        self.source = source
+        self.lines = []       # (start_ms, end_ms, text, tokens)
+        self.postings = {}
+        for start, end, text in lines:
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            line_id = len(self.lines)
+            self.lines.append((start, end, text, tokens))
+            for pos, token in enumerate(tokens):
+                self.postings.setdefault(token, []).append((line_id, pos))
+
+    def find(self, phrase: tuple):
+        """(line_id, position) of every occurrence of the token phrase"""
+        first = self.postings.get(phrase[0])
+        if not first or any(token not in self.postings for token in phrase[1:]):
+            return []
+        if len(phrase) == 1:
+            return first
+        size = len(phrase)
+        return [(line, pos) for line, pos in first
+                if tuple(self.lines[line][3][pos:pos + size]) == phrase]
+
+
+class LyricsIndex:
+    def __init__(self, full_songs_dir: str, data_path: str):
+        self.full_songs_dir = full_songs_dir
+        self.data_path = data_path
+        self._lock = threading.Lock()
+        self._sources = {}    # source key -> (stamp, [_SourceIndex])
+
+    def _stamp(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, key: str, path: str) -> list:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        if key == "data.json":
+            indexes = []
+            for song in json.loads(content or "[]"):
+                lines = [(s["start_time"], s["end_time"], s.get("lyric_text", ""))
+                         for s in song.get("segments", []) if s.get("lyric_text")]
+                if lines:
+                    indexes.append(_SourceIndex(song.get("song_id", ""), lines))
+            return indexes
+        audio_file = os.path.splitext(os.path.basename(path))[0] + ".mp3"
+        lines = _parse_vtt(content) if path.endswith(".vtt") else _parse_lrc(content)
+        return [_SourceIndex(audio_file, lines)]
+
+    def refresh(self) -> int:
+        """Re-index sources whose files changed; returns how many were rebuilt"""
+        paths = {"data.json": self.data_path}
+        if os.path.isdir(self.full_songs_dir):
+            for name in os.listdir(self.full_songs_dir):
+                if name.endswith(LYRIC_EXTENSIONS):
+                    paths[name] = os.path.join(self.full_songs_dir, name)
+
+        rebuilt = 0
+        with self._lock:
+            for key in list(self._sources):
+                if key not in paths:
+                    del self._sources[key]
+            for key, path in paths.items():
+                stamp = self._stamp(path)
+                if stamp is None:
+                    self._sources.pop(key, None)
+                    continue
+                cached = self._sources.get(key)
+                if cached and cached[0] == stamp:
+                    continue
+                try:
+                    self._sources[key] = (stamp, self._load(key, path))
+                    rebuilt += 1
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"Failed to index lyrics {path}: {e}")
+                    self._sources[key] = (stamp, [])
+        return rebuilt
+
+    def suggest(self, number: int, source: str = None, limit: int = 20) -> list:
+        """
+        Candidate time ranges (ms) where the number is sung, best first.
+        Canonical phrasing ranks above variants and bare one-word phrases
+        ("một" is also "a") come last; within a tier, earlier first. Matches
+        that run into a neighbouring number word are skipped.
+        The hit time is interpolated from the phrase position within its line.
+        source is a full song file name (sidecar lyrics) or a data.json song_id.
+        """
+        phrases = number_phrases(number)
+        with self._lock:
+            indexes = [idx for _, group in self._sources.values() for idx in group]
+        found = []
+        for idx in indexes:
+            if source and idx.source != source:
+                continue
+            for rank, phrase in enumerate(phrases):
+                for line_id, pos in idx.find(phrase):
+                    start, end, text, tokens = idx.lines[line_id]
+                    if not _bounded(tokens, pos, len(phrase)):
+                        continue
+                    hit = start + (end - start) * pos // len(tokens)
+                    found.append({
+                        "source": idx.source,
+                        "start": max(0, start - PAD_MS),
+                        "end": end + PAD_MS,
+                        "hit": hit,
+                        "text": text,
+                        "phrase": " ".join(phrase),
+                        "rank": rank,
+                        "tier": 2 if len(phrase) == 1 else int(rank > 0),
+                    })
+        found.sort(key=lambda c: (c["tier"], c["source"], c["hit"]))
+        return found[:limit]
@@ -0,0 +1,208 @@
+import time
+import math
+import bisect
+import threading
+from core.tracing import TRACER
+
+# In-process metrics in the Prometheus text format (served at /metrics).
+# Metrics are pre-aggregated where they're recorded: a counter is one float
+# per label set, a histogram a fixed row of bucket counts, so recording is a
+# dict lookup and a few additions under a lock and scraping never walks raw
+# events. Values that already live elsewhere (client lists, cache stats, job
+# tables) are read by callbacks at scrape time instead of being mirrored.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "abcloto_"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._rows = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._rows.get(label_values)
+            if row is None:
+                row = self._rows[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def time(self, *label_values):
+        """Context manager observing the elapsed seconds"""
+        return _Timer(self, label_values)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._rows.items())
+        lines = self.header()
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            labels = _label_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {row[-1]!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, label_values: tuple):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class Callback(_Metric):
+    """
+    Read at scrape time: fn() returns a number, or {label values tuple: number}.
+    kind is "gauge" or "counter" (for totals kept by another object).
+    """
+
+    def __init__(self, name, help_text, fn, labels=(), kind="gauge"):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> list:
+        # A bad value (None, a non-number) makes the metric unavailable, not the scrape
+        try:
+            values = self.fn()
+            if not isinstance(values, dict):
+                values = {(): values}
+            lines = [f"{self.name}{_label_text(self.labels, k)} {_number(v)}"
+                     for k, v in sorted(values.items())]
+        except Exception as e:
+            return [f"# {self.name} unavailable: {_escape(e)}"]
+        return self.header() + lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module reloaded by a benchmark) keeps the first instance
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name, help_text, fn, labels=(), kind="gauge") -> Callback:
+        with self._lock:
+            metric = Callback(name, help_text, fn, labels, kind)
+            self._metrics[metric.name] = metric  # latest callback wins
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Media jobs (ffmpeg / yt-dlp / TTS), shared by core and app ---
+
+job_duration = REGISTRY.histogram("media_job_duration_seconds", "Duration of external media jobs",
+                                  ("job",), JOB_BUCKETS)
+job_failures = REGISTRY.counter("media_job_failures_total", "External media jobs that failed", ("job",))
+
+
+class media_job:
+    """
+    Times one external media job. Set .ok = False (or raise) to count a failure:
+        with metrics.media_job("cut") as job:
+            job.ok = subprocess.run(cmd).returncode == 0
+    Also recorded as a "media" span while tracing is on (see core.tracing).
+    """
+
+    def __init__(self, job: str):
+        self.job = job
+        self.ok = True
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        job_duration.observe(end - self.start, self.job)
+        failed = exc_type is not None or not self.ok
+        if failed:
+            job_failures.inc(1, self.job)
+        TRACER.complete(self.job, "media", self.start * 1e6, end * 1e6, {"ok": not failed})
+        return False
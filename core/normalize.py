@@ -0,0 +1,350 @@
+import os
+import mmap
+import subprocess
+import concurrent.futures
+from core import metrics
+
+# CBR normalization of long sources, split across cores.
+#
+# The source MP3 is split at frame boundaries into ranges, and each range is
+# decoded and re-encoded by its own ffmpeg process. Each job also gets a few
+# frames from both neighbours:
+#   - PRE_SRC/POST_SRC source frames let the decoder warm up (bit reservoir,
+#     MDCT overlap) before the samples that are kept;
+#   - PRE_ENC/POST_ENC frames of audio let the encoder run past the edges of
+#     its range instead of starting cold or flushing with silence.
+# Encodes run without the bit reservoir, so every output frame is
+# self-contained. Each range is trimmed to exactly its share of the frame grid,
+# and the kept frames are concatenated into one gapless CBR stream with the
+# same frame grid as a single encode.
+#
+# When the source has a LAME/Lavc tag, its encoder delay and end padding are
+# trimmed the way a decoder reading the whole file would, so the chunks encode
+# exactly the samples a single encode gets and the frame counts agree.
+#
+# The joined frames are remuxed by ffmpeg, which writes an Info frame (frame
+# count, byte count, seek TOC, music CRC) in front. The encoder delay and end
+# padding are then written into its LAME tag, so decoders trim them exactly as
+# they do for a single encode and both outputs line up sample for sample.
+#
+# Before a joined output is accepted, its frame count (and so its duration and
+# every seek position) is checked against the source's; any mismatch fails
+# the parallel run and normalize_cbr() falls back to a single encode.
+#
+# The speedup hasn't been measured on a multi-core host yet (bench.normalize),
+# so normalize_cbr() encodes serially unless ABCLOTO_NORMALIZE_WORKERS asks
+# for more workers.
+BITRATE = "192k"
+MIN_PARALLEL_SEC = 600   # shorter files aren't worth splitting
+WORKERS = int(os.environ.get("ABCLOTO_NORMALIZE_WORKERS", "1"))
+PRE_SRC = 4
+POST_SRC = 2
+PRE_ENC = 2
+POST_ENC = 2
+DECODER_DELAY = 529    # samples every MP3 decoder adds ahead of the encoder delay
+LAME_DELAY = 576       # encoder delay libmp3lame puts in front of what it encodes
+
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],    # MPEG-1 Layer III
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],       # MPEG-2/2.5 Layer III
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _frame_header(buf, pos: int):
+    """(length, samples per frame, sample rate) of a Layer III frame at pos, or None"""
+    if pos + 4 > len(buf) or buf[pos] != 0xFF or buf[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version = (buf[pos + 1] >> 3) & 3
+    layer = (buf[pos + 1] >> 1) & 3
+    bitrate_idx = buf[pos + 2] >> 4
+    rate_idx = (buf[pos + 2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[1 if mpeg1 else 2][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    padding = (buf[pos + 2] >> 1) & 1
+    samples = 1152 if mpeg1 else 576
+    return (samples // 8) * bitrate // sample_rate + padding, samples, sample_rate
+
+
+def scan_frames(buf):
+    """
+    Byte offsets of the audio frames in an MP3 buffer, plus the end offset of
+    the last frame, samples per frame and sample rate.
+    Skips ID3v2, the Xing/Info/VBRI header frame and any trailing tags.
+    Returns None if the buffer isn't a Layer III stream.
+    """
+    pos = _skip_id3(buf)
+    offsets = []
+    fmt = None
+    end = len(buf)
+    while pos < end:
+        header = _frame_header(buf, pos)
+        if header is None or (fmt and header[1:] != fmt):
+            if offsets and buf[pos:pos + 3] in (b"TAG", b"APE", b"LYR"):
+                break
+            pos += 1  # resync
+            continue
+        length, samples, sample_rate = header
+        if pos + length > end:
+            break
+        if fmt is None:
+            fmt = (samples, sample_rate)
+            head = bytes(buf[pos:pos + 64])
+            if b"Xing" in head or b"Info" in head or b"VBRI" in head:
+                pos += length
+                continue
+        offsets.append(pos)
+        pos += length
+    if not offsets:
+        return None
+    return offsets, pos, fmt[0], fmt[1]
+
+
+def _skip_id3(buf) -> int:
+    if buf[:3] == b"ID3" and len(buf) >= 10:
+        size = (buf[6] << 21) | (buf[7] << 14) | (buf[8] << 7) | buf[9]
+        return 10 + size + (10 if buf[5] & 0x10 else 0)
+    return 0
+
+
+_LAME_TAG_NAMES = (b"LAME", b"Lavc", b"Lavf")
+
+
+def _info_tag(frame) -> int:
+    """Offset of the LAME/Lavc tag inside an Xing/Info frame, or -1"""
+    if b"Xing" not in frame and b"Info" not in frame:
+        return -1
+    for name in _LAME_TAG_NAMES:
+        tag = frame.find(name)
+        if tag != -1 and tag + 36 <= len(frame):
+            return tag
+    return -1
+
+
+def _first_frame(buf):
+    """(offset, length) of the first Layer III frame, or None"""
+    pos = _skip_id3(buf)
+    end = min(len(buf), pos + (1 << 16))
+    while pos < end and _frame_header(buf, pos) is None:
+        pos += 1
+    header = _frame_header(buf, pos)
+    return None if header is None else (pos, header[0])
+
+
+def encoder_padding(buf):
+    """
+    (encoder delay, end padding) in samples from the LAME/Lavc tag of the
+    Xing/Info frame, or None when the stream has no such tag (then nothing
+    can be trimmed: decoders play the padding too).
+    """
+    first = _first_frame(buf)
+    if first is None:
+        return None
+    frame = bytes(buf[first[0]:first[0] + first[1]])
+    tag = _info_tag(frame)
+    if tag == -1:
+        return None
+    b0, b1, b2 = frame[tag + 21:tag + 24]
+    return (b0 << 4) | (b1 >> 4), ((b1 & 0x0F) << 8) | b2
+
+
+def _crc16_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC16 = _crc16_table()
+
+
+def _crc16(data, crc: int = 0) -> int:
+    """CRC-16 (poly 0x8005, reflected) as used by the LAME tag"""
+    for byte in data:
+        crc = (crc >> 8) ^ _CRC16[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def write_encoder_padding(path: str, delay: int, padding: int):
+    """Store encoder delay and end padding in the LAME tag of the file's Info frame"""
+    with open(path, "r+b") as f:
+        head = f.read(1 << 16)
+        first = _first_frame(head)
+        frame = bytearray(head[first[0]:first[0] + first[1]]) if first else b""
+        tag = _info_tag(frame)
+        if tag == -1:
+            raise RuntimeError(f"{path}: no Info frame with a LAME tag")
+        frame[tag + 21:tag + 24] = ((delay << 12) | padding).to_bytes(3, "big")
+        # Tag CRC covers the frame up to itself (the first 190 bytes for stereo MPEG-1)
+        frame[tag + 34:tag + 36] = _crc16(frame[:tag + 34]).to_bytes(2, "big")
+        f.seek(first[0])
+        f.write(frame)
+
+
+def expected_frames(samples: int, spf: int) -> int:
+    """Frames libmp3lame writes for `samples` input samples (delay in front, padded past the decoder delay)"""
+    return (samples + LAME_DELAY + DECODER_DELAY) // spf + 1
+
+
+def stream_frames(path: str):
+    """(frame count, samples per frame, sample rate) read from the frame headers, or None"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            scanned = scan_frames(buf)
+    if scanned is None:
+        return None
+    offsets, _, spf, sample_rate = scanned
+    return len(offsets), spf, sample_rate
+
+
+def _encode_range(input_path: str, byte_range: tuple, trim_start: int, trim_end, output_path: str, bitrate: str):
+    """Decode an MP3 byte range, trim to [trim_start, trim_end) samples, encode CBR"""
+    trim = f"atrim=start_sample={trim_start}" + (f":end_sample={trim_end}" if trim_end is not None else "")
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "mp3", "-i", "pipe:0",
+        "-af", trim,
+        "-codec:a", "libmp3lame", "-b:a", bitrate, "-reservoir", "0",
+        "-write_xing", "0", "-id3v2_version", "0", "-map_metadata", "-1",
+        "-f", "mp3", output_path,
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    # Stream the range from disk rather than holding every range in memory
+    try:
+        with open(input_path, "rb") as f:
+            f.seek(byte_range[0])
+            remaining = byte_range[1] - byte_range[0]
+            while remaining > 0:
+                chunk = f.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                proc.stdin.write(chunk)
+                remaining -= len(chunk)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    stderr = proc.stderr.read()
+    if proc.wait(timeout=3600) != 0:
+        raise RuntimeError(f"ffmpeg range encode failed: {stderr[-300:]!r}")
+
+
+def normalize_serial(input_path: str, output_path: str, bitrate: str = BITRATE) -> bool:
+    """The original single-process encode"""
+    cmd = ["ffmpeg", "-y", "-i", input_path, "-codec:a", "libmp3lame", "-b:a", bitrate, output_path]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        print(f"ffmpeg normalize error: {result.stderr[-500:]!r}")
+    return result.returncode == 0
+
+
+def _write_info_frame(input_path: str, output_path: str):
+    """Copy bare frames unchanged into a file with an Info frame in front"""
+    cmd = [
+        "ffmpeg", "-y", "-v", "error", "-f", "mp3", "-i", input_path,
+        "-codec:a", "copy", "-write_xing", "1", "-id3v2_version", "0", "-map_metadata", "-1",
+        "-f", "mp3", output_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, timeout=3600)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg remux failed: {result.stderr[-300:]!r}")
+
+
+def normalize_parallel(input_path: str, output_path: str, workers: int, bitrate: str = BITRATE) -> bool:
+    """Split at frame boundaries, encode ranges concurrently, join the frames"""
+    with open(input_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        scanned = scan_frames(buf)
+        if scanned is None:
+            return False
+        offsets, stream_end, spf, sample_rate = scanned
+        bounds = offsets + [stream_end]
+        total = len(offsets)
+        # Decoded samples to drop in front (encoder + decoder delay) and the
+        # number kept, exactly as a decoder honouring the tag would play them
+        padding = encoder_padding(buf)
+        skip = padding[0] + DECODER_DELAY if padding else 0
+        kept = total * spf - skip
+        if padding:
+            kept = min(kept, total * spf - padding[0] - padding[1])
+        skip_frames = -(-skip // spf)
+        margin = PRE_SRC + PRE_ENC
+        # Every inner edge needs room for the pre-roll of the range after it
+        inner = {total * i // workers for i in range(1, workers)}
+        edges = sorted({0, total} | {e for e in inner if margin <= e < total})
+
+        jobs = []
+        for i in range(len(edges) - 1):
+            a, b = edges[i], edges[i + 1]
+            first, last = i == 0, i == len(edges) - 2
+            src_start = 0 if first else a - margin
+            src_end = total if last else min(total, b + POST_SRC + POST_ENC + skip_frames)
+            # Sample offsets within the decoded range, shifted by the skipped delay
+            trim_start = skip + (0 if first else PRE_SRC * spf)
+            trim_end = skip + (kept if last else (b + POST_ENC) * spf) - src_start * spf
+            keep = (0 if first else PRE_ENC, None if last else (0 if first else PRE_ENC) + (b - a))
+            jobs.append(((bounds[src_start], bounds[src_end]), trim_start, trim_end, keep))
+
+    part_paths = [f"{output_path}.part{i}" for i in range(len(jobs))]
+    joined_path = f"{output_path}.joined"
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_encode_range, input_path, byte_range, start, end, path, bitrate)
+                       for (byte_range, start, end, _), path in zip(jobs, part_paths)]
+            for future in futures:
+                future.result()
+
+        with open(joined_path, "wb") as out:
+            for (_, _, _, (keep_from, keep_to)), path in zip(jobs, part_paths):
+                with open(path, "rb") as f:
+                    part = f.read()
+                scanned = scan_frames(part)
+                if scanned is None:
+                    raise RuntimeError(f"{path}: no frames")
+                frames, part_end = scanned[0], scanned[1]
+                if keep_to is not None and len(frames) < keep_to:
+                    raise RuntimeError(f"{path}: {len(frames)} frames, expected at least {keep_to}")
+                part_bounds = frames + [part_end]
+                stop = len(frames) if keep_to is None else keep_to
+                out.write(part[part_bounds[keep_from]:part_bounds[stop]])
+        _write_info_frame(joined_path, output_path)
+
+        # A chunk-boundary error shows up as missing or extra frames: a shifted
+        # timeline from that point on. Never hand such a file back.
+        joined = stream_frames(output_path)
+        expected = expected_frames(kept, spf)
+        if joined is None or joined[0] != expected or joined[1:] != (spf, sample_rate):
+            got = "no frames" if joined is None else f"{joined[0]} frames of {joined[1]} @ {joined[2]} Hz"
+            raise RuntimeError(f"joined output has {got}, expected {expected} frames of {spf} @ {sample_rate} Hz")
+        # Decoders then play exactly the kept samples, like a single encode
+        write_encoder_padding(output_path, LAME_DELAY, expected * spf - kept - LAME_DELAY)
+        return True
+    finally:
+        for path in part_paths + [joined_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def normalize_cbr(input_path: str, output_path: str, workers: int = None, duration: float = None,
+                  bitrate: str = BITRATE) -> bool:
+    """
+    Re-encode to CBR. With more than one worker (default WORKERS), long MP3
+    sources use the chunk-parallel path; anything else, or a failed parallel
+    run, uses a single encode.
+    """
+    workers = workers or WORKERS
+    with metrics.media_job("normalize") as job:
+        if workers > 1 and (duration is None or duration >= MIN_PARALLEL_SEC):
+            try:
+                if normalize_parallel(input_path, output_path, workers, bitrate):
+                    return True
+            except Exception as e:
+                print(f"Parallel normalize failed, falling back to a single encode: {e}")
+        job.ok = normalize_serial(input_path, output_path, bitrate)
+        return job.ok
@@ -0,0 +1,154 @@
+import os
+import time
+import fnmatch
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Background reconciler for leftover and orphaned media files.
+# Sweeps run on a worker thread, every INTERVAL seconds or soon after
+# trigger(), but never more often than MIN_GAP. Each sweep deletes at most
+# MAX_DELETES files so a large backlog is worked off gradually. Files are
+# only removed once they are older than a grace period, so anything still
+# being written (downloads, encodes, fresh cuts) is left alone.
+INTERVAL = 600.0
+MIN_GAP = 30.0
+MAX_DELETES = 200
+STALE_AGE = 3600.0     # leftovers of failed downloads / encodes
+ORPHAN_GRACE = 120.0   # clips no segment refers to any more
+
+
+def _remove(path: str, budget: list) -> int:
+    """Delete one file if the sweep's delete budget allows; returns bytes reclaimed"""
+    if budget[0] <= 0:
+        return 0
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Reconciler: could not remove {path}: {e}")
+        return 0
+    budget[0] -= 1
+    return size
+
+
+def sweep_stale(directory: str, patterns, max_age: float = STALE_AGE, budget: list = None) -> tuple:
+    """Remove files matching any glob pattern not modified for max_age seconds"""
+    budget = budget if budget is not None else [MAX_DELETES]
+    files = reclaimed = 0
+    if not os.path.isdir(directory):
+        return files, reclaimed
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not any(fnmatch.fnmatch(entry.name, p) for p in patterns):
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue
+        if budget[0] <= 0:
+            break
+        reclaimed += _remove(entry.path, budget)
+        files += 1
+    return files, reclaimed
+
+
+def sweep_orphans(directory: str, keep: set, suffix: str = ".mp3", grace: float = ORPHAN_GRACE,
+                  budget: list = None) -> tuple:
+    """Remove files with the suffix whose names aren't in keep (dotfiles are never touched)"""
+    budget = budget if budget is not None else [MAX_DELETES]
+    files = reclaimed = 0
+    if not os.path.isdir(directory):
+        return files, reclaimed
+    cutoff = time.time() - grace
+    for entry in os.scandir(directory):
+        if (not entry.is_file() or entry.name.startswith(".")
+                or not entry.name.endswith(suffix) or entry.name in keep):
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue
+        if budget[0] <= 0:
+            break
+        reclaimed += _remove(entry.path, budget)
+        files += 1
+    return files, reclaimed
+
+
+class Reconciler:
+    """
+    Runs named sweeps: tasks is {name: fn(budget) -> (files, bytes)}, where
+    budget is a one-element list holding the deletes left in this sweep.
+    """
+
+    def __init__(self, tasks: dict, interval: float = INTERVAL, min_gap: float = MIN_GAP,
+                 max_deletes: int = MAX_DELETES):
+        self.tasks = tasks
+        self.interval = interval
+        self.min_gap = min_gap
+        self.max_deletes = max_deletes
+        self._task = None
+        self._wake = asyncio.Event()
+        self._last_run = 0.0
+        self.last = {}        # name -> {"files", "bytes"} of the latest sweep
+        self.total_files = 0
+        self.total_bytes = 0
+        self.sweeps = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def trigger(self):
+        """Ask for a sweep soon (still at most one per min_gap)"""
+        self._wake.set()
+
+    def sweep(self) -> dict:
+        """One pass over every task; blocking, runs on a worker thread"""
+        budget = [self.max_deletes]
+        report = {}
+        for name, fn in self.tasks.items():
+            try:
+                files, reclaimed = fn(budget)
+            except Exception as e:
+                logger.error(f"Reconciler task {name} failed: {e}")
+                files, reclaimed = 0, 0
+            report[name] = {"files": files, "bytes": reclaimed}
+        self.last = report
+        self.sweeps += 1
+        files = sum(r["files"] for r in report.values())
+        reclaimed = sum(r["bytes"] for r in report.values())
+        self.total_files += files
+        self.total_bytes += reclaimed
+        if files:
+            logger.info(f"Reconciler removed {files} files, {reclaimed / 1024 / 1024:.1f} MB")
+        return report
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            wait = self._last_run + self.min_gap - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                self._wake.clear()
+            self._last_run = loop.time()
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Reconciler sweep failed: {e}")
+
+    def status(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "last": self.last,
+            "total_files": self.total_files,
+            "total_bytes": self.total_bytes,
+        }
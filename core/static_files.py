@@ -0,0 +1,99 @@
+import os
+import stat
+import mimetypes
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+# Not registered on every platform; Opus clip variants are Ogg files
+mimetypes.add_type("audio/ogg", ".opus")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Sidecar suffix per Content-Encoding, in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(request_headers: Headers) -> set:
+    accepted = set()
+    for part in request_headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _find_sidecar(full_path: str, request_headers: Headers):
+    """(encoding, path, stat) of the best precompressed sidecar, or None"""
+    accepted = _accepted_encodings(request_headers)
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in accepted:
+            try:
+                sidecar_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            if stat.S_ISREG(sidecar_stat.st_mode):
+                return encoding, full_path + suffix, sidecar_stat
+    return None
+
+
+def _etag_matches(response_headers, request_headers: Headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or response_headers["etag"] in tags
+
+
+def precompressed_file_response(full_path: str, request_headers: Headers, cache_control: str, stat_result=None):
+    """
+    FileResponse that serves a .br/.gz sidecar when the client accepts it.
+    Content-Type always comes from the original file name.
+    """
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+    sidecar = _find_sidecar(full_path, request_headers)
+    if sidecar:
+        encoding, path, stat_result = sidecar
+        headers["Content-Encoding"] = encoding
+    else:
+        path = full_path
+    response = FileResponse(path, stat_result=stat_result, media_type=media_type, headers=headers)
+    if _etag_matches(response.headers, request_headers):
+        return NotModifiedResponse(response.headers)
+    return response
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for content-addressed files.
+    Names change whenever content changes, so clients may cache for a year
+    and never revalidate.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+class PrecompressedStaticFiles(ImmutableStaticFiles):
+    """
+    Fingerprinted build output (see core.assets): immutable, and served from
+    the .br/.gz sidecar matching Accept-Encoding when one exists.
+    """
+
+    async def get_response(self, path: str, scope):
+        request_headers = Headers(scope=scope)
+        if scope["method"] in ("GET", "HEAD") and "accept-encoding" in request_headers:
+            try:
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+            except (OSError, ValueError):
+                full_path, stat_result = None, None
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                return precompressed_file_response(full_path, request_headers, IMMUTABLE_CACHE_CONTROL, stat_result)
+        return await super().get_response(path, scope)
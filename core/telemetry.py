@@ -0,0 +1,234 @@
+import re
+import time
+import bisect
+from core import metrics
+
+# Playback telemetry from the displays (see PlaybackTelemetry in game-core.js).
+# Clients batch their events (call start latency, background-music drift,
+# buffering stalls, hard resyncs, playback errors) and post them every few
+# seconds. Nothing is stored per event: each value lands in a bucket of a
+# rolling per-room histogram, a ring of fixed time slices that is overwritten
+# as time moves on, so memory is constant however many displays report.
+# The same values also feed cumulative core.metrics histograms for /metrics.
+# Those carry no room label: room names come from the clients, and a label set
+# can never be removed again. Per-room detail is in the rolling view only.
+#
+# Everything here runs on the event loop (ingest/snapshot are called from
+# async handlers), so the rolling state needs no lock.
+SLICE_SEC = 10
+WINDOW_SLICES = 12  # live view covers the last 2 minutes
+MAX_ROOMS = 32      # beyond this, new rooms are folded into "other"; idle rooms expire
+MAX_BATCH_EVENTS = 200
+MAX_CLIENTS = 20_000  # per room; past this, the longest-silent client ids are evicted
+MAX_VALUE_MS = 600_000
+DEFAULT_ROOM = "main"
+
+_ROOM_RE = re.compile(r"^[\w-]{1,32}$")
+
+START_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+DRIFT_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2000, 5000)
+BUFFER_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Wire event kinds -> (name, rolling buckets); counted-only kinds have no buckets
+KINDS = {
+    "s": ("start_latency_ms", START_BUCKETS_MS),
+    "d": ("drift_ms", DRIFT_BUCKETS_MS),
+    "b": ("buffering_ms", BUFFER_BUCKETS_MS),
+    "r": ("resyncs", None),
+    "e": ("errors", None),
+}
+
+_start_latency = metrics.REGISTRY.histogram(
+    "playback_start_latency_seconds", "Call clip start latency reported by displays (state received -> playing)",
+    (), tuple(b / 1000 for b in START_BUCKETS_MS))
+_drift = metrics.REGISTRY.histogram(
+    "playback_drift_seconds", "Background music drift from the server timeline reported by displays",
+    (), tuple(b / 1000 for b in DRIFT_BUCKETS_MS))
+_buffering = metrics.REGISTRY.histogram(
+    "playback_buffering_seconds", "Duration of buffering stalls reported by displays",
+    (), tuple(b / 1000 for b in BUFFER_BUCKETS_MS))
+_resyncs = metrics.REGISTRY.counter("playback_resyncs_total", "Hard background-music resyncs by displays")
+_errors = metrics.REGISTRY.counter("playback_errors_total", "Playback errors reported by displays")
+_dropped = metrics.REGISTRY.counter(
+    "playback_events_dropped_total", "Telemetry events rejected (unknown kind or bad value)")
+
+_CUMULATIVE = {"s": _start_latency, "d": _drift, "b": _buffering}
+_COUNTERS = {"r": _resyncs, "e": _errors}
+
+
+class RollingHistogram:
+    """Bucket counts over the last window_slices * slice_sec seconds, as a ring of time slices"""
+
+    def __init__(self, buckets, window_slices: int = WINDOW_SLICES, slice_sec: float = SLICE_SEC):
+        self.buckets = tuple(buckets)
+        self.slice_sec = slice_sec
+        self._epochs = [-1] * window_slices
+        self._rows = [[0] * (len(self.buckets) + 1) for _ in range(window_slices)]
+        self._sums = [0.0] * window_slices
+
+    def _slot(self, now: float) -> int:
+        epoch = int(now // self.slice_sec)
+        i = epoch % len(self._rows)
+        if self._epochs[i] != epoch:
+            # This slot last held a slice that has left the window: recycle it
+            self._epochs[i] = epoch
+            self._rows[i] = [0] * (len(self.buckets) + 1)
+            self._sums[i] = 0.0
+        return i
+
+    def observe(self, value: float, now: float):
+        i = self._slot(now)
+        self._rows[i][bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[i] += value
+
+    def counts(self, now: float):
+        current = int(now // self.slice_sec)
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for i, epoch in enumerate(self._epochs):
+            if 0 <= current - epoch < len(self._rows):
+                counts = [a + b for a, b in zip(counts, self._rows[i])]
+                total += self._sums[i]
+        return counts, total
+
+    def quantile(self, q: float, counts) -> float:
+        """Linear interpolation inside the bucket holding the q-th value (like histogram_quantile)"""
+        count = sum(counts)
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return float(self.buckets[-1])  # beyond the last bound: report the bound
+                lower = self.buckets[i - 1] if i else 0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return float(self.buckets[-1])
+
+    def snapshot(self, now: float) -> dict:
+        counts, total = self.counts(now)
+        count = sum(counts)
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": count,
+            "mean": round(total / count, 1) if count else None,
+            "p50": self._rounded(self.quantile(0.5, counts)),
+            "p90": self._rounded(self.quantile(0.9, counts)),
+            "p99": self._rounded(self.quantile(0.99, counts)),
+            "buckets": dict(zip(bounds, counts)),
+        }
+
+    @staticmethod
+    def _rounded(value):
+        return None if value is None else round(value, 1)
+
+
+class RollingCounter:
+    """Event count over the same sliding window"""
+
+    def __init__(self, window_slices: int = WINDOW_SLICES, slice_sec: float = SLICE_SEC):
+        self._hist = RollingHistogram((), window_slices, slice_sec)
+
+    def add(self, now: float):
+        self._hist.observe(0, now)
+
+    def count(self, now: float) -> int:
+        return sum(self._hist.counts(now)[0])
+
+
+class _Room:
+    def __init__(self):
+        self.histograms = {kind: RollingHistogram(buckets) for kind, (_, buckets) in KINDS.items() if buckets}
+        self.counters = {kind: RollingCounter() for kind, (_, buckets) in KINDS.items() if not buckets}
+        self.reports = RollingCounter()
+        self.clients = {}  # client id -> last report time, least recently seen first
+        self.last_report = 0.0
+
+
+class PlaybackTelemetry:
+    def __init__(self, max_rooms: int = MAX_ROOMS):
+        self.max_rooms = max_rooms
+        self._rooms = {}
+
+    def _room(self, name: str, now: float):
+        if not name or not _ROOM_RE.match(name):
+            name = DEFAULT_ROOM
+        if name not in self._rooms and len(self._rooms) >= self.max_rooms:
+            self._expire_rooms(now)
+            if len(self._rooms) >= self.max_rooms:
+                name = "other"
+        room = self._rooms.get(name)
+        if room is None:
+            room = self._rooms[name] = _Room()
+        return name, room
+
+    def ingest(self, room_name: str, client_id: str, events) -> int:
+        """Record one batch of [kind, value_ms] events; returns how many were accepted"""
+        now = time.time()
+        _, room = self._room(room_name, now)
+        room.reports.add(now)
+        room.last_report = now
+        if client_id:
+            client_id = client_id[:64]
+            room.clients.pop(client_id, None)  # re-insert at the most recent end
+            room.clients[client_id] = now
+            while len(room.clients) > MAX_CLIENTS:
+                del room.clients[next(iter(room.clients))]
+        accepted = 0
+        for kind, value in events:
+            if kind not in KINDS or not (0 <= value <= MAX_VALUE_MS):
+                continue
+            if kind in room.histograms:
+                room.histograms[kind].observe(value, now)
+                _CUMULATIVE[kind].observe(value / 1000)
+            else:
+                room.counters[kind].add(now)
+                _COUNTERS[kind].inc(1)
+            accepted += 1
+        rejected = len(events) - accepted
+        if rejected:
+            _dropped.inc(rejected)
+        return accepted
+
+    def _prune_clients(self, room: _Room, now: float):
+        """Drop clients silent for the whole window (oldest first, so this stops at the first live one)"""
+        horizon = now - SLICE_SEC * WINDOW_SLICES
+        while room.clients:
+            client_id = next(iter(room.clients))
+            if room.clients[client_id] >= horizon:
+                break
+            del room.clients[client_id]
+
+    def _expire_rooms(self, now: float):
+        """Forget rooms with no report in the window, freeing their slots under max_rooms"""
+        horizon = now - SLICE_SEC * WINDOW_SLICES
+        for name in [n for n, room in self._rooms.items() if room.last_report < horizon]:
+            del self._rooms[name]
+
+    def snapshot(self, room_name: str = None) -> dict:
+        """Live sync quality per room over the rolling window"""
+        now = time.time()
+        self._expire_rooms(now)
+        rooms = {}
+        for name, room in list(self._rooms.items()):
+            if room_name and name != room_name:
+                continue
+            self._prune_clients(room, now)
+            entry = {"clients": len(room.clients), "reports": room.reports.count(now)}
+            for kind, hist in room.histograms.items():
+                entry[KINDS[kind][0]] = hist.snapshot(now)
+            for kind, counter in room.counters.items():
+                entry[KINDS[kind][0]] = counter.count(now)
+            rooms[name] = entry
+        return {"window_sec": SLICE_SEC * WINDOW_SLICES, "rooms": rooms}
+
+    def active_clients(self) -> dict:
+        now = time.time()
+        self._expire_rooms(now)
+        result = {}
+        for name, room in list(self._rooms.items()):
+            self._prune_clients(room, now)
+            result[(name,)] = len(room.clients)
+        return result
@@ -0,0 +1,150 @@
+import numpy as np
+
+# Lô Tô tickets for the 00-99 board.
+# A ticket has ROWS rows; each row holds NUMBERS_PER_ROW numbers taken from
+# distinct columns, column c covering c*10 .. c*10+9. No number repeats within a
+# ticket. A row is won ("Kinh") once all of its numbers have been called.
+#
+# A book of tickets is fully determined by (seed, count), so only those two
+# values need to be persisted; the arrays are regenerated on load.
+ROWS = 9
+COLS = 10
+NUMBERS_PER_ROW = 5
+MAX_NUMBER = 99
+
+GEN_CHUNK = 8192  # tickets generated per batch; fixed so a seed always yields the same book
+
+_MASK64 = (1 << 64) - 1
+
+
+def mask_from_numbers(numbers) -> int:
+    """100-bit mask (Python int) with bit n set for every called number n"""
+    mask = 0
+    for n in numbers:
+        mask |= 1 << int(n)
+    return mask
+
+
+def _split_mask(mask: int):
+    return np.uint64(mask & _MASK64), np.uint64(mask >> 64)
+
+
+def _generate_chunk(rng: np.random.Generator, count: int) -> np.ndarray:
+    # 1. Pick NUMBERS_PER_ROW distinct columns per row, in column order
+    cols = np.sort(rng.random((count, ROWS, COLS)).argsort(axis=2)[:, :, :NUMBERS_PER_ROW], axis=2)
+
+    # 2. Per ticket and column, a random order of the 10 numbers in that column
+    units = rng.random((count, COLS, 10)).argsort(axis=2)
+
+    # 3. The k-th row (top to bottom) using column c gets units[c][k], so numbers
+    #    are unique within a ticket. ROWS <= 10 keeps every column feasible.
+    used = np.zeros((count, ROWS, COLS), dtype=np.int8)
+    np.put_along_axis(used, cols, 1, axis=2)
+    rank = np.cumsum(used, axis=1) - 1
+    row_rank = np.take_along_axis(rank, cols, axis=2)
+    ticket_idx = np.arange(count)[:, None, None]
+    return (cols * 10 + units[ticket_idx, cols, row_rank]).astype(np.uint8)
+
+
+class TicketBook:
+    """
+    A batch of tickets held as compact arrays:
+      numbers  uint8  (count, ROWS, NUMBERS_PER_ROW)
+      row_lo   uint64 (count, ROWS)   bits 0-63 of each row's number mask
+      row_hi   uint64 (count, ROWS)   bits 64-99
+    """
+
+    def __init__(self, seed: int, count: int):
+        self.seed = int(seed)
+        self.count = int(count)
+        rng = np.random.default_rng(self.seed)
+        chunks = [_generate_chunk(rng, min(GEN_CHUNK, self.count - start))
+                  for start in range(0, self.count, GEN_CHUNK)]
+        self.numbers = np.concatenate(chunks) if chunks else np.zeros((0, ROWS, NUMBERS_PER_ROW), np.uint8)
+        self.row_lo, self.row_hi = self._row_masks(self.numbers)
+
+    @staticmethod
+    def _row_masks(numbers: np.ndarray):
+        n = numbers.astype(np.uint64)
+        low = n < 64
+        one = np.uint64(1)
+        lo = np.bitwise_or.reduce(np.where(low, one << np.where(low, n, 0), 0).astype(np.uint64), axis=2)
+        hi = np.bitwise_or.reduce(np.where(~low, one << np.where(~low, n - 64, 0), 0).astype(np.uint64), axis=2)
+        return lo, hi
+
+    @property
+    def nbytes(self) -> int:
+        return self.numbers.nbytes + self.row_lo.nbytes + self.row_hi.nbytes
+
+    def ticket(self, ticket_id: int) -> list:
+        """Rows of one ticket as plain lists"""
+        return self.numbers[ticket_id].tolist()
+
+    def complete_rows(self, called_mask: int, ticket_ids=None) -> np.ndarray:
+        """bool (tickets, ROWS): rows whose numbers are all in called_mask"""
+        lo, hi = _split_mask(called_mask)
+        row_lo, row_hi = self.row_lo, self.row_hi
+        if ticket_ids is not None:
+            row_lo, row_hi = row_lo[ticket_ids], row_hi[ticket_ids]
+        return ((row_lo & ~lo) | (row_hi & ~hi)) == 0
+
+    def winners(self, called_mask: int) -> np.ndarray:
+        """Ids of tickets with at least one complete row"""
+        return np.flatnonzero(self.complete_rows(called_mask).any(axis=1))
+
+    def verify_claim(self, ticket_id: int, called_mask: int) -> list:
+        """Indexes of the ticket's complete rows (empty list = invalid claim)"""
+        if not 0 <= ticket_id < self.count:
+            raise IndexError(f"Ticket {ticket_id} does not exist")
+        return np.flatnonzero(self.complete_rows(called_mask, [ticket_id])[0]).tolist()
+
+
+class RowTracker:
+    """
+    Incremental win detection for a TicketBook.
+
+    An inverted index maps each number to the flat ids (ticket * ROWS + row) of
+    the rows containing it, stored CSR-style: rows_by_number[offsets[n]:offsets[n+1]].
+    `remaining` counts the uncalled numbers left in every row, so marking a call
+    only touches the rows holding that number instead of rescanning the book.
+    """
+
+    def __init__(self, book: TicketBook, called=()):
+        self.book = book
+        flat = book.numbers.reshape(-1)
+        order = np.argsort(flat, kind="stable")
+        self.rows_by_number = (order // NUMBERS_PER_ROW).astype(np.int32)
+        self.offsets = np.zeros(MAX_NUMBER + 2, dtype=np.int64)
+        np.cumsum(np.bincount(flat, minlength=MAX_NUMBER + 1), out=self.offsets[1:])
+        self.reset(called)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows_by_number.nbytes + self.offsets.nbytes + self.remaining.nbytes
+
+    def reset(self, called=()):
+        """Recompute remaining counts from scratch for the given called numbers"""
+        self.called = np.zeros(MAX_NUMBER + 1, dtype=bool)
+        self.called[[int(n) for n in called]] = True
+        hits = self.called[self.book.numbers].sum(axis=2, dtype=np.int8)
+        self.remaining = (NUMBERS_PER_ROW - hits).reshape(-1)
+
+    def mark(self, number: int):
+        """
+        Record one called number.
+        Returns (won, near): flat ids of rows completed by this call and of
+        rows now waiting on a single number. Calling a number twice is a no-op.
+        """
+        number = int(number)
+        if self.called[number]:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, empty
+        self.called[number] = True
+        rows = self.rows_by_number[self.offsets[number]:self.offsets[number + 1]]
+        left = self.remaining[rows] - 1
+        self.remaining[rows] = left
+        return rows[left == 0], rows[left == 1]
+
+    def winning_tickets(self) -> np.ndarray:
+        """Ids of tickets with at least one complete row"""
+        return np.unique(np.flatnonzero(self.remaining == 0) // ROWS)
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import traceback
+import contextvars
+from collections import deque
+
+# Opt-in profiling for diagnosing stalls: spans around filesystem, subprocess
+# and JSON work, tagged with the HTTP request they ran for, plus a watchdog
+# that records the stack of whatever blocks the event loop. Events are kept in
+# a bounded ring in the Chrome trace-event format, so a dump opens directly in
+# https://ui.perfetto.dev or chrome://tracing.
+#
+# Off by default: span() then returns a shared no-op and costs one attribute
+# check. Enable with ABCLOTO_PROFILE=1 (lag threshold: ABCLOTO_PROFILE_LAG_MS)
+# or at runtime through POST /api/debug/profile.
+MAX_EVENTS = 100_000
+LAG_THRESHOLD_MS = float(os.environ.get("ABCLOTO_PROFILE_LAG_MS", "100"))
+LAG_INTERVAL = 0.05  # heartbeat period of the loop monitor, seconds
+MAX_STALLS = 50
+STACK_LIMIT = 30
+
+_request = contextvars.ContextVar("trace_request", default=None)
+
+
+def now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.cat, self.start, now_us(), self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self.enabled = False
+        self._events = deque(maxlen=max_events)
+        self._threads = {}  # tid -> thread name, for the trace's metadata events
+        self._pid = os.getpid()
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def span(self, name: str, cat: str = "app", **args):
+        """Context manager recording one complete ("X") event while tracing is on"""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, cat, args)
+
+    def complete(self, name: str, cat: str, start_us: float, end_us: float, args: dict = None, tid: int = None):
+        if not self.enabled:
+            return
+        args = dict(args or {})
+        request = _request.get()
+        if request is not None:
+            args.setdefault("request", request)
+        self._append({"name": name, "cat": cat, "ph": "X", "ts": start_us,
+                      "dur": end_us - start_us, "args": args}, tid)
+
+    def async_complete(self, name: str, cat: str, start_us: float, end_us: float, async_id: str, args: dict = None):
+        """A begin/end pair on its own track: concurrent requests on one thread don't nest"""
+        if not self.enabled:
+            return
+        self._append({"name": name, "cat": cat, "ph": "b", "ts": start_us, "id": async_id, "args": args or {}})
+        self._append({"name": name, "cat": cat, "ph": "e", "ts": end_us, "id": async_id})
+
+    def instant(self, name: str, cat: str, args: dict = None, tid: int = None):
+        if self.enabled:
+            self._append({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": now_us(), "args": args or {}}, tid)
+
+    def _append(self, event: dict, tid: int = None):
+        if tid is None:
+            thread = threading.current_thread()
+            tid = thread.ident
+            if tid not in self._threads:
+                self._threads[tid] = thread.name
+        event["pid"] = self._pid
+        event["tid"] = tid
+        self._events.append(event)  # deque.append is atomic; the ring drops the oldest
+
+    def bind_request(self, request_id: str):
+        """Tag spans in the current context (and threads it spawns) with request_id"""
+        return _request.set(request_id)
+
+    def unbind_request(self, token):
+        _request.reset(token)
+
+    def clear(self):
+        self._events.clear()
+
+    def dump(self) -> dict:
+        meta = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                for tid, name in list(self._threads.items())]
+        return {"traceEvents": meta + list(self._events), "displayTimeUnit": "ms"}
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.dump(), f)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "events": len(self._events), "max_events": self._events.maxlen}
+
+
+TRACER = Tracer()
+TRACER.enable(os.environ.get("ABCLOTO_PROFILE", "") not in ("", "0"))
+span = TRACER.span
+
+
+class LoopMonitor:
+    """
+    Event-loop lag watchdog. A coroutine on the loop stamps a heartbeat every
+    LAG_INTERVAL; a watchdog thread notices when the stamp goes stale for longer
+    than the threshold and samples the loop thread's stack right then, while the
+    blocking call is still on it. When the loop resumes, the stall is recorded
+    (duration + stack) as a trace event and in the recent-stalls list.
+    """
+
+    def __init__(self, tracer: Tracer = TRACER, threshold_ms: float = LAG_THRESHOLD_MS):
+        self.tracer = tracer
+        self.threshold = threshold_ms / 1000
+        self.stalls = deque(maxlen=MAX_STALLS)
+        self.max_lag = 0.0
+        self._beat = time.perf_counter()
+        self._stack = None
+        self._loop_tid = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_tid = threading.get_ident()
+        self._beat = time.perf_counter()
+        # Each watchdog holds its own Event: one left from a previous start()
+        # still sees its stop() after self._stop is replaced
+        self._stop = threading.Event()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stop,),
+                                          name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.perf_counter() + LAG_INTERVAL
+            self._beat = expected
+            await asyncio.sleep(LAG_INTERVAL)
+            now = time.perf_counter()
+            lag = now - expected
+            if lag > self.threshold:
+                self._record(expected, now, lag)
+            self._stack = None
+
+    def _watch(self, stop: threading.Event):
+        while not stop.wait(LAG_INTERVAL):
+            if self._stack is None and time.perf_counter() - self._beat > self.threshold:
+                frame = sys._current_frames().get(self._loop_tid)
+                if frame is not None:
+                    self._stack = traceback.format_stack(frame, limit=STACK_LIMIT)
+
+    def _record(self, started: float, ended: float, lag: float):
+        self.max_lag = max(self.max_lag, lag)
+        stack = self._stack or ["(blocked call returned before the watchdog sampled it)\n"]
+        self.stalls.append({"at": time.time() - (time.perf_counter() - started),
+                            "lag_ms": round(lag * 1000, 1), "stack": stack})
+        self.tracer.complete("event loop blocked", "loop_lag", started * 1e6, ended * 1e6,
+                             {"lag_ms": round(lag * 1000, 1), "stack": "".join(stack)}, tid=self._loop_tid)
+
+    def status(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "threshold_ms": self.threshold * 1000,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": list(self.stalls),
+        }
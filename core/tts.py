@@ -0,0 +1,260 @@
+import io
+import os
+import time
+import hashlib
+import threading
+import subprocess
+import collections
+import concurrent.futures
+from core import metrics
+
+# Rendered TTS phrases.
+# The engine's mp3 bytes are piped straight through ffmpeg (stdin -> filter
+# chain -> stdout), so rendering writes nothing but the final file. Renders
+# are cached on disk under a content key (engine + text + filter chain), which
+# doubles as an immutable URL; the cache is kept under max_bytes by evicting the
+# least recently used phrases.
+TTS_DIR = "static/temp/tts"
+TTS_URL_PREFIX = "/static/temp/tts"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+DIGEST_LEN = 16
+PRERENDER_WORKERS = 4  # concurrent engine calls for render_many()
+
+# Singing / chanting voice: pitch up ~15% at the same speed, vibrato, tremolo,
+# chorus, a short "stage" echo, then a slightly faster tempo for energy.
+SINGING_FILTERS = ",".join([
+    "asetrate=44100*1.15", "atempo=1/1.15", "aresample=44100",
+    "vibrato=f=5:d=0.3",
+    "tremolo=f=3:d=0.4",
+    "chorus=0.5:0.9:50|60:0.4|0.32:0.25|0.4:2|2.3",
+    "aecho=0.8:0.7:40:0.3",
+    "atempo=1.15",
+])
+
+
+class GTTSEngine:
+    """Google TTS (network)"""
+
+    def __init__(self, lang: str = "vi"):
+        self.lang = lang
+        self.name = f"gtts-{lang}"
+
+    def warm(self):
+        """Import gtts ahead of the first cache miss (it is imported lazily)"""
+        import gtts  # noqa: F401
+
+    def synthesize(self, text: str) -> bytes:
+        from gtts import gTTS
+        buf = io.BytesIO()
+        gTTS(text=text, lang=self.lang).write_to_fp(buf)
+        return buf.getvalue()
+
+
+class ToneEngine:
+    """Offline stand-in: a beep per word, so pipelines can run without network"""
+    name = "tone"
+
+    def warm(self):
+        pass
+
+    def synthesize(self, text: str) -> bytes:
+        seconds = 0.25 * max(1, len(text.split()))
+        cmd = [
+            "ffmpeg", "-v", "error", "-f", "lavfi",
+            "-i", f"sine=frequency=660:beep_factor=2:duration={seconds}",
+            "-codec:a", "libmp3lame", "-q:a", "4", "-f", "mp3", "pipe:1",
+        ]
+        return subprocess.run(cmd, capture_output=True, check=True, timeout=30).stdout
+
+
+def apply_filters(mp3: bytes, filters: str):
+    """Run mp3 bytes through an ffmpeg filter chain in memory; None on failure"""
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-f", "mp3", "-i", "pipe:0",
+        "-af", filters,
+        "-codec:a", "libmp3lame", "-q:a", "2",
+        "-f", "mp3", "pipe:1",
+    ]
+    try:
+        with metrics.media_job("tts_filter") as job:
+            result = subprocess.run(cmd, input=mp3, capture_output=True, timeout=30)
+            job.ok = result.returncode == 0 and bool(result.stdout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"ffmpeg filter exception: {e}")
+        return None
+    if result.returncode != 0 or not result.stdout:
+        print(f"ffmpeg filter error: {result.stderr[-500:]!r}")
+        return None
+    return result.stdout
+
+
+def render(engine, text: str, filters: str = None) -> tuple:
+    """
+    Synthesize text and apply the filter chain. Returns (mp3 bytes, filtered):
+    if the filters fail, the plain engine output comes back with filtered
+    False; the engine is never called twice.
+    """
+    with metrics.media_job("tts_engine"):
+        voice = engine.synthesize(text)
+    if not filters:
+        return voice, True
+    filtered = apply_filters(voice, filters)
+    if filtered is None:
+        return voice, False
+    return filtered, True
+
+
+class TTSCache:
+    def __init__(self, engine=None, filters: str = None, cache_dir: str = TTS_DIR,
+                 url_prefix: str = TTS_URL_PREFIX, max_bytes: int = MAX_CACHE_BYTES):
+        self.engine = engine or GTTSEngine()
+        self.filters = filters or ""
+        self.cache_dir = cache_dir
+        self.url_prefix = url_prefix
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> size, least recently used first
+        self._pending = {}                         # key -> lock held while rendering
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        """Index renders left by a previous run, oldest first"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".mp3"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+        with self._lock:
+            self._evict()
+
+    def key(self, text: str, filters: str = None) -> str:
+        raw = "\0".join((self.engine.name, text, self.filters if filters is None else filters)).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()[:DIGEST_LEN]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}.mp3"
+
+    def _evict(self) -> tuple:
+        """Drop least recently used renders until under max_bytes; (files, bytes) removed"""
+        total = sum(self._entries.values())
+        files = reclaimed = 0
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            try:
+                os.remove(self.path(key))
+                files += 1
+                reclaimed += size
+            except OSError:
+                pass
+        return files, reclaimed
+
+    def reconcile(self, grace: float = 60.0) -> tuple:
+        """
+        Bring the directory and the index back in line: forget entries whose file
+        is gone, delete files the index doesn't know (left-over .tmp writes,
+        renders from another engine or filter chain), then enforce the quota.
+        Returns (files, bytes) removed.
+        """
+        cutoff = time.time() - grace
+        with self._lock:
+            on_disk = {}
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file():
+                    on_disk[entry.name] = entry.stat()
+            for key in [k for k in self._entries if f"{k}.mp3" not in on_disk]:
+                del self._entries[key]
+            files = reclaimed = 0
+            for name, st in on_disk.items():
+                key = name[:-4] if name.endswith(".mp3") else None
+                if key in self._entries or key in self._pending or st.st_mtime > cutoff:
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    files += 1
+                    reclaimed += st.st_size
+                except OSError:
+                    pass
+            evicted = self._evict()
+        return files + evicted[0], reclaimed + evicted[1]
+
+    def get(self, text: str) -> str:
+        """
+        Content key of the rendered phrase, rendering it on a miss.
+        When the filter chain fails, the plain voice is served under its own
+        (unfiltered) key, so the filtered key stays a miss and is retried.
+        """
+        key = self.key(text)
+        with self._lock:
+            if key in self._entries and os.path.exists(self.path(key)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key
+            pending = self._pending.setdefault(key, threading.Lock())
+        # One render per key; concurrent callers for the same phrase wait for it
+        with pending:
+            with self._lock:
+                if key in self._entries and os.path.exists(self.path(key)):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return key
+                self.misses += 1
+            try:
+                data, filtered = render(self.engine, text, self.filters)
+                stored = key if filtered else self.key(text, "")
+                tmp_path = self.path(stored) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path(stored))
+                with self._lock:
+                    self._entries[stored] = len(data)
+                    self._entries.move_to_end(stored)
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+        return stored
+
+    def render_many(self, texts, workers: int = PRERENDER_WORKERS, progress=None) -> dict:
+        """
+        Pre-render phrases concurrently. Returns {text: key} for the phrases that
+        rendered; progress(done, total) is called as they finish.
+        """
+        texts = list(dict.fromkeys(texts))
+        keys = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(self.get, text): text for text in texts}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                text = futures[future]
+                try:
+                    keys[text] = future.result()
+                except Exception as e:
+                    print(f"TTS pre-render failed for {text!r}: {e}")
+                if progress:
+                    progress(done, len(texts))
+        return keys
+
+    def warm(self) -> dict:
+        """Load the engine so the first miss only pays for the render itself"""
+        self.engine.warm()
+        return self.stats()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "engine": self.engine.name,
+                "entries": len(self._entries),
+                "bytes": sum(self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,77 @@
+import time
+import asyncio
+import inspect
+import subprocess
+
+# Startup warm-up phase.
+# Work that used to block startup (or the first request that needed it) runs
+# as named steps after the server is already listening: building indexes,
+# checking external binaries, importing heavy media libraries, priming caches.
+# GET /ready reports 503 until every required step has succeeded, so an
+# orchestrator only routes traffic to a warm process; optional steps (cutter
+# tooling) are reported but never hold readiness back.
+
+
+class Warmup:
+    def __init__(self):
+        self._steps = []  # (name, fn, required), in registration order
+        self.steps = {}   # name -> {"state", "required", "seconds", "detail", "error"}
+        self.started = None
+        self.finished = None
+
+    def step(self, name: str, fn, required: bool = True):
+        """Register fn (sync: run in a worker thread; async: awaited on the loop)"""
+        self._steps.append((name, fn, required))
+        self.steps[name] = {"state": "pending", "required": required, "seconds": None,
+                            "detail": None, "error": None}
+
+    async def _run_step(self, name: str, fn):
+        entry = self.steps[name]
+        entry["state"] = "running"
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(fn):
+                detail = await fn()
+            else:
+                detail = await asyncio.to_thread(fn)
+            entry.update(state="done", detail=detail)
+        except Exception as e:
+            entry.update(state="failed", error=str(e))
+            print(f"Warm-up step {name} failed: {e}")
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+
+    async def run(self):
+        """Run every step concurrently; returns once all have finished"""
+        self.started = time.time()
+        await asyncio.gather(*(self._run_step(name, fn) for name, fn, _ in self._steps))
+        self.finished = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return all(self.steps[name]["state"] == "done" for name, _, required in self._steps if required)
+
+    def status(self) -> dict:
+        if self.ready:
+            phase = "ready"
+        elif self.finished is not None:
+            phase = "failed"
+        else:
+            phase = "warming"
+        return {
+            "ready": self.ready,
+            "phase": phase,
+            "seconds": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+            "steps": self.steps,
+        }
+
+
+def check_binary(cmd: str, *args: str, timeout: float = 10) -> str:
+    """First line of `cmd -version` (or cmd *args); raises RuntimeError if the binary doesn't work"""
+    try:
+        result = subprocess.run([cmd, *(args or ("-version",))], capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"{cmd} is not usable: {e}")
+    if result.returncode != 0:
+        raise RuntimeError(f"{cmd} exited with {result.returncode}: {result.stderr.strip()[-200:]}")
+    output = (result.stdout or result.stderr).strip()
+    return output.splitlines()[0] if output else cmd
@@ -0,0 +1,70 @@
+import json
+
+# Compact WebSocket protocol for /api/game/ws.
+# Every frame is a JSON array with fixed positional fields; there are no key
+# names and no schema parsing on the hot path.
+#
+# client -> server   [op, seq, *args]
+# server -> client   ["s", revision, state]   full state (sent on connect)
+#                    ["u", revision, delta]   changed keys since the previous revision
+#                    ["a", seq, revision]     command applied, state is at revision
+#                    ["e", seq, message]      command rejected
+
+# op -> (command name, required arg count, [arg name, ...])
+# Args past the required count may be omitted and take the REST defaults.
+# Values are only mapped to names here; they are validated by the same
+# request models as the REST endpoints.
+COMMANDS = {
+    "c": ("call", 1, ["number", "audio_url", "playback_rate"]),
+    "d": ("done", 0, []),
+    "x": ("special", 1, ["audio_url", "playback_rate"]),
+    "b": ("bg_music", 1, ["enabled"]),
+    "v": ("volume", 0, ["bg_volume", "call_volume", "duck_level", "playback_rate"]),
+    "p": ("pause", 1, ["paused"]),
+    "r": ("reset", 0, []),
+}
+
+
+class ProtocolError(ValueError):
+    def __init__(self, message: str, seq=None):
+        super().__init__(message)
+        self.seq = seq
+
+
+def decode_command(raw: str):
+    """Returns (command name, seq, kwargs)"""
+    try:
+        frame = json.loads(raw)
+        op, seq, args = frame[0], int(frame[1]), frame[2:]
+    except (ValueError, TypeError, IndexError, KeyError):
+        raise ProtocolError("malformed frame")
+    if op not in COMMANDS:
+        raise ProtocolError(f"unknown op {op!r}", seq)
+    name, required, fields = COMMANDS[op]
+    if not required <= len(args) <= len(fields):
+        raise ProtocolError(f"wrong number of args for {name}", seq)
+    return name, seq, dict(zip(fields, args))
+
+
+def state_delta(prev: dict, cur: dict) -> dict:
+    return {k: v for k, v in cur.items() if k not in prev or prev[k] != v}
+
+
+def _dumps(frame) -> str:
+    return json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_state(revision: int, state: dict) -> str:
+    return _dumps(["s", revision, state])
+
+
+def encode_delta(revision: int, delta: dict) -> str:
+    return _dumps(["u", revision, delta])
+
+
+def encode_ack(seq: int, revision: int) -> str:
+    return _dumps(["a", seq, revision])
+
+
+def encode_error(seq, message: str) -> str:
+    return _dumps(["e", seq, message])
@@ -27,6 +27,8 @@ const state = {
         muteBg: false
     },
 
+    autoCall: { enabled: false, interval: 3 },
+
     initialSyncDone: false
 };
 
@@ -82,6 +84,8 @@ document.addEventListener('DOMContentLoaded', () => {
     window.clearQueue = clearQueue;
     window.togglePlayPause = togglePlayPause;
     window.toggleLocalMute = toggleLocalMute;
+    window.toggleAutoCall = toggleAutoCall;
+    window.setAutoInterval = setAutoInterval;
 
     // Load initial queue UI
     updateQueueUI();
@@ -146,6 +150,14 @@ function onServerStateUpdate(serverState) {
         updateCount();
     }
 
+    if (serverState.auto_call) {
+        state.autoCall = serverState.auto_call;
+        updateAutoCallUI();
+    }
+
+    // Ticket rows completed by the last call (server-side incremental check)
+    if (serverState.ticket_event) showTicketEvent(serverState.ticket_event);
+
     // If server says "playing" and we are "idle", maybe we should show it?
     // But we avoid auto-playing audio to prevent double-play.
 
@@ -392,13 +404,9 @@ function togglePlayPause() {
 
     const willPause = !player.paused;
 
-    fetch('/api/game/pause', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ paused: willPause })
-    }).catch(e => console.error("Pause API error:", e));
+    window.gameClient.setPause(willPause).catch(e => console.error("Pause API error:", e));
 
-    // Note: We do NOT pause locally here immediately. We wait for SSE to confirm.
+    // Note: We do NOT pause locally here immediately. We wait for the state push to confirm.
     // Or we could optimistic update? 
     // Let's wait for SSE to ensure sync. The lag should be minimal on local network.
 }
@@ -439,7 +447,17 @@ function updateCount() {
     els.calledCount.textContent = count > 0 ? `Đã gọi: ${count} số` : '';
 }
 
-function showError(msg) {
+function showTicketEvent(ev) {
+    const key = `${ev.play_id}:${ev.number}`;
+    if (state.lastTicketEvent === key) return;
+    state.lastTicketEvent = key;
+    if (!ev.win_count) return;
+    const tickets = ev.wins.map(([ticket, row]) => `#${ticket} (hàng ${row + 1})`).join(', ');
+    const more = ev.win_count > ev.wins.length ? ` +${ev.win_count - ev.wins.length}` : '';
+    showError(`🎉 Kinh! Vé ${tickets}${more}`, 'rgba(40,160,80,0.9)');
+}
+
+function showError(msg, background = 'rgba(220,50,50,0.9)') {
     // Simple alert or toast
     let toast = document.getElementById('errorToast');
     if (!toast) {
@@ -448,11 +466,55 @@ function showError(msg) {
         toast.style.cssText = 'position:fixed;top:20px;right:20px;background:rgba(220,50,50,0.9);color:#fff;padding:12px 20px;border-radius:8px;font-size:14px;z-index:9999;transition:opacity 0.5s;pointer-events:none;opacity:0;';
         document.body.appendChild(toast);
     }
+    toast.style.background = background;
     toast.textContent = msg;
     toast.style.opacity = '1';
     setTimeout(() => { toast.style.opacity = '0'; }, 3000);
 }
 
+// --- Auto-call ---
+async function postAutoCall(action, body = {}) {
+    try {
+        const res = await fetch(`/api/autocall/${action}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        if (!res.ok) {
+            const err = await res.json().catch(() => ({}));
+            showError(err.detail || `Auto-call ${action} lỗi`);
+        }
+    } catch (e) {
+        showError("Lỗi kết nối.");
+    }
+}
+
+function toggleAutoCall() {
+    if (state.autoCall.enabled) {
+        postAutoCall('stop');
+    } else {
+        const interval = parseFloat(document.getElementById('autoIntervalSelect').value);
+        postAutoCall('start', { interval });
+    }
+}
+
+function setAutoInterval(value) {
+    if (state.autoCall.enabled) postAutoCall('start', { interval: parseFloat(value) });
+}
+
+function updateAutoCallUI() {
+    const btn = document.getElementById('btnAutoCall');
+    if (!btn) return;
+    btn.classList.toggle('active', state.autoCall.enabled);
+    btn.textContent = state.autoCall.enabled ? 'DỪNG TỰ ĐỘNG' : 'TỰ ĐỘNG';
+    const select = document.getElementById('autoIntervalSelect');
+    if (state.autoCall.interval && select.querySelector(`option[value="${state.autoCall.interval}"]`)) {
+        select.value = String(state.autoCall.interval);
+    }
+    // Manual queueing would race the scheduler; typed numbers become overrides instead
+    els.btnRandom.disabled = state.autoCall.enabled;
+}
+
 // --- Queue Logic ---
 function addToQueue() {
     const input = els.numberInput;
@@ -468,6 +530,13 @@ function addToQueue() {
     }
     if (state.callQueue.includes(number)) return;
 
+    // Auto-call running: the typed number overrides the scheduler's next draw
+    if (state.autoCall.enabled) {
+        input.value = '';
+        postAutoCall('next', { number }).then(() => showStatus(`Số tiếp theo: ${number}`));
+        return;
+    }
+
     state.callQueue.push(number);
     localStorage.setItem('loto_queue', JSON.stringify(state.callQueue));
     updateQueueUI();
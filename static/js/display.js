@@ -1,4 +1,4 @@
-import { GameClient, AudioUtils } from './game-core.js';
+import { GameClient, AudioUtils, PlaybackTelemetry } from './game-core.js';
 
 // --- State ---
 const state = {
@@ -9,10 +9,15 @@ const state = {
     lastStatus: '',
     lastPlayId: 0,
     lastLatestNumber: null,
+    preloadUrl: null,
+    preloadAudio: null,
 
     // Timers
     callSafetyTimer: null,
-    callAudioTimeout: null
+    callAudioTimeout: null,
+
+    // Sync quality reporting (start latency, drift, buffering)
+    telemetry: null
 };
 
 // --- DOM Elements ---
@@ -38,6 +43,9 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Init Client
     window.gameClient = new GameClient(processState);
+    state.telemetry = new PlaybackTelemetry();
+    state.telemetry.watch(els.callAudio, true);
+    state.telemetry.watch(els.bgAudio);
 
     // Bind Events
     window.unlockAudio = unlockAudio;
@@ -117,10 +125,23 @@ function forceRestoreBg(bgVol) {
 }
 
 // --- State Processing ---
+function preloadNext(hint) {
+    const url = AudioUtils.pickVariant(hint.audio_url, hint.variants);
+    if (state.preloadUrl === url) return;
+    state.preloadUrl = url;
+    // Keep a reference so the fetch isn't dropped before the call arrives
+    state.preloadAudio = new Audio();
+    state.preloadAudio.preload = 'auto';
+    state.preloadAudio.src = url;
+}
+
 function processState(gameState) {
     if (!state.audioUnlocked) return;
 
     try {
+        // 0. Prefetch the next auto-call clip so it starts without a network gap
+        if (gameState.preload) preloadNext(gameState.preload);
+
         // 1. Sync Playback Rate
         if (gameState.playback_rate) {
             if (Math.abs(els.callAudio.playbackRate - gameState.playback_rate) > 0.1) {
@@ -207,11 +228,13 @@ function processState(gameState) {
 
                             let diff = Math.abs(els.bgAudio.currentTime - target);
                             if (diff > duration / 2) diff = duration - diff; // Wrap around check
+                            state.telemetry.drift(diff);
 
                             // If drift > 2.0s, hard sync
                             if (diff > 2.0) {
                                 console.log(`BG Drift ${diff.toFixed(2)}s -> Resync to ${target.toFixed(2)}`);
                                 els.bgAudio.currentTime = target;
+                                state.telemetry.resync(diff);
                             }
                         }
                     }
@@ -231,6 +254,7 @@ function processState(gameState) {
             // So we don't need to check isGlobalPause here, assuming server did its job.
             state.lastPlayId = gameState.play_id;
             state.isPlayingCall = true;
+            state.telemetry.callRequested();
 
             // Stop previous
             forceRestoreBg(null);
@@ -244,7 +268,7 @@ function processState(gameState) {
             // Play Call
             const bgVol = gameState.bg_volume;
             els.callAudio.volume = gameState.call_volume;
-            els.callAudio.src = gameState.audio_url;
+            els.callAudio.src = AudioUtils.pickVariant(gameState.audio_url, gameState.audio_variants);
             els.callAudio.playbackRate = gameState.playback_rate || 1.0;
 
             // Handlers
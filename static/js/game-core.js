@@ -1,13 +1,27 @@
 /**
  * Shared Core Logic for Loto Game
- * Handles SSE connection, API calls, and common Audio utilities.
+ * Handles the realtime connection (WebSocket, falling back to SSE + REST),
+ * API calls, and common Audio utilities.
  */
 
+// WebSocket attempts that never open before we settle on SSE
+const WS_MAX_FAILURES = 3;
+const WS_ACK_TIMEOUT = 5000;
+
 export class GameClient {
-    constructor(onStateUpdate) {
+    constructor(onStateUpdate, options = {}) {
         this.onStateUpdate = onStateUpdate;
         this.eventSource = null;
         this.reconnectTimer = null;
+
+        // WebSocket transport (see core/ws_protocol.py)
+        this.useWebSocket = options.websocket !== false && 'WebSocket' in window;
+        this.ws = null;
+        this.wsOpen = false;
+        this.wsFailures = 0;
+        this.seq = 0;
+        this.pending = new Map(); // seq -> {resolve, reject, timer}
+        this.state = {};
     }
 
     connect() {
@@ -15,7 +29,69 @@ export class GameClient {
             this.eventSource.close();
             this.eventSource = null;
         }
+        if (this.ws) {
+            this.ws.onclose = null;
+            this.ws.close();
+            this.ws = null;
+            this.wsOpen = false;
+        }
+
+        if (this.useWebSocket && this.wsFailures < WS_MAX_FAILURES) {
+            this.connectWebSocket();
+        } else {
+            this.connectSSE();
+        }
+    }
+
+    connectWebSocket() {
+        const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+        console.log("Connecting to WebSocket...");
+        const ws = new WebSocket(`${proto}://${location.host}/api/game/ws`);
+        this.ws = ws;
+
+        ws.onopen = () => {
+            this.wsOpen = true;
+            this.wsFailures = 0;
+        };
 
+        ws.onmessage = (event) => {
+            try {
+                const [kind, a, b] = JSON.parse(event.data);
+                if (kind === 's') {
+                    this.state = b;
+                    this._emitState();
+                } else if (kind === 'u') {
+                    Object.assign(this.state, b);
+                    this._emitState();
+                } else if (kind === 'a' || kind === 'e') {
+                    const p = this.pending.get(a);
+                    if (!p) return;
+                    clearTimeout(p.timer);
+                    this.pending.delete(a);
+                    if (kind === 'a') p.resolve({ status: 'ok', revision: b });
+                    else p.reject(new Error(b));
+                }
+            } catch (e) {
+                console.warn('WebSocket parse error:', e);
+            }
+        };
+
+        ws.onclose = () => {
+            if (!this.wsOpen) this.wsFailures++;
+            this.wsOpen = false;
+            this.ws = null;
+            for (const p of this.pending.values()) {
+                clearTimeout(p.timer);
+                p.reject(new Error('WebSocket closed'));
+            }
+            this.pending.clear();
+            console.warn('WebSocket closed, reconnecting in 3s...');
+            clearTimeout(this.reconnectTimer);
+            this.reconnectTimer = setTimeout(() => this.connect(), 3000);
+        };
+    }
+
+    connectSSE() {
         try {
             console.log("Connecting to SSE...");
             this.eventSource = new EventSource('/api/game/stream');
@@ -41,20 +117,25 @@ export class GameClient {
         }
     }
 
+    _emitState() {
+        if (this.onStateUpdate) this.onStateUpdate({ ...this.state });
+    }
+
     // API: Sync Volume
     async setVolume(data) {
         // data: { bg_volume, call_volume, duck_level, playback_rate }
-        return this._post('/api/game/volume', data);
+        return this._command('v', [data.bg_volume, data.call_volume, data.duck_level, data.playback_rate],
+            '/api/game/volume', data);
     }
 
     // API: Toggle BG Music
     async setBgMusic(enabled) {
-        return this._post('/api/game/bg_music', { enabled });
+        return this._command('b', [enabled], '/api/game/bg_music', { enabled });
     }
 
     // API: Call Number
     async callNumber(number, audioUrl, playbackRate = 1.0) {
-        return this._post('/api/game/call', {
+        return this._command('c', [number, audioUrl, playbackRate], '/api/game/call', {
             number,
             audio_url: audioUrl,
             playback_rate: playbackRate
@@ -63,17 +144,39 @@ export class GameClient {
 
     // API: Done Call
     async doneCall() {
-        return this._post('/api/game/done', {});
+        return this._command('d', [], '/api/game/done', {});
     }
 
     // API: Play Special (Start / Kinh)
     async playSpecial(url, rate = 1.0) {
-        return this._post('/api/game/special', { audio_url: url, playback_rate: rate });
+        return this._command('x', [url, rate], '/api/game/special', { audio_url: url, playback_rate: rate });
+    }
+
+    // API: Global Pause
+    async setPause(paused) {
+        return this._command('p', [paused], '/api/game/pause', { paused });
     }
 
     // API: Reset Game
     async resetGame() {
-        return this._post('/api/game/reset', {});
+        return this._command('r', [], '/api/game/reset', {});
+    }
+
+    /**
+     * Sends a command over the WebSocket when it is open (resolves on ack with
+     * the resulting revision), otherwise POSTs it to the REST endpoint.
+     */
+    _command(op, args, url, body) {
+        if (!this.wsOpen) return this._post(url, body);
+        const seq = ++this.seq;
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(seq);
+                reject(new Error(`No ack for ${op}#${seq}`));
+            }, WS_ACK_TIMEOUT);
+            this.pending.set(seq, { resolve, reject, timer });
+            this.ws.send(JSON.stringify([op, seq, ...args]));
+        });
     }
 
     async _post(url, body) {
@@ -91,9 +194,130 @@ export class GameClient {
     }
 }
 
+// Playback telemetry (see core/telemetry.py): events are queued and sent in batches
+const TELEMETRY_ENDPOINT = '/api/telemetry/playback';
+const TELEMETRY_FLUSH_MS = 30000;
+const TELEMETRY_MAX_QUEUE = 200;
+
+/**
+ * Batched playback telemetry for a display: call start latency, background
+ * drift, buffering stalls, resyncs and errors, as [kind, value_ms] pairs.
+ * Flushed every TELEMETRY_FLUSH_MS (or when the queue fills), and with
+ * sendBeacon when the page is hidden or unloaded so the last batch isn't lost.
+ */
+export class PlaybackTelemetry {
+    constructor(options = {}) {
+        this.room = options.room || new URLSearchParams(location.search).get('room') || 'main';
+        this.client = Math.random().toString(36).slice(2, 10);
+        this.queue = [];
+        this.callRequestedAt = null;
+        this.stalls = new WeakMap(); // element -> performance.now() when it started waiting
+
+        this.timer = setInterval(() => this.flush(), TELEMETRY_FLUSH_MS);
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') this.flush(true);
+        });
+        window.addEventListener('pagehide', () => this.flush(true));
+    }
+
+    _push(kind, value) {
+        this.queue.push([kind, Math.max(0, Math.round(value))]);
+        if (this.queue.length >= TELEMETRY_MAX_QUEUE) this.flush();
+    }
+
+    /** A new call's state arrived; its start latency runs until the clip is playing */
+    callRequested() {
+        this.callRequestedAt = performance.now();
+    }
+
+    /** Distance (seconds) between the background music and the server timeline */
+    drift(seconds) {
+        this._push('d', seconds * 1000);
+    }
+
+    /** The display jumped the background music back onto the server timeline */
+    resync(seconds) {
+        this._push('r', seconds * 1000);
+    }
+
+    error() {
+        this._push('e', 0);
+    }
+
+    /**
+     * Track buffering stalls (waiting -> playing) and errors on an element;
+     * on the call element, the first 'playing' also completes the start latency.
+     * @param {HTMLAudioElement} el
+     * @param {boolean} [isCall]
+     */
+    watch(el, isCall = false) {
+        el.addEventListener('waiting', () => this.stalls.set(el, performance.now()));
+        el.addEventListener('playing', () => {
+            const since = this.stalls.get(el);
+            if (since !== undefined) {
+                this.stalls.delete(el);
+                this._push('b', performance.now() - since);
+            }
+            if (isCall && this.callRequestedAt !== null) {
+                this._push('s', performance.now() - this.callRequestedAt);
+                this.callRequestedAt = null;
+            }
+        });
+        el.addEventListener('error', () => this.error());
+    }
+
+    flush(unloading = false) {
+        if (!this.queue.length) return;
+        const body = JSON.stringify({ room: this.room, client: this.client, events: this.queue });
+        this.queue = [];
+        if (unloading && navigator.sendBeacon) {
+            navigator.sendBeacon(TELEMETRY_ENDPOINT, new Blob([body], { type: 'application/json' }));
+            return;
+        }
+        fetch(TELEMETRY_ENDPOINT, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body,
+            keepalive: true
+        }).catch(() => { }); // telemetry is best effort
+    }
+}
+
 export const AudioUtils = {
     fadeTimers: new WeakMap(),
 
+    // Smallest first, mirrors core.audio.AUDIO_VARIANTS
+    variantOrder: [
+        ['opus_48', 'audio/ogg; codecs="opus"'],
+        ['mp3_64', 'audio/mpeg'],
+    ],
+
+    /**
+     * Delivery preference for this device: ?quality=low|high in the page URL,
+     * then localStorage 'loto_quality', then the browser's Save-Data hint.
+     */
+    qualityPreference() {
+        const fromQuery = new URLSearchParams(location.search).get('quality');
+        if (fromQuery) return fromQuery;
+        const stored = localStorage.getItem('loto_quality');
+        if (stored) return stored;
+        return (navigator.connection && navigator.connection.saveData) ? 'low' : 'high';
+    },
+
+    /**
+     * Picks the smallest playable variant when the device prefers low quality.
+     * @param {string} url Original audio URL
+     * @param {Object} [variants] {variant: url} from the server state
+     */
+    pickVariant(url, variants) {
+        if (!variants || this.qualityPreference() !== 'low') return url;
+        const probe = document.createElement('audio');
+        for (const [name, mime] of this.variantOrder) {
+            if (variants[name] && probe.canPlayType(mime)) return variants[name];
+        }
+        return url;
+    },
+
     /**
      * Smoothly fades an audio element to a target volume.
      * @param {HTMLAudioElement} el 